@@ -0,0 +1,429 @@
+"""
+GDTF Builder — benchmarks
+Run headless against the Streamlit app and the core builder.
+
+    python bench_gdtf.py payload            # per-rerun element count / bytes
+    python bench_gdtf.py theme              # stylesheet requests before first paint
+    python bench_gdtf.py modes              # card (fragment) vs full rerun
+    python bench_gdtf.py history            # undo snapshot cost vs deepcopy
+    python bench_gdtf.py layout             # Pixel_N transforms per layout
+    python bench_gdtf.py lint               # library linter, pool vs serial
+    python bench_gdtf.py media              # package size vs media references
+    python bench_gdtf.py generate           # background build: submit / cancel latency
+    python bench_gdtf.py family             # family build vs one build per cell count
+    python bench_gdtf.py heads              # nested head templates vs a flattened cell list
+"""
+
+import argparse, contextlib, copy, itertools, os, pickle, statistics, sys, time, logging
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gdtf_builder.py")
+
+
+def synthetic_modes(n_modes, n_channels, sets_every=5, sets=8):
+    """n_modes × n_channels body channels; every Nth wheel-ish channel gets sets."""
+    from gdtf_core import (CHANNEL_CATALOGUE, make_channel_entry,
+                           make_slot_entry, _new_channel_id)
+    names = itertools.cycle([n for g in CHANNEL_CATALOGUE.values() for n, _ in g])
+    modes = []
+    for m in range(n_modes):
+        chans = []
+        for c in range(n_channels):
+            ch = make_channel_entry(next(names))
+            if c % sets_every == 0:
+                ch["slots"] = [make_slot_entry(i * 10, i * 10 + 9, f"Set {i+1}")
+                               for i in range(sets)]
+            chans.append(ch)
+        modes.append({"id": _new_channel_id(), "name": f"Mode {m+1}",
+                      "body_channels": chans, "cell_channels": []})
+    return modes
+
+
+@contextlib.contextmanager
+def fragment_scoped(fragment_id):
+    """
+    Make AppTest.run() rerun one fragment, as the browser does on a click.
+    Both rerun requests AppTest makes (initial + explicit) must carry the
+    fragment queue, or the pending full rerun absorbs the fragment one.
+    """
+    import functools
+    from streamlit.testing.v1 import local_script_runner
+    original = local_script_runner.RerunData
+    local_script_runner.RerunData = functools.partial(
+        original, fragment_id_queue=[fragment_id], is_fragment_scoped_rerun=True)
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = original
+
+
+def _timed_runs(at, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def _app_test():
+    from streamlit.testing.v1 import AppTest
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    return AppTest.from_file(APP, default_timeout=900)
+
+
+def _walk(node):
+    yield node
+    for child in getattr(node, "children", {}).values():
+        yield from _walk(child)
+
+
+def tree_stats(at):
+    """(element count, serialized proto bytes, markdown count) of one rerun."""
+    count = size = markdown = 0
+    for node in _walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is None or not hasattr(proto, "ByteSize"):
+            continue
+        count += 1
+        size  += proto.ByteSize()
+        markdown += node.type == "markdown"
+    return count, size, markdown
+
+
+def bench_payload(args):
+    at = _app_test()
+    times = []
+    for i in range(args.runs):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    count, size, markdown = tree_stats(at)
+    print(f"elements/rerun   {count}")
+    print(f"markdown/rerun   {markdown}")
+    print(f"payload/rerun    {size:,} bytes")
+    print(f"script run       first {times[0]*1000:.0f} ms · "
+          f"median rerun {statistics.median(times[1:] or times)*1000:.0f} ms")
+
+
+def _blocking_css(url, timeout, seen=None):
+    """
+    Fetch a stylesheet and, depth-first, every @import it makes — the
+    requests a browser must finish (or give up on) before it paints with
+    the theme. Yields (url, ms, error or "").
+    """
+    import re, urllib.parse, urllib.request
+    seen = set() if seen is None else seen
+    if url in seen:
+        return
+    seen.add(url)
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            css, error = r.read().decode("utf-8", "replace"), ""
+    except OSError as e:
+        css, error = "", str(getattr(e, "reason", e))
+    yield url, (time.perf_counter() - t0) * 1000, error
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    for ref in re.findall(
+            r"""@import\s+(?:url\(\s*)?('[^']*'|"[^"]*"|[^)\s;]+)""", css):
+        yield from _blocking_css(urllib.parse.urljoin(url, ref.strip("'\"")),
+                                 timeout, seen)
+
+
+def bench_theme(args):
+    """
+    Serve the app and time the theme's render-blocking stylesheet chain.
+    A real first paint needs a browser; this is the part the theme adds.
+    """
+    import socket, subprocess, urllib.request
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.headless=true",
+         f"--server.port={port}", "--server.address=127.0.0.1"],
+        cwd=os.path.dirname(APP), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"{base}/_stcore/health", timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        totals = []
+        for _ in range(args.runs):
+            chain = list(_blocking_css(f"{base}/app/static/gdtf_theme.css",
+                                       args.timeout))
+            totals.append(sum(ms for _, ms, _ in chain))
+        for url, ms, error in chain:
+            print(f"{ms:>8.1f} ms  {url}" + (f"  ✖ {error}" if error else ""))
+        remote = sum(not url.startswith(base) for url, _, _ in chain)
+        print(f"blocking requests {len(chain)} ({remote} remote) · styles ready "
+              f"median {statistics.median(totals):.1f} ms · max {max(totals):.1f} ms")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def bench_modes(args):
+    """
+    Rerun cost of an edit inside one mode card, as the fixture gains modes.
+    Before fragments a click cost two full-page runs (callback-less button
+    + st.rerun()); now it costs one rerun of the card's fragment. Measured
+    with the other cards collapsed, and with --all-open also expanded.
+    """
+    layouts = ["collapsed"] + (["open"] if args.all_open else [])
+    print(f"{'modes':>5} {'channels':>8} {'others':>9} {'full rerun':>11} "
+          f"{'old click':>10} {'card rerun':>11}")
+    for n_modes in args.modes:
+        for layout in layouts:
+            at = _app_test()
+            modes = synthetic_modes(n_modes, args.channels)
+            at.session_state["modes"] = modes
+            if layout == "collapsed":
+                at.session_state["collapsed_modes"] = {m["id"] for m in modes[1:]}
+            at.run()
+            full = _timed_runs(at, args.runs)
+            fragment_id = next(iter(at._fragment_storage._fragments))
+            with fragment_scoped(fragment_id):
+                card = _timed_runs(at, args.runs)
+            print(f"{n_modes:>5} {args.channels:>8} {layout:>9} {full:>9.0f}ms "
+                  f"{2 * full:>8.0f}ms {card:>9.0f}ms")
+
+
+def bench_history(args):
+    """
+    Cost of recording one undo step after a single slot-label edit — with the
+    edited channel's path, and re-freezing the whole model as a path-less
+    record does — against a copy.deepcopy snapshot, and the retained size of
+    --depth snapshots (pickled together, so shared records count once).
+    """
+    from gdtf_core import History, freeze_modes
+    print(f"{'modes':>5} {'channels':>8} {'record':>9} {'full':>9} {'deepcopy':>9} "
+          f"{'history':>10} {'deepcopies':>11}")
+    for n_modes in args.modes:
+        modes = synthetic_modes(n_modes, args.channels)
+        history = History(args.depth, modes)
+        copies, rec, fz, dc = [], [], [], []
+        mode = modes[-1]
+        ch = mode["body_channels"][0]
+        path = [(mode["id"], "body", ch["id"])]
+        for i in range(args.depth):
+            ch["slots"][0]["name"] = f"Edit {i}"
+            t0 = time.perf_counter()
+            freeze_modes(modes, history.current)
+            fz.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            history.record(modes, path)
+            rec.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            copies.append(copy.deepcopy(modes))
+            dc.append(time.perf_counter() - t0)
+        kept = len(pickle.dumps(history, pickle.HIGHEST_PROTOCOL))
+        full = len(pickle.dumps(copies, pickle.HIGHEST_PROTOCOL))
+        print(f"{n_modes:>5} {args.channels:>8} "
+              f"{statistics.median(rec) * 1000:>7.2f}ms "
+              f"{statistics.median(fz) * 1000:>7.2f}ms "
+              f"{statistics.median(dc) * 1000:>7.1f}ms "
+              f"{kept / 1024:>8.0f}KB {full / 1024:>9.0f}KB")
+
+
+def bench_layout(args):
+    """Time to lay out and format --cells Pixel_N transforms, per layout kind."""
+    from gdtf_core import CellLayout, cell_transforms
+    points = tuple((i * 0.01, (i % 7) * 0.02, 0.0) for i in range(max(args.cells)))
+    layouts = {"line":   CellLayout("line"),
+               "grid":   CellLayout("grid", columns=100, order="serpentine"),
+               "ring":   CellLayout("ring"),
+               "custom": CellLayout("custom", points=points)}
+    print(f"{'cells':>6} " + " ".join(f"{k:>9}" for k in layouts))
+    for n in args.cells:
+        row = []
+        for layout in layouts.values():
+            times = []
+            for _ in range(args.runs):
+                t0 = time.perf_counter()
+                cell_transforms(layout, n)
+                times.append(time.perf_counter() - t0)
+            row.append(statistics.median(times) * 1000)
+        print(f"{n:>6} " + " ".join(f"{t:>7.1f}ms" for t in row))
+
+
+def bench_lint(args):
+    """Lint a synthetic library of --files archives in-process and pooled."""
+    import tempfile
+    from gdtf_core import build_gdtf, channel_defs_from_mode, create_gdtf_package
+    from gdtf_lint import lint_paths
+    modes = synthetic_modes(3, 40)
+    package = create_gdtf_package(build_gdtf(
+        "Bench Fixture", "Bench", {m["name"]: channel_defs_from_mode(m)
+                                   for m in modes}, cell_count=16))
+    with tempfile.TemporaryDirectory() as lib:
+        for i in range(args.files):
+            sub = os.path.join(lib, f"{i % 20:02d}")
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f"fixture_{i}.gdtf"), "wb") as f:
+                f.write(package)
+        print(f"{args.files} files × {len(package):,} bytes · {os.cpu_count()} CPUs")
+        for jobs in (1, None):
+            t0 = time.perf_counter()
+            n = sum(1 for _ in lint_paths([lib], jobs))
+            label = "serial" if jobs == 1 else "pool"
+            print(f"{label:>6}  {n} files in {time.perf_counter() - t0:.2f} s")
+
+
+def bench_media(args):
+    """
+    Package size and build time as more wheel slots reference one 1 MB image
+    (spread over body / cell wheels and modes), against distinct images.
+    """
+    import io, tempfile
+    from gdtf_core import (ChannelDef, ChannelSlot, MediaStore, compile_fixture,
+                           create_gdtf_package, emit_gdtf_xml, media_references)
+    with tempfile.TemporaryDirectory() as root:
+        store = MediaStore(root)
+        png = b"\x89PNG\r\n\x1a\n" + os.urandom(1 << 20)
+        shared = store.add(io.BytesIO(png))
+        print(f"{'refs':>6} {'shared':>18} {'distinct':>18}")
+        for refs in args.refs:
+            row = []
+            for distinct in (False, True):
+                names = [store.add(io.BytesIO(png + i.to_bytes(4, "big")))
+                         if distinct else shared for i in range(refs)]
+                modes, it = {}, iter(names)
+                for m in range(max(1, refs // 40)):
+                    chs = ([], [])
+                    for part in chs:
+                        slots = [ChannelSlot(f"G{i}", i, i, 0, 1, f"G{i}", media)
+                                 for i, media in zip(range(20), it)]
+                        part.append(ChannelDef("Gobo Wheel", slots=slots))
+                    modes[f"Mode {m + 1}"] = chs
+                t0 = time.perf_counter()
+                ir = compile_fixture("Bench", "Bench", modes, cell_count=2)
+                pkg = create_gdtf_package(
+                    emit_gdtf_xml(ir), store.package_files(media_references(ir)))
+                row.append((len(pkg), time.perf_counter() - t0))
+            print(f"{refs:>6} " + " ".join(
+                f"{size / 1e6:>7.1f}MB {t * 1000:>6.0f}ms" for size, t in row))
+
+
+def bench_generate(args):
+    """
+    Background Generate on --modes × --channels (--cells cells): how long the
+    script thread is blocked on submit, the build itself, and how long a
+    cancel takes to take effect against the worker finishing its phase.
+    """
+    from gdtf_core import GenerateJob, channel_defs_from_mode
+    print(f"{'modes':>6} {'cells':>6} {'submit':>9} {'build':>9} {'cancel':>9} {'worker':>9}")
+    for n_modes in args.modes:
+        modes = {m["name"]: channel_defs_from_mode(m)
+                 for m in synthetic_modes(n_modes, args.channels)}
+        for cells in args.cells:
+            t0 = time.perf_counter()
+            job = GenerateJob("Bench", "Bench", modes, cell_count=cells).start()
+            submit = time.perf_counter() - t0
+            job.wait()
+            build = job.elapsed
+            job = GenerateJob("Bench2", "Bench", modes, cell_count=cells).start()
+            while job.phase in ("", "compile"):
+                time.sleep(0.001)
+            t0 = time.perf_counter()
+            job.cancel()
+            cancel = time.perf_counter() - t0
+            job.wait()
+            worker = time.perf_counter() - t0
+            print(f"{n_modes:>6} {cells:>6} {submit * 1000:>7.2f}ms {build * 1000:>7.0f}ms "
+                  f"{cancel * 1000:>7.3f}ms {worker * 1000:>7.0f}ms")
+
+
+def bench_family(args):
+    """
+    One family build over --cells against a separate compile + emit per cell
+    count (uncached), with the estimate the family build reports.
+    """
+    from gdtf_core import (build_family, compile_fixture, emit_gdtf_xml,
+                           channel_defs_from_mode, make_channel_entry, _compile_spec)
+    print(f"{'modes':>6} {'family':>9} {'separate':>9} {'estimate':>9} {'speedup':>8}")
+    for n_modes in args.modes:
+        modes = synthetic_modes(n_modes, args.channels)
+        for m in modes:
+            m["cell_channels"] = [make_channel_entry(n)
+                                  for n in ("Virtual Dimmer", "Red", "Green", "Blue")]
+        modes = {m["name"]: channel_defs_from_mode(m) for m in modes}
+        fam = build_family("Bench", "Bench", modes, args.cells)
+        _compile_spec.cache_clear()
+        t0 = time.perf_counter()
+        for cells in args.cells:
+            emit_gdtf_xml(compile_fixture(f"Bench {cells}", "Bench", modes, cells))
+        separate = time.perf_counter() - t0
+        print(f"{n_modes:>6} {fam.seconds * 1000:>7.0f}ms {separate * 1000:>7.0f}ms "
+              f"{fam.separate_estimate * 1000:>7.0f}ms {separate / fam.seconds:>7.1f}x")
+
+
+def bench_heads(args):
+    """
+    A moving-head bar with --heads heads of 8 RGB pixels, compiled with
+    nested Head / Pixel templates against the same bar flattened into one
+    cell per head whose channel list repeats every pixel's channels.
+    """
+    from gdtf_core import ChannelDef, compile_fixture, emit_gdtf_xml, _compile_spec
+    body = [ChannelDef("Dimmer"), ChannelDef("Strobe")]
+    head = [ChannelDef(n) for n in ("Pan", "Tilt", "Zoom", "Focus", "Gobo Wheel")]
+    pixel = [ChannelDef(n) for n in ("Red", "Green", "Blue")]
+    flat = head + [ChannelDef(f"{c.name} {p}") for p in range(1, 9) for c in pixel]
+    print(f"{'heads':>6} {'nested':>18} {'flattened':>18}")
+    for heads in args.heads:
+        row = []
+        for modes, kw in (({"Std": (body, pixel, head)}, dict(cell_count=8, heads=heads)),
+                          ({"Std": (body, flat)}, dict(cell_count=heads))):
+            times = []
+            for _ in range(args.runs):
+                _compile_spec.cache_clear()
+                t0 = time.perf_counter()
+                xml = emit_gdtf_xml(compile_fixture("Bench", "Bench", modes, **kw))
+                times.append(time.perf_counter() - t0)
+            row.append((len(xml), statistics.median(times)))
+        print(f"{heads:>6} " + " ".join(
+            f"{size / 1e3:>7.1f}KB {t * 1000:>6.1f}ms" for size, t in row))
+
+
+BENCHES = {
+    "payload": bench_payload,
+    "theme":   bench_theme,
+    "modes":   bench_modes,
+    "history": bench_history,
+    "layout":  bench_layout,
+    "lint":    bench_lint,
+    "media":   bench_media,
+    "generate": bench_generate,
+    "family":  bench_family,
+    "heads":   bench_heads,
+}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("bench", choices=sorted(BENCHES))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--modes", type=int, nargs="+", default=[1, 5, 10])
+    ap.add_argument("--channels", type=int, default=100)
+    ap.add_argument("--all-open", action="store_true",
+                    help="modes: also time with every mode card expanded")
+    ap.add_argument("--cells", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--files", type=int, default=2000,
+                    help="lint: archives in the synthetic library")
+    ap.add_argument("--heads", type=int, nargs="+", default=[4, 16, 64],
+                    help="heads: heads per moving-head bar")
+    ap.add_argument("--refs", type=int, nargs="+", default=[1, 10, 40],
+                    help="media: wheel slots referencing an image")
+    ap.add_argument("--timeout", type=float, default=30,
+                    help="theme: seconds before a stylesheet request is given up")
+    ap.add_argument("--depth", type=int, default=50,
+                    help="history: snapshots to take and keep")
+    args = ap.parse_args(argv)
+    BENCHES[args.bench](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
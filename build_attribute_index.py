@@ -0,0 +1,106 @@
+"""
+GDTF Builder — attribute index compiler
+Expands data/gdtf_attributes.tsv (wheel-numbered templates, aliases) into the
+compact prebuilt index gdtf_core loads on first lookup:
+
+    python build_attribute_index.py          # writes data/gdtf_attributes.json
+    python build_attribute_index.py --check  # exit 1 if the JSON is stale
+"""
+
+import argparse, json, os, sys
+
+from gdtf_core import attr_key, ATTRIBUTE_INDEX_PATH
+
+SOURCE = os.path.join(os.path.dirname(ATTRIBUTE_INDEX_PATH), "gdtf_attributes.tsv")
+KINDS = ("wheel", "continuous", "stepped")
+DEFAULT_N = 4
+M_RANGE = range(1, 5)
+
+
+def _expand(text, n, m):
+    return text.replace("(n)", str(n)).replace("(m)", str(m))
+
+
+def read_source(path=SOURCE):
+    """Yield (name, pretty, feature, group, unit, kind, aliases) per attribute."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip() or line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            cols += [""] * (8 - len(cols))
+            name, n_max, pretty, feature, group, unit, kind, aliases = cols[:8]
+            if kind not in KINDS or "." not in feature:
+                raise ValueError(f"{path}:{lineno}: bad row {line.strip()!r}")
+            ns = range(1, int(n_max or DEFAULT_N) + 1) if "(n)" in name else [0]
+            ms = M_RANGE if "(m)" in name else [0]
+            alias_list = [a.strip() for a in aliases.split(",") if a.strip()]
+            for n in ns:
+                for m in ms:
+                    yield (_expand(name, n, m), _expand(pretty, n, m),
+                           feature, _expand(group, n, m), unit or "None", kind,
+                           [_expand(a, n, m) for a in alias_list])
+
+
+def build_index(rows):
+    """
+    Compact JSON-ready dict: lookup tables for the repeated strings, one row
+    per attribute, and a flat key -> row index covering names and aliases.
+    """
+    tables = {"features": [], "groups": [], "units": [], "kinds": list(KINDS)}
+    seen = {t: {v: i for i, v in enumerate(vals)} for t, vals in tables.items()}
+
+    def _id(table, value):
+        ids = seen[table]
+        if value not in ids:
+            ids[value] = len(tables[table])
+            tables[table].append(value)
+        return ids[value]
+
+    attributes, index, aliases = [], {}, []
+    for name, pretty, feature, group, unit, kind, alias_list in rows:
+        key = attr_key(name)
+        if key in index:
+            raise ValueError(f"duplicate attribute {name!r}")
+        index[key] = len(attributes)
+        attributes.append([name, pretty, _id("features", feature),
+                           _id("groups", group), _id("units", unit),
+                           _id("kinds", kind)])
+        aliases.extend((attr_key(a), index[key]) for a in alias_list)
+    # Attribute names win over aliases; the first alias claiming a key wins
+    for key, row in aliases:
+        index.setdefault(key, row)
+    return {"version": "GDTF 1.1", **tables,
+            "attributes": attributes, "index": index}
+
+
+def render(index):
+    return json.dumps(index, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("--check", action="store_true",
+                    help="verify the prebuilt index matches the source table")
+    args = ap.parse_args(argv)
+    text = render(build_index(read_source()))
+    if args.check:
+        try:
+            with open(ATTRIBUTE_INDEX_PATH, encoding="utf-8") as f:
+                current = f.read()
+        except OSError:
+            current = ""
+        if current != text:
+            print(f"{ATTRIBUTE_INDEX_PATH} is stale — run {sys.argv[0]}")
+            return 1
+        return 0
+    with open(ATTRIBUTE_INDEX_PATH, "w", encoding="utf-8") as f:
+        f.write(text)
+    data = json.loads(text)
+    print(f"{len(data['attributes'])} attributes · {len(data['index'])} keys · "
+          f"{len(text):,} bytes → {ATTRIBUTE_INDEX_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,901 +4,146 @@ MA3 / Vectorworks / Capture / Onyx compatible
 """
 
 import streamlit as st
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-import zipfile, io, uuid, re, copy
-
-# ══════════════════════════════════════════════════════════════════════════════
-#  GDTF ATTRIBUTE MAP
-# ══════════════════════════════════════════════════════════════════════════════
-ATTR_MAP = {
-    "dimmer":           ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
-    "intensity":        ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
-    "master":           ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
-    "pan":              ("Pan",                 "Position", "Position",  "PanTilt"),
-    "tilt":             ("Tilt",                "Position", "Position",  "PanTilt"),
-    "pan speed":        ("PanRotate",           "Position", "Position",  "PanTilt"),
-    "tilt speed":       ("TiltRotate",          "Position", "Position",  "PanTilt"),
-    "red":              ("ColorAdd_R",          "Color",    "Color",     "RGB"),
-    "green":            ("ColorAdd_G",          "Color",    "Color",     "RGB"),
-    "blue":             ("ColorAdd_B",          "Color",    "Color",     "RGB"),
-    "white":            ("ColorAdd_W",          "Color",    "Color",     "RGBW"),
-    "amber":            ("ColorAdd_A",          "Color",    "Color",     "RGBW"),
-    "lime":             ("ColorAdd_L",          "Color",    "Color",     "RGBW"),
-    "uv":               ("ColorAdd_UV",         "Color",    "Color",     "RGBW"),
-    "indigo":           ("ColorAdd_I",          "Color",    "Color",     "RGBW"),
-    "cyan":             ("ColorSub_C",          "Color",    "Color",     "CMY"),
-    "magenta":          ("ColorSub_M",          "Color",    "Color",     "CMY"),
-    "yellow":           ("ColorSub_Y",          "Color",    "Color",     "CMY"),
-    "cto":              ("CTO",                 "Color",    "Color",     "CTO"),
-    "ctb":              ("CTB",                 "Color",    "Color",     "CTB"),
-    "hue":              ("CIE_X",              "Color",    "Color",     "HSB"),
-    "saturation":       ("CIE_Y",              "Color",    "Color",     "HSB"),
-    "color wheel":      ("Color1",             "Color",    "Color",     "ColorWheel"),
-    "colour wheel":     ("Color1",             "Color",    "Color",     "ColorWheel"),
-    "color":            ("Color1",             "Color",    "Color",     "ColorWheel"),
-    "colour":           ("Color1",             "Color",    "Color",     "ColorWheel"),
-    "color mix":        ("ColorMixMode",       "Color",    "Color",     "ColorWheel"),
-    "shutter":          ("Shutter1",           "Beam",     "Beam",      "Shutter"),
-    "strobe":           ("Shutter1Strobe",     "Beam",     "Beam",      "Shutter"),
-    "strobe rate":      ("Shutter1StrobeFreq", "Beam",     "Beam",      "Shutter"),
-    "strobe speed":     ("Shutter1StrobeFreq", "Beam",     "Beam",      "Shutter"),
-    "zoom":             ("Zoom",               "Beam",     "Beam",      "Zoom"),
-    "focus":            ("Focus1",             "Beam",     "Beam",      "Focus"),
-    "iris":             ("Iris",               "Beam",     "Beam",      "Iris"),
-    "frost":            ("Frost1",             "Beam",     "Beam",      "Frost"),
-    "diffusion":        ("Frost1",             "Beam",     "Beam",      "Frost"),
-    "gobo":             ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
-    "gobo wheel":       ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
-    "gobo 1":           ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
-    "gobo 2":           ("Gobo2",             "Gobo",     "Gobo",      "Gobo"),
-    "gobo rotation":    ("Gobo1Pos",          "Gobo",     "Gobo",      "Gobo"),
-    "gobo spin":        ("Gobo1PosRotate",    "Gobo",     "Gobo",      "Gobo"),
-    "gobo index":       ("Gobo1Pos",          "Gobo",     "Gobo",      "Gobo"),
-    "prism":            ("Prism1",            "Beam",     "Beam",      "Prism"),
-    "prism rotation":   ("Prism1Pos",         "Beam",     "Beam",      "Prism"),
-    "effects":          ("Effects1",          "Beam",     "Beam",      "Effects"),
-    "effect":           ("Effects1",          "Beam",     "Beam",      "Effects"),
-    "animation":        ("Effects1",          "Beam",     "Beam",      "Effects"),
-    "effects speed":    ("EffectsSpeed",      "Beam",     "Beam",      "Effects"),
-    "effects fade":     ("EffectsFade",       "Beam",     "Beam",      "Effects"),
-    "blade 1":          ("Blade1A",           "Shapers",  "Shapers",   "Blade"),
-    "blade 2":          ("Blade2A",           "Shapers",  "Shapers",   "Blade"),
-    "blade 3":          ("Blade3A",           "Shapers",  "Shapers",   "Blade"),
-    "blade 4":          ("Blade4A",           "Shapers",  "Shapers",   "Blade"),
-    "blade rotation":   ("ShaperRot",         "Shapers",  "Shapers",   "Blade"),
-    "macro":            ("Macro",             "Control",  "Control",   "Macro"),
-    "scene":            ("Macro",             "Control",  "Control",   "Macro"),
-    "program":          ("Macro",             "Control",  "Control",   "Macro"),
-    "function":         ("Function",          "Control",  "Control",   "Function"),
-    "control":          ("Function",          "Control",  "Control",   "Function"),
-    "reset":            ("Function",          "Control",  "Control",   "Function"),
-    "lamp":             ("LampControl",       "Control",  "Control",   "Function"),
-    "fans":             ("Function",          "Control",  "Control",   "Function"),
-    "speed":            ("EffectsSpeed",      "Beam",     "Beam",      "Effects"),
-    "video":            ("VideoEffect1Type",  "Control",  "Control",   "Function"),
-    "media":            ("VideoEffect1Type",  "Control",  "Control",   "Function"),
-}
-
-WHEEL_ATTRS = {
-    "Color1", "Color2", "Gobo1", "Gobo2", "Gobo1Pos", "Gobo2Pos",
-    "Prism1", "Effects1", "Animation1", "Macro", "LampControl",
-    "Function", "Shutter1", "Shutter1Strobe",
-}
-
-# Channels that are continuous (no DMX slots needed)
-CONTINUOUS = {
-    "Dimmer", "Dimmer Fine", "Pan", "Pan Fine", "Tilt", "Tilt Fine",
-    "Red", "Green", "Blue", "White", "Amber", "Lime", "UV", "Indigo",
-    "Cyan", "Magenta", "Yellow", "CTO", "CTB", "Hue", "Saturation",
-    "Zoom", "Zoom Fine", "Focus", "Focus Fine", "Iris",
-    "Pan Speed", "Tilt Speed", "Effects Speed", "Effects Fade",
-    "Gobo Rotation", "Gobo Spin", "Gobo Index", "Prism Rotation",
-    "Blade 1", "Blade 2", "Blade 3", "Blade 4", "Blade Rotation",
-}
-
-PRESETS = {
-    "Shutter": [
-        (0,9,"Closed"),(10,19,"Open"),
-        (20,129,"Strobe Slow-Fast"),(130,139,"Open"),
-        (140,189,"Pulse"),(190,199,"Open"),
-        (200,249,"Random Strobe"),(250,255,"Open"),
-    ],
-    "Strobe": [(0,9,"Closed"),(10,19,"Open"),(20,255,"Strobe Slow-Fast")],
-    "Macro": [
-        (0,9,"Off"),(10,19,"Macro 1"),(20,29,"Macro 2"),
-        (30,39,"Macro 3"),(40,49,"Macro 4"),(50,59,"Macro 5"),
-    ],
-    "Function": [
-        (0,9,"No Function"),(10,19,"Reset"),
-        (20,29,"Lamp On"),(30,39,"Lamp Off"),
-    ],
-    "Control": [
-        (0,9,"No Function"),(10,19,"Reset"),
-        (20,29,"Lamp On"),(30,39,"Lamp Off"),
-    ],
-    "Color Wheel": [
-        (0,9,"Open"),(10,19,"Color 1"),(20,29,"Color 2"),
-        (30,39,"Color 3"),(40,49,"Color 4"),(50,59,"Color 5"),
-        (60,69,"Color 6"),(70,79,"Color 7"),(80,89,"Color 8"),
-    ],
-    "Colour Wheel": [
-        (0,9,"Open"),(10,19,"Color 1"),(20,29,"Color 2"),
-        (30,39,"Color 3"),(40,49,"Color 4"),(50,59,"Color 5"),
-    ],
-    "Gobo Wheel": [
-        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
-        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
-        (60,69,"Gobo 6"),(70,79,"Gobo 7"),
-    ],
-    "Gobo 1": [
-        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
-        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
-    ],
-    "Gobo 2": [
-        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
-        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
-    ],
-    "Prism": [(0,9,"No Prism"),(10,255,"Prism")],
-    "Effects": [
-        (0,9,"No Effect"),(10,19,"Effect 1"),
-        (20,29,"Effect 2"),(30,39,"Effect 3"),
-    ],
-    "Scene": [
-        (0,9,"Off"),(10,19,"Scene 1"),(20,29,"Scene 2"),
-        (30,39,"Scene 3"),(40,49,"Scene 4"),(50,59,"Scene 5"),
-    ],
-    "Program": [
-        (0,9,"Off"),(10,19,"Program 1"),(20,29,"Program 2"),
-        (30,39,"Program 3"),(40,49,"Program 4"),
-    ],
-}
-
-CHANNEL_CATALOGUE = {
-    "DIMMING": [("Dimmer",False),("Dimmer Fine",True)],
-    "POSITION": [
-        ("Pan",False),("Pan Fine",True),
-        ("Tilt",False),("Tilt Fine",True),
-        ("Pan Speed",False),("Tilt Speed",False),
-    ],
-    "COLOR — RGB/W": [
-        ("Red",False),("Green",False),("Blue",False),
-        ("White",False),("Amber",False),("Lime",False),
-        ("UV",False),("Indigo",False),
-    ],
-    "COLOR — CMY": [("Cyan",False),("Magenta",False),("Yellow",False)],
-    "COLOR — MISC": [
-        ("CTO",False),("CTB",False),
-        ("Hue",False),("Saturation",False),
-        ("Color Wheel",False),("Color Mix",False),
-    ],
-    "BEAM": [
-        ("Shutter",False),("Strobe",False),("Strobe Speed",False),
-        ("Zoom",False),("Zoom Fine",True),
-        ("Focus",False),("Focus Fine",True),
-        ("Iris",False),("Frost",False),("Diffusion",False),
-    ],
-    "GOBO": [
-        ("Gobo Wheel",False),("Gobo 1",False),("Gobo 2",False),
-        ("Gobo Rotation",False),("Gobo Index",False),("Gobo Spin",False),
-    ],
-    "PRISM / EFFECTS": [
-        ("Prism",False),("Prism Rotation",False),
-        ("Effects",False),("Effects Speed",False),
-        ("Effects Fade",False),("Animation",False),
-    ],
-    "SHAPERS": [
-        ("Blade 1",False),("Blade 2",False),
-        ("Blade 3",False),("Blade 4",False),
-        ("Blade Rotation",False),
-    ],
-    "CONTROL": [
-        ("Macro",False),("Scene",False),("Program",False),
-        ("Function",False),("Control",False),("Reset",False),
-        ("Lamp",False),("Fans",False),("Speed",False),
-    ],
-}
-
-
-# ══════════════════════════════════════════════════════════════════════════════
-#  DATA STRUCTURES
-# ══════════════════════════════════════════════════════════════════════════════
-
-class ChannelSlot:
-    def __init__(self, name, dmx_from, dmx_to,
-                 physical_from=0.0, physical_to=1.0, slot_name=""):
-        self.name          = name
-        self.dmx_from      = dmx_from
-        self.dmx_to        = dmx_to
-        self.physical_from = physical_from
-        self.physical_to   = physical_to
-        self.slot_name     = slot_name or name
-
-class ChannelDef:
-    def __init__(self, name, is_fine_byte=False, slots=None, geometry="body"):
-        self.name         = name
-        self.is_fine_byte = is_fine_byte
-        self.slots        = slots or []
-        self.geometry     = geometry  # "body" | "cell" | "virtual"
+import io, os, re, sys, copy, pickle, hashlib, time, atexit, shutil, functools, tempfile, contextlib
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from gdtf_core import (
+    ATTR_MAP, PRESETS, CHANNEL_CATALOGUE,
+    is_known_channel, is_continuous_channel, is_wheel_attr, attribute_record,
+    attr_key, all_attributes,
+    resolve_attr, is_fine, _new_channel_id, make_channel_entry,
+    make_slot_entry, channel_defs_from_mode, parse_dmx_chart,
+    EMITTERS, History, CellLayout, parse_cell_layout_csv,
+    MediaStore, BuildStore, GenerateJob, XmlIndex,
+    channel_lint_key, lint_channel_list, lint_wheel_consistency, lint_footprint,
+    compile_fixture, PatchRules, plan_patch, patch_summary, patch_plan_csv,
+    patch_plan_json, channel_suggestions, workspace_index,
+    BATCH_OPS, channel_locations, batch_edit,
+    Workspace, WorkspaceJob, pack_fixture, unpack_modes,
+)
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  HELPERS
+#  STREAMLIT PAGE CONFIG
 # ══════════════════════════════════════════════════════════════════════════════
 
-def resolve_attr(raw):
-    clean = raw.lower().strip()
-    if clean in ATTR_MAP:
-        return ATTR_MAP[clean]
-    for key, val in ATTR_MAP.items():
-        if key in clean:
-            return val
-    safe = re.sub(r'[^A-Za-z0-9_]', '_', raw.strip()) or "Custom"
-    return (safe, "Control", "Control", safe)
-
-def is_fine(name):
-    return any(w in name.lower()
-               for w in ["fine", " lsb", "16-bit", "16bit", "low byte"])
-
-def _safe(text, fallback="Ch"):
-    s = text.strip()
-    for old, new in [("°","deg"),("%","pct"),("/","_"),(".","_"),
-                     (":","_"),(";","_")]:
-        s = s.replace(old, new)
-    s = re.sub(r'[^A-Za-z0-9_ \-]', '', s)
-    s = re.sub(r'[ _]+', '_', s).strip('_')
-    if not s or s[0].isdigit():
-        s = fallback + "_" + s
-    return s or fallback
-
-def _guid():
-    raw = uuid.uuid4().hex.upper()
-    return f"{raw[:8]}-{raw[8:12]}-{raw[12:16]}-{raw[16:20]}-{raw[20:]}"
-
-def _new_channel_id():
-    return uuid.uuid4().hex[:8]
-
-def make_channel_entry(name, fine=False, geometry="body"):
-    return {"id": _new_channel_id(), "name": name,
-            "is_fine": fine, "slots": [], "geometry": geometry}
-
-def make_slot_entry(dmx_from=0, dmx_to=10, name=""):
-    return {"dmx_from": dmx_from, "dmx_to": dmx_to, "name": name}
-
-def _ch_list_to_defs(ch_list):
-    """Convert a list of channel dicts to ChannelDef objects."""
-    defs = []
-    for ch in ch_list:
-        slots = [
-            ChannelSlot(
-                name=s["name"],
-                dmx_from=int(s["dmx_from"]),
-                dmx_to=int(s["dmx_to"]),
-                physical_from=round(int(s["dmx_from"]) / 255, 6),
-                physical_to=round(int(s["dmx_to"]) / 255, 6),
-                slot_name=s["name"],
-            )
-            for s in ch.get("slots", [])
-            if s.get("name", "").strip()
-        ]
-        defs.append(ChannelDef(
-            name=ch["name"],
-            is_fine_byte=ch.get("is_fine", False),
-            slots=slots,
-        ))
-    return defs
-
-
-def channel_defs_from_mode(mode):
-    """Returns (body_defs, cell_defs) — two independent ChannelDef lists."""
-    # Backwards compat: old single channel_list treated as body
-    if "body_channels" not in mode and "cell_channels" not in mode:
-        body = _ch_list_to_defs(mode.get("channel_list", []))
-        return body, []
-    body = _ch_list_to_defs(mode.get("body_channels", []))
-    cell = _ch_list_to_defs(mode.get("cell_channels", []))
-    return body, cell
+st.set_page_config(page_title="GDTF Builder", page_icon="💡",
+                   layout="wide", initial_sidebar_state="collapsed")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  GDTF XML BUILDER
-#  single-geometry (cell_count=1) or multi-cell pixel bar (cell_count>=2)
-#  DMX slots -> ChannelFunction (full range) + ChannelSet per slot
+#  RENDER PROFILER  — opt-in, see the "Render profiler" panel at the bottom
+#  profile_mark() splits the script into top-level sections; profile_section()
+#  times nested blocks (mode cards, channel lists, picker) under the current
+#  mark. Each section records wall time and the widgets it created.
+#  Widget counts and fragment detection read private ScriptRunContext state
+#  (checked against the Streamlit range pinned in requirements.txt). Where a
+#  Streamlit version lacks it they come back None and the panel shows n/a.
 # ══════════════════════════════════════════════════════════════════════════════
 
-def _emit_one_channel(chs_el, ch, safe_mode, wheel_registry,
-                      geometry_name, offset, virtual=False, dmx_break=1):
-    """
-    Emit a single DMXChannel element.
-
-    virtual=True  — Per official GDTF spec example, virtual channels omit
-                    DMXBreak, Offset, Default, and InitialFunction entirely.
-                    Only Highlight and Geometry are present on the element.
-                    LogicalChannel gets Master="Grand".
-
-    dmx_break     — "Overwrite" for real cell channels so the console fills
-                    in the break number from each GeometryReference.
-    """
-    attr, *_ = resolve_attr(ch.name)
-    # InitialFunction: ModeName.GeometryName_Attribute.Attribute.Attribute
-    initial_fn = f"{safe_mode}.{geometry_name}_{attr}.{attr}.{attr}"
-
-    if virtual:
-        # Spec example: <DMXChannel Highlight="255/1" Geometry="Pixel">
-        # No DMXBreak, no Offset, no Default, no InitialFunction
-        ch_el = ET.SubElement(chs_el, "DMXChannel",
-            Highlight="255/1",
-            Geometry=geometry_name)
-        log_el = ET.SubElement(ch_el, "LogicalChannel",
-            Attribute=attr, Snap="No",
-            Master="Grand", MibFade="0", DMXChangeTimeLimit="0")
-        ET.SubElement(log_el, "ChannelFunction",
-            Name=attr, Attribute=attr,
-            OriginalAttribute=_safe(ch.name),
-            DMXFrom="0/1", Default="0/1",
-            PhysicalFrom="0.000000", PhysicalTo="1.000000",
-            RealFade="0", RealAcceleration="0", WheelSlotIndex="0")
-        return ch_el
-
-    if ch.slots:
-        wname = wheel_registry.get(attr, "")
-        ch_el = ET.SubElement(chs_el, "DMXChannel",
-            DMXBreak=str(dmx_break), Offset=str(offset),
-            Default="0/1", Highlight="255/1",
-            Geometry=geometry_name, InitialFunction=initial_fn)
-        log_el = ET.SubElement(ch_el, "LogicalChannel",
-            Attribute=attr, Snap="Yes",
-            Master="None", MibFade="0", DMXChangeTimeLimit="0")
-        cf_kw = dict(
-            Name=attr, Attribute=attr,
-            OriginalAttribute=_safe(ch.name),
-            DMXFrom="0/1", Default="0/1",
-            PhysicalFrom="0.000000", PhysicalTo="1.000000",
-            RealFade="0", RealAcceleration="0", WheelSlotIndex="0",
-        )
-        if wname:
-            cf_kw["Wheel"] = wname
-        cf_el = ET.SubElement(log_el, "ChannelFunction", **cf_kw)
-        for slot_idx, slot in enumerate(ch.slots):
-            cs_kw = dict(
-                Name=_safe(slot.name, f"Set{slot_idx+1}"),
-                DMXFrom=f"{slot.dmx_from}/1",
-                PhysicalFrom=f"{slot.physical_from:.6f}",
-                PhysicalTo=f"{slot.physical_to:.6f}",
-            )
-            if wname:
-                cs_kw["WheelSlotIndex"] = str(slot_idx + 1)
-            ET.SubElement(cf_el, "ChannelSet", **cs_kw)
-    else:
-        ch_el = ET.SubElement(chs_el, "DMXChannel",
-            DMXBreak=str(dmx_break), Offset=str(offset),
-            Default="0/1", Highlight="255/1",
-            Geometry=geometry_name, InitialFunction=initial_fn)
-        log_el = ET.SubElement(ch_el, "LogicalChannel",
-            Attribute=attr, Snap="No",
-            Master="None", MibFade="0", DMXChangeTimeLimit="0")
-        ET.SubElement(log_el, "ChannelFunction",
-            Name=attr, Attribute=attr,
-            OriginalAttribute=_safe(ch.name),
-            DMXFrom="0/1", Default="0/1",
-            PhysicalFrom="0.000000", PhysicalTo="1.000000",
-            RealFade="0", RealAcceleration="0", WheelSlotIndex="0")
-
-    return ch_el
-
-
-
-def _emit_channels_for_geometry(chs_el, channels, safe_mode,
-                                wheel_registry, geometry_name, start_offset,
-                                dmx_break=1):
-    """
-    Emit a list of ChannelDef objects to geometry_name. Returns next offset.
-    dmx_break — the DMXBreak value written on each channel element.
-      Body channels use dmx_break=1.
-      Cell_N channels use dmx_break=N+1 to match their GeometryReference Break=N+1.
-      MA3 uses this to assign addresses per sub-fixture when patching.
-    """
-    offset = start_offset
-    prev_ch_el = None
-    prev_offset_start = None
-
-    for ch in channels:
-        if not ch.name.strip():
-            continue
-        if ch.is_fine_byte:
-            if prev_ch_el is not None:
-                prev_ch_el.set("Offset", f"{prev_offset_start},{offset}")
-            offset += 1
-            prev_ch_el = None
-            continue
-
-        # Virtual = channel named "virtual dimmer" — no DMX address,
-        # Offset="None", Master="Grand", Relations multiply onto colour channels
-        virtual = "virtual" in ch.name.lower()
-        ch_el = _emit_one_channel(chs_el, ch, safe_mode, wheel_registry,
-                                  geometry_name, offset, virtual=virtual,
-                                  dmx_break=dmx_break)
-        if not virtual:
-            prev_ch_el = ch_el
-            prev_offset_start = offset
-            offset += 1
-        # virtual channels don't consume a DMX offset
-
-    return offset
-
-
-def build_gdtf(fixture_name, manufacturer, modes_dict, cell_count=1):
-    """
-    modes_dict values are (body_defs, cell_defs) tuples.
-    cell_count=1  -> single Body geometry, body_defs only (par, wash, strobe)
-    cell_count>=2 -> pixel bar: body_defs to Body once, cell_defs to Cell_N × N
-    MA3 treats each Cell_N as a pixel-mappable element with independent wheels.
-    """
-    multi_cell = cell_count >= 2
-    root = ET.Element("GDTF", DataVersion="1.1")
-
-    safe_name  = _safe(fixture_name, "Fixture")
-    safe_short = re.sub(r'[^A-Z0-9]', '', safe_name.upper())[:8] or "FIXTURE"
-    safe_mfr   = _safe(manufacturer, "Generic")
-
-    ft = ET.SubElement(root, "FixtureType",
-        Name=safe_name, ShortName=safe_short, LongName=safe_name,
-        Manufacturer=safe_mfr, Description="Generated by GDTF Builder",
-        FixtureTypeID=_guid(), Thumbnail="", RefFT="",
-        CanHaveChildren="Yes" if multi_cell else "No")
-
-    # Collect used attributes from both body and cell channel lists
-    used_attrs = {}
-    for body_chs, cell_chs in modes_dict.values():
-        for ch in body_chs + cell_chs:
-            if not ch.is_fine_byte and ch.name.strip():
-                attr, fg, feat, ag = resolve_attr(ch.name)
-                used_attrs[attr] = (fg, feat, ag)
-
-    # AttributeDefinitions
-    attr_defs = ET.SubElement(ft, "AttributeDefinitions")
-    ag_xml = ET.SubElement(attr_defs, "ActivationGroups")
-    ag_seen = set()
-    for _, (fg, feat, ag) in used_attrs.items():
-        if ag not in ag_seen:
-            ET.SubElement(ag_xml, "ActivationGroup", Name=ag)
-            ag_seen.add(ag)
-    fg_xml = ET.SubElement(attr_defs, "FeatureGroups")
-    fg_used = {}
-    for _, (fg, feat, ag) in used_attrs.items():
-        fg_used.setdefault(fg, set()).add(feat)
-    for fg_name, feats in fg_used.items():
-        fg_el = ET.SubElement(fg_xml, "FeatureGroup", Name=fg_name, Pretty=fg_name)
-        for f in sorted(feats):
-            ET.SubElement(fg_el, "Feature", Name=f)
-    attrs_xml = ET.SubElement(attr_defs, "Attributes")
-    for attr, (fg, feat, ag) in used_attrs.items():
-        ET.SubElement(attrs_xml, "Attribute",
-            Name=attr, Pretty=attr, ActivationGroup=ag,
-            Feature=f"{fg}.{feat}", PhysicalUnit="None",
-            Color="0.3127,0.3290,100.000000")
-
-    # Wheels — body and cell are independent, so collect separately.
-    # Each geometry can have its own wheel with the same attribute name.
-    # We prefix cell wheels with "Cell_" to avoid name clashes with body wheels.
-    body_wheel_registry = {}
-    cell_wheel_registry = {}
-    for body_chs, cell_chs in modes_dict.values():
-        for ch in body_chs:
-            if ch.is_fine_byte or not ch.slots:
-                continue
-            attr, *_ = resolve_attr(ch.name)
-            if attr not in WHEEL_ATTRS or attr in body_wheel_registry:
-                continue
-            body_wheel_registry[attr] = _safe(ch.name, attr)
-        for ch in cell_chs:
-            if ch.is_fine_byte or not ch.slots:
-                continue
-            attr, *_ = resolve_attr(ch.name)
-            if attr not in WHEEL_ATTRS or attr in cell_wheel_registry:
-                continue
-            cell_wheel_registry[attr] = "Cell_" + _safe(ch.name, attr)
-
-    # Combined registry for emit function — cell takes precedence if same attr
-    wheel_registry = {**body_wheel_registry, **cell_wheel_registry}
-
-    wheels_el = ET.SubElement(ft, "Wheels")
-
-    def _emit_wheel(ch_list, registry):
-        for ch in ch_list:
-            if ch.is_fine_byte or not ch.slots:
-                continue
-            attr, *_ = resolve_attr(ch.name)
-            wname = registry.get(attr)
-            if not wname:
-                continue
-            if wheels_el.find(f"Wheel[@Name='{wname}']") is not None:
-                continue
-            wheel_el = ET.SubElement(wheels_el, "Wheel", Name=wname)
-            ET.SubElement(wheel_el, "Slot", Name="Open",
-                          Color="0.3127,0.3290,100.000000", MediaFileName="")
-            for slot in ch.slots:
-                ET.SubElement(wheel_el, "Slot",
-                              Name=_safe(slot.slot_name, "Slot"),
-                              Color="0.3127,0.3290,100.000000", MediaFileName="")
-
-    for body_chs, cell_chs in modes_dict.values():
-        _emit_wheel(body_chs, body_wheel_registry)
-        _emit_wheel(cell_chs, cell_wheel_registry)
-
-    # Physical / Models
-    phys = ET.SubElement(ft, "PhysicalDescriptions")
-    ET.SubElement(phys, "Emitters")
-    ET.SubElement(phys, "Filters")
-    ET.SubElement(phys, "DMXProfiles")
-    ET.SubElement(phys, "CRIs")
-    ET.SubElement(ft, "Models")
-
-    # Geometries
-    # ── Official GDTF spec pattern (from gdtf.eu DMX Mode Collect Listing 1) ─
-    #
-    #  <Geometry Name="Body">              root — DMXMode Geometry="Body"
-    #    <Geometry Name="Pixel">           cell template (child of Body)
-    #      <GeometryReference             N instances, each with a <Break> child
-    #         Name="Pixel_1"
-    #         Geometry="Pixel">           ← references Pixel template by name
-    #        <Break DMXOffset="1"/>        ← required child element per spec
-    #      </GeometryReference>
-    #      ...
-    #    </Geometry>
-    #  </Geometry>
-    #
-    #  Body channels:  DMXBreak="1"         Geometry="Body"
-    #  Cell channels:  DMXBreak="Overwrite" Geometry="Pixel"  Offset="1","2"...
-    #    "Overwrite" = the console replaces this with the GeometryReference's
-    #    break number at patch time → each cell sub-fixture gets its own break
-    #
-    IDENTITY = "1,0,0,0 0,1,0,0 0,0,1,0 0,0,0,1"
-    geos = ET.SubElement(ft, "Geometries")
-    if not multi_cell:
-        ET.SubElement(geos, "Geometry", Name="Body", Model="", Position=IDENTITY)
+_PROF_KEEP = 60
+
+def _widget_count():
+    """Widgets registered so far this run, or None if Streamlit hides it."""
+    ids = getattr(getattr(get_script_run_ctx(), "shared", None),
+                  "widget_ids_this_run", None)
+    data = getattr(ids, "_data", None)
+    return len(data) if isinstance(data, (set, dict, frozenset)) else None
+
+def _in_fragment_rerun():
+    """True in a fragment-only rerun; None if Streamlit no longer says."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and not hasattr(ctx, "fragment_ids_this_run"):
+        return None
+    return bool(getattr(ctx, "fragment_ids_this_run", None))
+
+def _prof_add(path, seconds, widgets):
+    row = st.session_state["_prof_run"].setdefault(
+        path, {"ms": 0.0, "widgets": 0, "calls": 0})
+    row["ms"]    += seconds * 1000
+    row["calls"] += 1
+    if widgets is None or row["widgets"] is None:
+        row["widgets"] = None
     else:
-        # Both Body and Pixel are top-level geometries (siblings in <Geometries>).
-        # Body — shared/parent channels, DMXMode points here.
-        ET.SubElement(geos, "Geometry", Name="Body",
-                      Model="", Position=IDENTITY)
-        # Pixel — cell template, also top-level (NOT a child of Body).
-        ET.SubElement(geos, "Geometry", Name="Pixel",
-                      Model="", Position=IDENTITY)
-        # GeometryReferences are top-level siblings of Body and Pixel.
-        # Per the official GDTF spec example, these are plain elements with no
-        # child <Break> nodes — those are only needed for split-channel use cases.
-        # The DMXBreak="Overwrite" on cell channels is what links them to these refs.
-        for n in range(1, cell_count + 1):
-            x   = (n - 1) * 0.1
-            pos = f"1,0,0,0 0,1,0,0 0,0,1,0 {x:.3f},0,0,1"
-            ET.SubElement(geos, "GeometryReference",
-                          Name=f"Pixel_{n}", Position=pos,
-                          Geometry="Pixel")
-
-    # DMX Modes
-    dmx_modes_el = ET.SubElement(ft, "DMXModes")
-    for mode_name, (body_chs, cell_chs) in modes_dict.items():
-        safe_mode = _safe(mode_name, "Mode")
-        # DMXMode always points to Body (the root geometry)
-        mode_el = ET.SubElement(dmx_modes_el, "DMXMode",
-                                Name=safe_mode, Geometry="Body")
-        chs_el  = ET.SubElement(mode_el, "DMXChannels")
-
-        if not multi_cell:
-            # Single geometry — body channels to Body, Break=1
-            _emit_channels_for_geometry(
-                chs_el, body_chs, safe_mode,
-                body_wheel_registry, "Body",
-                start_offset=1, dmx_break=1)
-        else:
-            # Body channels — Break=1, Geometry="Body"
-            _emit_channels_for_geometry(
-                chs_el, body_chs, safe_mode,
-                body_wheel_registry, "Body",
-                start_offset=1, dmx_break=1)
-            # Virtual dimmer(s) — Geometry="Pixel", NO DMXBreak (defaults to 1),
-            # Offset="None". Per spec example the virtual channel has no Break attr.
-            virt_chs = [c for c in cell_chs if "virtual" in c.name.lower()]
-            real_chs = [c for c in cell_chs if "virtual" not in c.name.lower()]
-            # Virtual channels emitted first, with default break (1)
-            _emit_channels_for_geometry(
-                chs_el, virt_chs, safe_mode,
-                cell_wheel_registry, "Pixel",
-                start_offset=1, dmx_break=1)
-            # Real cell channels — DMXBreak="Overwrite", Offset=1,2,3...
-            # "Overwrite" = console fills in the break from each GeometryReference
-            _emit_channels_for_geometry(
-                chs_el, real_chs, safe_mode,
-                cell_wheel_registry, "Pixel",
-                start_offset=1, dmx_break="Overwrite")
-
-        # Relations — virtual dimmer multiplies each cell colour channel
-        # Per GDTF spec: Relation Type="Multiply" links virtual Dimmer (Master)
-        # to each real colour ChannelFunction (Follower) so the console can
-        # scale all colours together as a single intensity control.
-        relations_el = ET.SubElement(mode_el, "Relations")
-        virt_chs = [c for c in cell_chs
-                    if "virtual" in c.name.lower() and not c.is_fine_byte]
-        real_color_chs = [c for c in cell_chs
-                          if "virtual" not in c.name.lower() and not c.is_fine_byte]
-        if virt_chs and real_color_chs:
-            virt_ch = virt_chs[0]
-            v_attr, *_ = resolve_attr(virt_ch.name)
-            # DMXChannel node name = Geometry_Attribute (per GDTF spec)
-            # Master path: ModeName.Geometry_Attribute
-            master_node = f"{safe_mode}.Pixel_{v_attr}"
-            for color_ch in real_color_chs:
-                c_attr, *_ = resolve_attr(color_ch.name)
-                # Follower path: ModeName.Geometry_Attribute.LogicalChannel.ChannelFunction
-                follower_node = f"{safe_mode}.Pixel_{c_attr}.{c_attr}.{c_attr}"
-                ET.SubElement(relations_el, "Relation",
-                    Name=f"VDim_{c_attr}",
-                    Master=master_node,
-                    Follower=follower_node,
-                    Type="Multiply")
-        ET.SubElement(mode_el, "FTMacros")
-
-    revisions = ET.SubElement(ft, "Revisions")
-    ET.SubElement(revisions, "Revision",
-                  UserID="0", Date="2024-01-01T00:00:00",
-                  Text="Created by GDTF Builder", ModifiedBy="GDTFBuilder")
-    ET.SubElement(ft, "FTPresets")
-    ET.SubElement(ft, "FTRDMInfo")
-
-    raw = ET.tostring(root, encoding="unicode", xml_declaration=False)
-    pretty = minidom.parseString(
-        f'<?xml version="1.0" encoding="UTF-8"?>{raw}'
-    ).toprettyxml(indent="  ", encoding=None)
-    return pretty.replace('<?xml version="1.0" ?>',
-                          '<?xml version="1.0" encoding="UTF-8"?>')
-
-
-def create_gdtf_package(xml_content):
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
-        z.writestr("description.xml", xml_content.encode("utf-8"))
-    return buf.getvalue()
-
-
-# ══════════════════════════════════════════════════════════════════════════════
-#  WHEEL REFERENCE VALIDATOR
-#  Every Wheel= in a ChannelFunction must name a Wheel that exists.
-#  MA3 silently drops channels with broken wheel references on import.
-# ══════════════════════════════════════════════════════════════════════════════
-
-def validate_wheel_references(xml_str):
-    errors = []
+        row["widgets"] += widgets
+
+def profile_begin(kind):
+    if not st.session_state.get("prof_on"):
+        return
+    st.session_state["_prof_run"]   = {}
+    st.session_state["_prof_kind"]  = kind
+    st.session_state["_prof_t0"]    = time.perf_counter()
+    st.session_state["_prof_mark"]  = None
+    st.session_state["_prof_stack"] = []
+
+def profile_mark(name):
+    """Close the running top-level section and open `name` (None closes only)."""
+    if not st.session_state.get("prof_on") or "_prof_run" not in st.session_state:
+        return
+    now, widgets = time.perf_counter(), _widget_count()
+    mark = st.session_state.get("_prof_mark")
+    if mark:
+        _prof_add(mark[0], now - mark[1],
+                  None if None in (widgets, mark[2]) else widgets - mark[2])
+    st.session_state["_prof_mark"]  = (name, now, widgets) if name else None
+    st.session_state["_prof_stack"] = [name] if name else []
+
+def profile_end():
+    if not st.session_state.get("prof_on") or "_prof_run" not in st.session_state:
+        return
+    profile_mark(None)
+    hist = st.session_state.setdefault("_prof_history", [])
+    hist.append({"t": time.strftime("%H:%M:%S"),
+                 "kind": st.session_state["_prof_kind"],
+                 "ms": (time.perf_counter() - st.session_state["_prof_t0"]) * 1000,
+                 "sections": st.session_state.pop("_prof_run")})
+    del hist[:-_PROF_KEEP]
+
+@contextlib.contextmanager
+def profile_section(name):
+    """Time a nested block and count the widgets it creates."""
+    if not st.session_state.get("prof_on") or "_prof_run" not in st.session_state:
+        yield
+        return
+    stack = st.session_state.setdefault("_prof_stack", [])
+    stack.append(name)
+    path = " › ".join(stack)
+    w0, t0 = _widget_count(), time.perf_counter()
     try:
-        root = ET.fromstring(xml_str.encode("utf-8"))
-        ft   = root.find("FixtureType")
-        if ft is None:
-            return ["Could not find FixtureType element"]
-        defined_wheels = {w.get("Name") for w in ft.findall(".//Wheels/Wheel")}
-        for cf in ft.findall(".//ChannelFunction"):
-            wref = cf.get("Wheel")
-            if wref and wref not in defined_wheels:
-                ch_name = cf.get("OriginalAttribute", "?")
-                errors.append(
-                    f"Channel '{ch_name}': references Wheel '{wref}' "
-                    f"which is not defined. Defined: {sorted(defined_wheels) or 'none'}"
-                )
-    except Exception as e:
-        errors.append(f"Validation parse error: {e}")
-    return errors
-
-
-# ══════════════════════════════════════════════════════════════════════════════
-#  STREAMLIT PAGE CONFIG
-# ══════════════════════════════════════════════════════════════════════════════
-
-st.set_page_config(page_title="GDTF Builder", page_icon="💡",
-                   layout="wide", initial_sidebar_state="collapsed")
-
-# Force dark before Streamlit renders — kills white flash
-st.markdown("""
-<style>
-html,body,#root,#root>div,
-[data-testid="stAppViewContainer"],
-[data-testid="stAppViewBlockContainer"],
-[data-testid="block-container"],
-[data-testid="stMain"],
-.main,.block-container,section.main {
-    background-color:#0A0A0A !important;
-    background:#0A0A0A !important;
-}
-[data-testid="stHeader"] {
-    background-color:#0A0A0A !important;
-    border-bottom:1px solid #3A3A3A !important;
-}
-[data-testid="stToolbar"] { background:#0A0A0A !important; }
-::-webkit-scrollbar { width:6px; height:6px; }
-::-webkit-scrollbar-track { background:#0A0A0A; }
-::-webkit-scrollbar-thumb { background:#3A3A3A; border-radius:3px; }
-::-webkit-scrollbar-thumb:hover { background:#E8A000; }
-</style>
-""", unsafe_allow_html=True)
-
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Share+Tech+Mono&family=Barlow:wght@300;400;500;600&display=swap');
-
-:root {
-    --ma-black:    #0A0A0A;
-    --ma-panel:    #1A1A1A;
-    --ma-border:   #3A3A3A;
-    --ma-amber:    #E8A000;
-    --ma-amber-dk: #A06800;
-    --ma-text:     #EBEBEB;
-    --ma-muted:    #AAAAAA;
-    --ma-green:    #00E000;
-    --ma-red:      #FF5555;
-    --ma-blue:     #4AB0FF;
-}
-
-html,body,[class*="css"] {
-    font-family:'Barlow',sans-serif;
-    background:var(--ma-black) !important;
-    color:var(--ma-text);
-}
-h1,h2,h3,h4 {
-    font-family:'Share Tech Mono',monospace;
-    letter-spacing:0.04em;
-    color:var(--ma-amber);
-}
-/* Mobile-friendly max-width and padding */
-.block-container {
-    padding-top:1rem !important;
-    padding-left:1rem !important;
-    padding-right:1rem !important;
-    max-width:900px;
-}
-
-/* ── Inputs ─────────────────────────────────────────────────────────────── */
-div[data-testid="stTextInput"] input,
-div[data-testid="stTextArea"] textarea {
-    background:var(--ma-panel) !important;
-    border:1px solid var(--ma-border) !important;
-    border-radius:3px !important;
-    color:var(--ma-text) !important;
-    font-family:'Share Tech Mono',monospace !important;
-    font-size:0.9rem !important;
-    /* Larger tap target on mobile */
-    min-height:2.4rem !important;
-}
-div[data-testid="stTextInput"] input:focus,
-div[data-testid="stTextArea"] textarea:focus {
-    border-color:var(--ma-amber) !important;
-    box-shadow:0 0 0 2px rgba(232,160,0,0.2) !important;
-}
-div[data-testid="stNumberInput"] input {
-    background:var(--ma-panel) !important;
-    border:1px solid var(--ma-border) !important;
-    color:var(--ma-text) !important;
-    font-family:'Share Tech Mono',monospace !important;
-    min-height:2.4rem !important;
-}
-
-label, .stRadio label, div[data-testid="stWidgetLabel"] {
-    color:#BBBBBB !important;
-    font-size:0.75rem !important;
-    text-transform:uppercase;
-    letter-spacing:0.08em;
-}
-
-/* ── Buttons — larger tap targets on mobile ─────────────────────────────── */
-.stButton>button[kind="primary"] {
-    background:var(--ma-amber);
-    border:1px solid var(--ma-amber);
-    border-bottom:2px solid var(--ma-amber-dk);
-    border-radius:3px; color:#000;
-    font-family:'Share Tech Mono',monospace;
-    font-size:0.85rem; font-weight:700;
-    letter-spacing:0.08em;
-    padding:0.65rem 1.5rem;
-    min-height:2.8rem;
-    text-transform:uppercase;
-    width:100%;
-    transition:background .15s;
-}
-.stButton>button[kind="primary"]:hover { background:#FFB800; }
-
-.stButton>button:not([kind="primary"]) {
-    background:var(--ma-panel);
-    border:1px solid var(--ma-border);
-    border-bottom:2px solid #111;
-    border-radius:3px; color:#CCCCCC;
-    font-family:'Share Tech Mono',monospace;
-    font-size:0.8rem; letter-spacing:0.04em;
-    text-transform:uppercase;
-    min-height:2.6rem;
-    transition:border-color .15s,color .15s;
-}
-.stButton>button:not([kind="primary"]):hover {
-    border-color:var(--ma-amber);
-    color:var(--ma-amber);
-}
-
-/* ── Cards ──────────────────────────────────────────────────────────────── */
-.card {
-    background:var(--ma-panel);
-    border:1px solid var(--ma-border);
-    border-top:2px solid var(--ma-amber);
-    border-radius:3px;
-    padding:0.85rem 1rem;
-    margin-bottom:1rem;
-}
-
-/* ── Badges ─────────────────────────────────────────────────────────────── */
-.badge {
-    display:inline-block; border-radius:2px;
-    padding:3px 8px;
-    font-family:'Share Tech Mono',monospace;
-    font-size:0.7rem; margin:2px; border:1px solid;
-    text-transform:uppercase; letter-spacing:0.04em;
-}
-.b-ok   { color:var(--ma-amber); border-color:#E8A00066; background:#E8A00020; }
-.b-fine { color:var(--ma-blue);  border-color:#4AB0FF66; background:#4AB0FF20; }
-.b-slot { color:var(--ma-green); border-color:#00E00066; background:#00E00020; }
-.b-unk  { color:var(--ma-red);   border-color:#FF555566; background:#FF555520; }
-
-/* ── Info / warn ────────────────────────────────────────────────────────── */
-.info-box {
-    background:#141414; border-left:3px solid var(--ma-amber);
-    border-radius:0 3px 3px 0; padding:0.7rem 1rem;
-    font-size:0.82rem; color:#BBBBBB; margin:0.5rem 0;
-}
-.warn-box {
-    background:#1A1200; border-left:3px solid #D07000;
-    border-radius:0 3px 3px 0; padding:0.7rem 1rem;
-    font-size:0.82rem; color:#D09040; margin:0.5rem 0;
-}
-
-/* ── Channel row ────────────────────────────────────────────────────────── */
-.ch-num {
-    color:var(--ma-amber);
-    font-family:'Share Tech Mono',monospace;
-    font-size:0.82rem;
-    margin-top:0.6rem;
-    text-align:right;
-}
-
-/* ── Slot table ─────────────────────────────────────────────────────────── */
-.slot-row {
-    display:flex; gap:8px; align-items:center;
-    padding:4px 0; border-bottom:1px solid var(--ma-border);
-    font-size:0.78rem; font-family:'Share Tech Mono',monospace;
-}
-.slot-dmx  { color:var(--ma-amber); width:90px; flex-shrink:0; }
-.slot-name { color:#DDDDDD; flex:1; }
-
-/* ── Expanders ──────────────────────────────────────────────────────────── */
-details summary {
-    font-family:'Share Tech Mono',monospace !important;
-    font-size:0.8rem !important; color:#BBBBBB !important;
-    text-transform:uppercase; letter-spacing:0.06em;
-}
-details summary:hover { color:var(--ma-amber) !important; }
-
-hr { border-color:#3A3A3A !important; }
-
-/* ── Mobile tweaks ──────────────────────────────────────────────────────── */
-@media (max-width:640px) {
-    .block-container {
-        padding-left:0.5rem !important;
-        padding-right:0.5rem !important;
-    }
-    h1 { font-size:1.4rem !important; }
-    .stButton>button { min-height:3rem !important; }
-}
-</style>
-""", unsafe_allow_html=True)
+        yield
+    finally:
+        w1 = _widget_count()
+        stack.pop()
+        _prof_add(path, time.perf_counter() - t0,
+                  None if None in (w0, w1) else w1 - w0)
+
+profile_begin("full")
+profile_mark("theme")
+
+# Theme — static/gdtf_theme.css (local font stacks only), served by
+# server.enableStaticServing. Streamlit drops any element a rerun doesn't
+# re-emit, so the <link> goes out every run — ~100 bytes instead of the full
+# stylesheet; the browser fetches the file once and caches it by version.
+# The dark base colours live in .streamlit/config.toml so the very first paint
+# is already dark, before this script has run.
+@st.cache_resource
+def _theme_link():
+    path = os.path.join(APP_DIR, "static", "gdtf_theme.css")
+    with open(path, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:10]
+    return (f'<link rel="stylesheet" '
+            f'href="app/static/gdtf_theme.css?v={version}">')
+
+st.markdown(_theme_link(), unsafe_allow_html=True)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  HEADER
 # ══════════════════════════════════════════════════════════════════════════════
 
+profile_mark("header")
 st.title("GDTF BUILDER")
 st.markdown(
     "<p style='color:#BBBBBB;font-size:0.75rem;margin-top:-0.8rem;"
@@ -909,7 +154,167 @@ st.markdown(
 )
 st.divider()
 
+# ══════════════════════════════════════════════════════════════════════════════
+#  WORKSPACE  — many fixtures per session, one in the editor
+#  Only the open fixture is in the editor's state and on the page; every
+#  fixture is also a FixtureDoc in the Workspace (gdtf_core), which renders
+#  nothing. Switching packs the open fixture and unpacks the next in one
+#  callback, and the fixture list is never rendered whole — recent fixtures
+#  or the best matches for a search — so a rerun costs the same with one
+#  fixture or five hundred.
+# ══════════════════════════════════════════════════════════════════════════════
+
+_WS_HITS = 12
+# Session keys that describe the open fixture rather than the session
+_FIXTURE_SCOPED = ("find_focus", "batch_name", "batch_modes", "batch_report",
+                   "chart_report", "patch_result", "layout_file")
+
+def _default_modes():
+    return [{
+        "id": _new_channel_id(),
+        "name": "Standard Mode",
+        "body_channels": [
+            make_channel_entry("Dimmer"),
+            make_channel_entry("Dimmer Fine", True),
+            make_channel_entry("Strobe"),
+            make_channel_entry("Macro"),
+        ],
+        "cell_channels": [
+            make_channel_entry("Red"),
+            make_channel_entry("Green"),
+            make_channel_entry("Blue"),
+        ],
+    }]
+
+def _layout_state(layout=None, head_layout=None):
+    """Layout widget values that reproduce a cell / head layout."""
+    layout = layout or CellLayout()
+    return {"layout_kind": layout.kind, "layout_px": layout.pitch_x,
+            "layout_py": layout.pitch_y, "layout_cols": layout.columns or 8,
+            "layout_order": layout.order, "layout_radius": layout.radius,
+            "layout_text": "\n".join(",".join(map(repr, p)) for p in layout.points),
+            "head_px": head_layout.pitch_x if head_layout else 0.3}
+
+def _stash_open():
+    """Write the open fixture back to its FixtureDoc."""
+    ss = st.session_state
+    ss.workspace.store(pack_fixture(
+        ss.workspace.active, ss.get("fixture_name", "Generic LED Par"),
+        ss.get("manufacturer", "Generic"), ss.modes, ss.get("cell_count", 1),
+        ss.get("head_count", 1), ss.get("cell_layout"), ss.get("head_layout")))
+
+def _load_fixture(doc):
+    """Put a stored fixture in the editor, with a fresh undo history."""
+    ss = st.session_state
+    ss.modes = unpack_modes(doc)
+    ss.fixture_name, ss.manufacturer = doc.name, doc.manufacturer
+    ss.cell_count, ss.head_count = doc.cell_count, doc.head_count
+    ss.cell_layout, ss.head_layout = doc.cell_layout, doc.head_layout
+    ss.update(_layout_state(doc.cell_layout, doc.head_layout))
+    ss.collapsed_modes = {m.setdefault("id", _new_channel_id()) for m in ss.modes[1:]}
+    ss.history = History(ss.get("undo_depth", 50), ss.modes)
+    for key in list(ss.keys()):
+        if isinstance(key, str) and (key in _FIXTURE_SCOPED or _is_widget_key(key)):
+            del ss[key]
+    ss.workspace.open(doc.id)
+
+def _open_fixture(fixture_id):
+    ws = st.session_state.workspace
+    if fixture_id != ws.active and fixture_id in ws.docs:
+        _stash_open()
+        _load_fixture(ws.docs[fixture_id])
+
+def _new_fixture():
+    ss = st.session_state
+    _stash_open()
+    doc = pack_fixture(_new_channel_id(), f"New Fixture {len(ss.workspace) + 1}",
+                       ss.get("manufacturer", "Generic"), _default_modes())
+    ss.workspace.store(doc)
+    _load_fixture(doc)
+
+def _duplicate_fixture():
+    ss = st.session_state
+    _stash_open()
+    modes = copy.deepcopy(ss.modes)
+    for mode in modes:
+        mode["id"] = _new_channel_id()
+        for part in ("body", "cell", "head"):
+            _fresh_ids(mode.get(f"{part}_channels", []))
+    doc = ss.workspace.docs[ss.workspace.active]
+    doc = pack_fixture(_new_channel_id(), f"{doc.name} (Copy)", doc.manufacturer,
+                       modes, doc.cell_count, doc.head_count, doc.cell_layout,
+                       doc.head_layout)
+    ss.workspace.store(doc)
+    _load_fixture(doc)
+
+def _remove_fixture():
+    ws = st.session_state.workspace
+    if len(ws) > 1:
+        ws.remove(ws.active)
+        _load_fixture((ws.recent() or list(ws))[0])
+
+def _rename_open():
+    ss = st.session_state
+    ss.workspace.rename(ss.workspace.active, ss.fixture_name)
+
+def _find_fixtures(query):
+    """FixtureDocs whose names are closest to query."""
+    ws = st.session_state.workspace
+    by_name = {}
+    for name, fixture_id in ws.names():
+        by_name.setdefault(name, []).append(fixture_id)
+    index = workspace_index(tuple(sorted(by_name)))
+    return [ws.docs[i] for hit in index.search(query, _WS_HITS)
+            for i in by_name[hit.payload]][:_WS_HITS]
+
+if "workspace" not in st.session_state:
+    st.session_state.setdefault("modes", _default_modes())
+    st.session_state.setdefault("fixture_name", "Generic LED Par")
+    st.session_state.workspace = Workspace()
+    st.session_state.workspace.open(_new_channel_id())
+    _stash_open()
+
+profile_mark("workspace")
+_ws = st.session_state.workspace
+with st.expander(f"🗂 WORKSPACE — {len(_ws)} fixture(s) · editing "
+                 f"{st.session_state.get('fixture_name', 'Generic LED Par')}"):
+    wc1, wc2, wc3 = st.columns(3)
+    with wc1:
+        st.button("＋ New fixture", key="ws_new", on_click=_new_fixture,
+                  use_container_width=True)
+    with wc2:
+        st.button("⧉ Duplicate", key="ws_dup", on_click=_duplicate_fixture,
+                  use_container_width=True)
+    with wc3:
+        st.button("🗑 Remove from workspace", key="ws_rm", on_click=_remove_fixture,
+                  disabled=len(_ws) < 2, use_container_width=True,
+                  help="Removes the open fixture — this can't be undone.")
+    ws_query = st.text_input("Find fixture", key="ws_q", label_visibility="collapsed",
+                             placeholder=f"Open a fixture — search {len(_ws)} by name…")
+    if ws_query.strip():
+        ws_docs = _find_fixtures(ws_query)
+        if not ws_docs:
+            st.caption("No fixture name is close to that.")
+    else:
+        ws_docs = [d for d in _ws.recent() if d.id != _ws.active]
+        if ws_docs:
+            st.caption("RECENT")
+    for i, doc in enumerate(ws_docs):
+        oc1, oc2 = st.columns([5, 1])
+        with oc1:
+            st.markdown(
+                f'<p class="ch-num" style="text-align:left;margin-top:0.3rem">'
+                f'<span style="color:#EBEBEB">{doc.name}</span> · {doc.manufacturer} · '
+                f'{doc.n_modes} mode(s) · {doc.n_channels} ch'
+                f'{f" · {doc.cell_count} cells" if doc.cell_count > 1 else ""}</p>',
+                unsafe_allow_html=True)
+        with oc2:
+            st.button("Open", key=f"ws_open_{i}", on_click=_open_fixture,
+                      args=(doc.id,), disabled=doc.id == _ws.active,
+                      use_container_width=True)
+
 # ── Fixture metadata ──────────────────────────────────────────────────────────
+profile_mark("fixture info")
 st.markdown(
     "<p style='color:#BBBBBB;font-family:Share Tech Mono,monospace;"
     "font-size:0.72rem;letter-spacing:0.1em;margin-bottom:0.2rem'>"
@@ -918,11 +323,8 @@ st.markdown(
 )
 fi1, fi2 = st.columns(2)
 with fi1:
-    fixture_name = st.text_input(
-        "MODEL NAME",
-        value=st.session_state.get("fixture_name", "Generic LED Par")
-    )
-    st.session_state["fixture_name"] = fixture_name
+    # Keyed, so the workspace search above sees the new name on this rerun
+    st.text_input("MODEL NAME", key="fixture_name", on_change=_rename_open)
 with fi2:
     manufacturer = st.text_input(
         "MANUFACTURER",
@@ -931,23 +333,36 @@ with fi2:
     st.session_state["manufacturer"] = manufacturer
 
 # ── Pixel bar / multi-cell config ─────────────────────────────────────────────
+profile_mark("multi-cell")
 with st.expander("⬡ MULTI-CELL / PIXEL BAR — expand to configure"):
     st.markdown(
         '''<div class="info-box">
         <b>Single fixture</b> — leave at 1 cell for a standard par, wash, or strobe.<br>
         <b>Pixel bar / multi-head</b> — set cell count to the number of individually
         addressable pixels or heads. Each cell gets its own copy of the channel list
-        in the DMX mode. MA3 enables pixel mapping automatically for multi-cell fixtures.
+        in the DMX mode. MA3 enables pixel mapping automatically for multi-cell fixtures.<br>
+        <b>Moving-head bar</b> — set heads to 2+: each head gets its own head channels
+        (pan, tilt, gobo…) and the cell count becomes pixels <i>per head</i>.
         </div>''',
         unsafe_allow_html=True
     )
-    pc1, pc2 = st.columns([1, 2])
+    pc0, pc1, pc2 = st.columns([1, 1, 2])
+    with pc0:
+        head_count = st.number_input(
+            "HEADS",
+            min_value=1, max_value=1000,
+            value=st.session_state.get("head_count", 1),
+            help="1 = no heads. 2+ = moving-head bar: Body → Head_N → Pixel_N, "
+                 "each template emitted once."
+        )
+        st.session_state["head_count"] = int(head_count)
     with pc1:
         cell_count = st.number_input(
             "NUMBER OF CELLS",
-            min_value=1, max_value=100,
+            min_value=1, max_value=10000,
             value=st.session_state.get("cell_count", 1),
-            help="1 = standard fixture. 2+ = pixel bar / multi-instance."
+            help="1 = standard fixture. 2+ = pixel bar / multi-instance "
+                 "(pixels per head on a multi-head fixture)."
         )
         st.session_state["cell_count"] = int(cell_count)
     with pc2:
@@ -973,6 +388,83 @@ with st.expander("⬡ MULTI-CELL / PIXEL BAR — expand to configure"):
                 unsafe_allow_html=True
             )
 
+    # ── Cell layout — Pixel_N positions used by console pixel mapping ─────────
+    # Widget values are seeded in session state (not value=) so opening a
+    # workspace fixture can set them to its layout
+    for _k, _v in _layout_state().items():
+        st.session_state.setdefault(_k, _v)
+    if int(st.session_state.get("cell_count", 1)) >= 2:
+        lc1, lc2, lc3, lc4 = st.columns(4)
+        with lc1:
+            kind = st.selectbox(
+                "CELL LAYOUT", ["line", "grid", "ring", "custom"],
+                format_func={"line": "Line", "grid": "Grid / matrix",
+                             "ring": "Ring", "custom": "Measured (CSV)"}.get,
+                key="layout_kind")
+        layout = CellLayout(kind)
+        if kind in ("line", "grid"):
+            with lc2:
+                px = st.number_input("PITCH X (m)", min_value=0.0,
+                                     step=0.01, format="%.3f", key="layout_px")
+            layout = layout._replace(pitch_x=px)
+        if kind == "grid":
+            with lc3:
+                py = st.number_input("PITCH Y (m)", min_value=0.0,
+                                     step=0.01, format="%.3f", key="layout_py")
+                cols = st.number_input("COLUMNS", min_value=1, max_value=10000,
+                                       key="layout_cols")
+            with lc4:
+                order = st.radio("ORDER", ["raster", "serpentine"],
+                                 key="layout_order",
+                                 help="Serpentine reverses every other row — "
+                                      "the usual zig-zag LED matrix wiring.")
+            layout = layout._replace(pitch_y=py, columns=int(cols), order=order)
+        elif kind == "ring":
+            with lc2:
+                radius = st.number_input("RADIUS (m)", min_value=0.0,
+                                         step=0.01, format="%.3f",
+                                         key="layout_radius")
+            layout = layout._replace(radius=radius)
+        elif kind == "custom":
+            with lc2:
+                st.file_uploader("LAYOUT CSV", type=["csv", "tsv", "txt"],
+                                 key="layout_file")
+            with lc3:
+                st.text_area("…OR PASTE x,y[,z]", key="layout_text", height=110,
+                             placeholder="x,y,z\n0,0,0\n0.05,0,0\n0.10,0.02,0")
+            upload = st.session_state.get("layout_file")
+            text   = (upload.getvalue().decode("utf-8-sig") if upload is not None
+                      else st.session_state.get("layout_text", ""))
+            try:
+                layout = parse_cell_layout_csv(text.splitlines())
+            except ValueError as e:
+                layout = CellLayout("custom")
+                st.markdown(f'<div class="warn-box">⚠ {e}</div>',
+                            unsafe_allow_html=True)
+            with lc4:
+                n_pts = len(layout.points)
+                st.markdown(
+                    f'<p style="color:{"var(--ma-amber)" if n_pts >= n else "#FF5555"};'
+                    f'font-family:Share Tech Mono,monospace;font-size:0.82rem;'
+                    f'margin-top:1.8rem">{n_pts} / {n} cell positions</p>',
+                    unsafe_allow_html=True)
+        st.session_state["cell_layout"] = layout
+
+    # ── Head layout — Head_N positions, each head's pixels laid out as above ──
+    if int(st.session_state.get("head_count", 1)) >= 2:
+        hl1, hl2 = st.columns([1, 3])
+        with hl1:
+            hpx = st.number_input("HEAD PITCH X (m)", min_value=0.0,
+                                  step=0.01, format="%.3f", key="head_px")
+        with hl2:
+            st.markdown(
+                f'<p style="color:var(--ma-amber);font-family:Share Tech Mono,'
+                f'monospace;font-size:0.82rem;margin-top:1.8rem">'
+                f'{int(st.session_state["head_count"])} heads in a line · '
+                f'Head and Pixel templates emitted once</p>',
+                unsafe_allow_html=True)
+        st.session_state["head_layout"] = CellLayout("line", pitch_x=hpx)
+
 st.divider()
 
 
@@ -981,60 +473,445 @@ st.divider()
 # ══════════════════════════════════════════════════════════════════════════════
 
 if "modes" not in st.session_state:
-    st.session_state.modes = [{
-        "name": "Standard Mode",
-        "body_channels": [
-            make_channel_entry("Dimmer"),
-            make_channel_entry("Dimmer Fine", True),
-            make_channel_entry("Strobe"),
-            make_channel_entry("Macro"),
-        ],
-        "cell_channels": [
-            make_channel_entry("Red"),
-            make_channel_entry("Green"),
-            make_channel_entry("Blue"),
-        ],
-    }]
+    st.session_state.modes = _default_modes()
+
+if "history" not in st.session_state:
+    st.session_state.history = History(st.session_state.get("undo_depth", 50),
+                                       st.session_state.modes)
+
+
+def _undoable(fn):
+    """
+    Make a mutation one undo step. fn returns the paths it changed (see
+    freeze_modes) — only those are re-frozen — or None when it changed nothing.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        touched = fn(*args, **kwargs)
+        if touched is not None:
+            ss = st.session_state
+            ss.history.record(ss.modes, touched)
+            memo = ss.get("_lint_lists", {})
+            for path in touched:
+                if len(path) > 1:
+                    memo.pop(tuple(path[:2]), None)
+        return touched
+    return wrapper
+
+
+def _restore(modes):
+    """Swap in a restored mode list; stale widget values would override it."""
+    if modes is None:
+        return
+    st.session_state.modes = modes
+    st.session_state.pop("_lint_lists", None)
+    for key in list(st.session_state.keys()):
+        if isinstance(key, str) and _is_widget_key(key):
+            del st.session_state[key]
+
+def undo():
+    _restore(st.session_state.history.undo())
+
+def redo():
+    _restore(st.session_state.history.redo())
 
 def _fresh_ids(ch_list):
     for ch in ch_list:
         ch["id"] = _new_channel_id()
 
+@_undoable
 def add_mode():
     st.session_state.modes.append({
+        "id": _new_channel_id(),
         "name": f"Mode {len(st.session_state.modes)+1}",
         "body_channels": [make_channel_entry("Dimmer")],
         "cell_channels": [make_channel_entry("Red"),
                           make_channel_entry("Green"),
                           make_channel_entry("Blue")],
     })
+    return [()]
 
+@_undoable
 def copy_mode(i):
     src   = st.session_state.modes[i]
     clone = copy.deepcopy(src)
     _fresh_ids(clone.get("body_channels", []))
     _fresh_ids(clone.get("cell_channels", []))
+    _fresh_ids(clone.get("head_channels", []))
+    clone["id"]   = _new_channel_id()
     clone["name"] = src["name"] + " (Copy)"
     st.session_state.modes.insert(i + 1, clone)
+    return [()]
 
+@_undoable
 def remove_mode(i):
     if len(st.session_state.modes) > 1:
         st.session_state.modes.pop(i)
+        return [()]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DMX CHART IMPORT  — whole chart lands in one state update / one rerun
+# ══════════════════════════════════════════════════════════════════════════════
+
+@_undoable
+def _import_chart():
+    """on_click callback — runs before the rerun, so no st.rerun() needed."""
+    upload = st.session_state.get("chart_file")
+    text   = st.session_state.get("chart_text", "")
+    if upload is not None:
+        upload.seek(0)
+        lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    elif text.strip():
+        lines = io.StringIO(text)
+    else:
+        st.session_state["chart_report"] = None
+        return None
+    default_mode = st.session_state.get("chart_mode", "").strip() or "Imported Mode"
+    new_modes, report = parse_dmx_chart(lines, default_mode)
+    if upload is not None:
+        lines.detach()
+    for mode in new_modes:
+        mode["id"] = _new_channel_id()
+    if new_modes:
+        if st.session_state.get("chart_target") == "Replace all modes":
+            st.session_state.modes = new_modes
+        else:
+            st.session_state.modes = st.session_state.modes + new_modes
+    report["modes"] = len(new_modes)
+    report["has_cells"] = any(m["cell_channels"] for m in new_modes)
+    st.session_state["chart_report"] = report
+    return [()] if new_modes else None
+
+
+profile_mark("chart import")
+with st.expander("⇪ IMPORT DMX CHART — CSV / tab-separated spreadsheet"):
+    st.markdown(
+        '''<div class="info-box">
+        One row per channel, or one row per DMX range (leave the channel
+        columns blank on continuation rows). Recognised headers:
+        <b>Mode</b>, <b>Channel</b>, <b>Name</b>, <b>Fine</b>,
+        <b>Geometry</b> (body / cell), <b>From</b>, <b>To</b> or <b>Range</b>
+        (e.g. 10-19), <b>Label</b>. Without a header row the columns are read as
+        Channel, Name, From, To, Label.
+        </div>''',
+        unsafe_allow_html=True
+    )
+    st.file_uploader("CHART FILE", type=["csv", "tsv", "txt"], key="chart_file")
+    st.text_area("…OR PASTE FROM A SPREADSHEET", key="chart_text", height=140,
+                 placeholder="Channel\tName\tFrom\tTo\tLabel\n1\tDimmer\t\t\t\n"
+                             "2\tStrobe\t0\t9\tClosed\n\t\t10\t255\tStrobe Slow-Fast")
+    ic1, ic2 = st.columns(2)
+    with ic1:
+        st.text_input("MODE NAME (if the chart has no Mode column)",
+                      value="Imported Mode", key="chart_mode")
+    with ic2:
+        st.radio("TARGET", ["Append as new modes", "Replace all modes"],
+                 key="chart_target", horizontal=True)
+    st.button("⇪ Import chart", key="chart_import", on_click=_import_chart,
+              use_container_width=True)
+
+    report = st.session_state.get("chart_report")
+    if report:
+        cell_note = (" · cell channels imported — set NUMBER OF CELLS to 2+"
+                     if report["has_cells"] and
+                     int(st.session_state.get("cell_count", 1)) < 2 else "")
+        st.success(
+            f"✅  {report['modes']} mode(s) · {report['channels']} channels · "
+            f"{report['sets']} channel sets from {report['rows']} rows{cell_note}")
+        if report["unknown"]:
+            st.markdown(
+                '<div class="warn-box"><b>⚠ Not in the attribute map</b> — ' +
+                'these will be emitted as custom Control attributes: ' +
+                ", ".join(sorted(set(report["unknown"]))) + '</div>',
+                unsafe_allow_html=True)
+        unknown = set(report["unknown"])
+        mapped = [f"{name} → {attr}" for name, attr in report["attributes"].items()
+                  if name not in unknown and attr.lower() != name.lower()]
+        if mapped:
+            st.caption("GDTF attributes: " + " · ".join(mapped))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  WHEEL MEDIA  — gobo / colour images, stored once by content hash
+#  Uploads stream into a store shared by every session; slots keep only the
+#  media name, and Generate streams each referenced file into the archive.
+# ══════════════════════════════════════════════════════════════════════════════
+
+@st.cache_resource
+def _media_store():
+    return MediaStore(os.path.join(tempfile.gettempdir(), "gdtf_builder_media"))
+
+def _add_media():
+    """on_change callback — the library maps media name → original file name."""
+    library = st.session_state.setdefault("media_library", {})
+    errors = []
+    for upload in st.session_state.get("media_upload") or []:
+        upload.seek(0)
+        try:
+            library.setdefault(_media_store().add(upload), upload.name)
+        except ValueError:
+            errors.append(upload.name)
+    st.session_state["media_errors"] = errors
+
+
+profile_mark("wheel media")
+with st.expander("🖼 WHEEL MEDIA — gobo & colour slot images"):
+    st.markdown(
+        '''<div class="info-box">
+        Upload PNG images once, then pick one per channel set on any wheel
+        channel (gobo, colour, prism, effect wheels). Identical images are
+        stored and packaged once however many slots, wheels or modes use them.
+        </div>''',
+        unsafe_allow_html=True
+    )
+    st.file_uploader("SLOT IMAGES (PNG)", type=["png"], accept_multiple_files=True,
+                     key="media_upload", on_change=_add_media)
+    library = st.session_state.get("media_library", {})
+    if library:
+        st.markdown(
+            '<p style="color:#AAAAAA;font-family:Share Tech Mono,monospace;'
+            f'font-size:0.75rem">{len(library)} image(s): ' +
+            ", ".join(sorted(library.values())) + '</p>',
+            unsafe_allow_html=True)
+    if st.session_state.get("media_errors"):
+        st.markdown(
+            '<div class="warn-box">⚠ Not a PNG — skipped: ' +
+            ", ".join(st.session_state["media_errors"]) + '</div>',
+            unsafe_allow_html=True)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  WIDGET STATE RECONCILIATION
+#  Widget keys embed mode / channel IDs and slot indices. Streamlit only prunes
+#  widgets a full run didn't render, and fragment runs never prune outside the
+#  running fragment — so once a mode, channel or slot is gone, drop its keys.
+# ══════════════════════════════════════════════════════════════════════════════
+
+_MODE_KEY_RE = re.compile(r'^(?:mname|copy|rm|fold)_([0-9a-f]{8})$')
+_LIST_KEY_RE = re.compile(
+    r'^(?:vdim|custom_add|custom|pickopen|pickq|pickg|pick|chname|up|dn|del|sadd|preset|sf|st|sn|sm|sdel)'
+    r'_m([0-9a-f]{8})_(body|cell|head)(?:_([0-9a-f]{8})(?:_(\d+))?)?(?:_|$)')
+
+
+def _is_widget_key(key):
+    return bool(_MODE_KEY_RE.match(key) or _LIST_KEY_RE.match(key))
+
+
+def reconcile_widget_state():
+    """Delete widget state whose mode / channel / slot no longer exists."""
+    live = {}
+    for mode in st.session_state.modes:
+        if "id" not in mode:
+            continue
+        live[mode["id"]] = {
+            part: {ch.get("id"): len(ch.get("slots", []))
+                   for ch in mode.get(f"{part}_channels", [])}
+            for part in ("body", "cell", "head")}
+
+    stale = []
+    for key in list(st.session_state.keys()):
+        if not isinstance(key, str):
+            continue
+        m = _MODE_KEY_RE.match(key)
+        if m:
+            if m.group(1) not in live:
+                stale.append(key)
+            continue
+        m = _LIST_KEY_RE.match(key)
+        if not m:
+            continue
+        mode_id, part, ch_id, si = m.groups()
+        if mode_id not in live:
+            stale.append(key)
+        elif ch_id is not None and ch_id not in live[mode_id][part]:
+            stale.append(key)
+        elif si is not None and int(si) >= live[mode_id][part][ch_id]:
+            stale.append(key)
+    for key in stale:
+        del st.session_state[key]
+
+    collapsed = st.session_state.get("collapsed_modes")
+    if collapsed:
+        collapsed.intersection_update(live)
+
+    stats = st.session_state.setdefault(
+        "_widget_gc", {"runs": 0, "last": 0, "total": 0})
+    stats["runs"]  += 1
+    stats["last"]   = len(stale)
+    stats["total"] += len(stale)
+    return len(stale)
+
+
+def session_footprint():
+    """
+    Approximate session memory: {"keys", "bytes", "widget_keys",
+    "widget_bytes", "model_bytes", "history_bytes"} — sizes are pickled lengths, falling back
+    to sys.getsizeof for values that can't be pickled (uploads).
+    """
+    out = {"keys": 0, "bytes": 0, "widget_keys": 0,
+           "widget_bytes": 0, "model_bytes": 0, "history_bytes": 0}
+    for key in list(st.session_state.keys()):
+        value = st.session_state[key]
+        try:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            size = sys.getsizeof(value)
+        out["keys"]  += 1
+        out["bytes"] += size
+        if key == "modes":
+            out["model_bytes"] = size
+        elif key == "history":
+            out["history_bytes"] = size
+        elif isinstance(key, str) and _is_widget_key(key):
+            out["widget_keys"]  += 1
+            out["widget_bytes"] += size
+    return out
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CHANNEL LIST MUTATIONS  — on_click callbacks
+#  Callbacks run before the (fragment) rerun, so the edit is already in the
+#  model when the card re-renders: no second st.rerun() per click.
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _ch_index(ch_list, ch_id):
+    return next((i for i, c in enumerate(ch_list) if c.get("id") == ch_id), None)
+
+# `where` is the path each callback reports to the undo history:
+# (mode_id, part) for a channel list, (mode_id, part, ch_id) for one channel.
+
+@_undoable
+def _add_channel(where, ch_list, name, fine=False):
+    ch_list.append(make_channel_entry(name, fine))
+    return [where]
+
+@_undoable
+def _pick_channel(where, ch_list, name, fine):
+    if not any(c["name"].lower() == name.lower() for c in ch_list):
+        ch_list.append(make_channel_entry(name, fine))
+        return [where]
+
+@_undoable
+def _add_custom_channel(where, ch_list, input_key):
+    name = st.session_state.get(input_key, "").strip()
+    if name:
+        ch_list.append(make_channel_entry(name, is_fine(name)))
+        return [where]
+
+@_undoable
+def _delete_channel(where, ch_list, ch_id):
+    i = _ch_index(ch_list, ch_id)
+    if i is not None:
+        ch_list.pop(i)
+        return [where]
+
+@_undoable
+def _move_channel(where, ch_list, ch_id, d):
+    i = _ch_index(ch_list, ch_id)
+    if i is not None and 0 <= i + d < len(ch_list):
+        ch_list[i], ch_list[i + d] = ch_list[i + d], ch_list[i]
+        return [where]
+
+@_undoable
+def _add_slot(where, slots, dmx_from, dmx_to):
+    slots.append(make_slot_entry(dmx_from, dmx_to, ""))
+    return [where]
+
+@_undoable
+def _delete_slot(where, slots, si, key_stem):
+    """Slot widgets are keyed by index — drop the ones that shift down."""
+    if si < len(slots):
+        for j in range(si, len(slots)):
+            for prefix in ("sf", "st", "sn", "sm"):
+                st.session_state.pop(f"{prefix}_{key_stem}_{j}", None)
+        slots.pop(si)
+        return [where]
+
+@_undoable
+def _fill_preset(where, slots, preset):
+    for pf, pt, pn in preset:
+        slots.append(make_slot_entry(pf, pt, pn))
+    return [where]
+
+@_undoable
+def _edit_field(where, record, field, key):
+    """on_change for a name / set widget: its value into the model, one undo step."""
+    if record.get(field) != st.session_state[key]:
+        record[field] = st.session_state[key]
+        return [where]
+
+def _toggle_mode_card(mode_id):
+    collapsed = st.session_state.setdefault("collapsed_modes", set())
+    collapsed.symmetric_difference_update({mode_id})
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  CHANNEL LIST + PICKER  — reusable render function
 # ══════════════════════════════════════════════════════════════════════════════
 
+# ══════════════════════════════════════════════════════════════════════════════
+#  LIVE LINT  — inline warnings while editing
+#  gdtf_core caches results on channel and list content, so each rerun only
+#  re-lints the channels that changed. The result is kept per (mode, part):
+#  a list only changes through an undoable callback, which drops the lists
+#  it touched, and its own card re-lints it on render — so other modes are
+#  never re-keyed on a keystroke.
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _list_lint(mode, part, fresh=False):
+    memo = st.session_state.setdefault("_lint_lists", {})
+    key = (mode.get("id"), part)
+    if fresh or key not in memo:
+        memo[key] = lint_channel_list(
+            tuple(channel_lint_key(ch) for ch in mode.get(f"{part}_channels", [])),
+            part)
+    return memo[key]
+
+def _row_issues(part, mode_idx, fresh=False):
+    """(ListLint, {row: [issue, ...]}) — list checks plus cross-mode wheels."""
+    modes = st.session_state.modes
+    lint = _list_lint(modes[mode_idx], part, fresh)
+    rows = {r: list(issues) for r, issues in lint.rows.items()}
+    earlier = [(m["name"], _list_lint(m, part)) for m in modes[:mode_idx]]
+    for r, issues in lint_wheel_consistency(earlier, lint).items():
+        rows.setdefault(r, []).extend(issues)
+    return lint, rows
+
+def _lint_html(issues):
+    return '<div class="lint">' + "<br>".join(
+        f'<span class="l-{sev}">{"✖" if sev == "error" else "⚠"} {msg}</span>'
+        for _check, sev, msg in issues) + '</div>'
+
+def _mode_issues(mode_idx):
+    """Every live-lint issue in one mode (for collapsed cards)."""
+    cells = int(st.session_state.get("cell_count", 1))
+    heads = int(st.session_state.get("head_count", 1))
+    body, body_rows = _row_issues("body", mode_idx)
+    issues = [i for row in body_rows.values() for i in row]
+    cell = lint_channel_list((), "cell")
+    head = None
+    if cells >= 2:
+        cell, cell_rows = _row_issues("cell", mode_idx)
+        issues += [i for row in cell_rows.values() for i in row]
+    if heads >= 2:
+        head, head_rows = _row_issues("head", mode_idx)
+        issues += [i for row in head_rows.values() for i in row]
+    return issues + list(lint_footprint(body, cell, cells, head=head, heads=heads))
+
+
 def render_channel_list(ch_list, tab_key, mode_idx):
     """
     Render a channel list (body or cell) with its inline slot editor and picker.
     tab_key  — unique prefix string to avoid widget key collisions between tabs.
+    Returns the list's ListLint.
     """
     # ── Ensure stable IDs ──────────────────────────────────────────────────────
     for ch in ch_list:
         if "id" not in ch:
             ch["id"] = _new_channel_id()
+    part  = tab_key.rsplit("_", 1)[1]
+    where = (st.session_state.modes[mode_idx]["id"], part)
 
     n_ch     = len(ch_list)
     ch_label = (
@@ -1042,19 +919,16 @@ def render_channel_list(ch_list, tab_key, mode_idx):
         if n_ch > 0 else "empty — add channels below"
     )
 
-    ch_to_delete = None
-    ch_to_move   = None
-
-    with st.expander(ch_label, expanded=True):
+    with profile_section(part + " channels"), \
+            st.expander(ch_label, expanded=True):
 
         # Virtual dimmer shortcut for cell tab
         if tab_key.endswith("_cell"):
-            if st.button("＋ Virtual Dimmer",
-                         key=f"vdim_{tab_key}",
-                         help="Adds a Dimmer with Offset=None — no DMX address. "
-                              "MA3 uses it as per-cell intensity for pixel mapping."):
-                ch_list.append(make_channel_entry("Virtual Dimmer"))
-                st.rerun()
+            st.button("＋ Virtual Dimmer",
+                      key=f"vdim_{tab_key}",
+                      on_click=_add_channel, args=(where, ch_list, "Virtual Dimmer"),
+                      help="Adds a Dimmer with Offset=None — no DMX address. "
+                           "MA3 uses it as per-cell intensity for pixel mapping.")
 
         if not ch_list:
             st.markdown(
@@ -1063,10 +937,11 @@ def render_channel_list(ch_list, tab_key, mode_idx):
                 unsafe_allow_html=True
             )
 
+        lint_slots = []
         for ci, ch in enumerate(ch_list):
             ch_id = ch["id"]
             attr, *_ = resolve_attr(ch["name"])
-            known = any(k in ch["name"].lower() for k in ATTR_MAP)
+            known = is_known_channel(ch["name"])
             fine  = ch.get("is_fine", False)
             # Virtual dimmer = any channel named "virtual dimmer"
             is_virtual = "virtual" in ch["name"].lower() and "dimmer" in ch["name"].lower()
@@ -1082,35 +957,36 @@ def render_channel_list(ch_list, tab_key, mode_idx):
 
             with r1:
                 num = "V" if is_virtual else str(ci + 1)
-                st.markdown(f'<p class="ch-num">{num}</p>', unsafe_allow_html=True)
+                found = " found" if ch_id == st.session_state.get("find_focus") else ""
+                st.markdown(f'<p class="ch-num{found}">{num}</p>', unsafe_allow_html=True)
             with r2:
-                new_name = st.text_input(
+                st.text_input(
                     "ch", value=ch["name"],
                     label_visibility="collapsed",
-                    key=f"chname_{tab_key}_{ch_id}"
-                )
-                if new_name != ch["name"]:
-                    ch["name"] = new_name
+                    key=f"chname_{tab_key}_{ch_id}",
+                    on_change=_edit_field,
+                    args=((*where, ch_id), ch, "name", f"chname_{tab_key}_{ch_id}"))
             with r3:
                 st.markdown(f'<div style="margin-top:0.5rem">{badge}</div>',
                             unsafe_allow_html=True)
             with r4:
-                if st.button("▲", key=f"up_{tab_key}_{ch_id}",
-                             disabled=ci == 0, help="Move up"):
-                    ch_to_move = (ci, -1)
+                st.button("▲", key=f"up_{tab_key}_{ch_id}",
+                          disabled=ci == 0, help="Move up",
+                          on_click=_move_channel, args=(where, ch_list, ch_id, -1))
             with r5:
-                if st.button("▼", key=f"dn_{tab_key}_{ch_id}",
-                             disabled=ci == len(ch_list) - 1, help="Move down"):
-                    ch_to_move = (ci, 1)
+                st.button("▼", key=f"dn_{tab_key}_{ch_id}",
+                          disabled=ci == len(ch_list) - 1, help="Move down",
+                          on_click=_move_channel, args=(where, ch_list, ch_id, 1))
             with r6:
-                if st.button("✕", key=f"del_{tab_key}_{ch_id}",
-                             help="Remove channel"):
-                    ch_to_delete = ci
+                st.button("✕", key=f"del_{tab_key}_{ch_id}",
+                          help="Remove channel",
+                          on_click=_delete_channel, args=(where, ch_list, ch_id))
+            lint_slots.append(st.empty())
 
             # ── DMX Slot / Channel Set editor ─────────────────────────────────
             show_slots = (
                 not fine and not is_virtual and
-                ch["name"] not in CONTINUOUS and known
+                not is_continuous_channel(ch["name"]) and known
             )
             if show_slots:
                 slots = ch.setdefault("slots", [])
@@ -1119,11 +995,15 @@ def render_channel_list(ch_list, tab_key, mode_idx):
                     f"  ↳ {n} channel set{'s' if n != 1 else ''} (MA3 snap positions)"
                     if n > 0 else "  ↳ No channel sets — tap to add (optional)"
                 )
+                library = st.session_state.get("media_library", {})
+                with_media = is_wheel_attr(attr) and bool(library)
+                widths = [1, 1, 2, 1.2, 0.4] if with_media else [1, 1, 2, 0.4]
                 with st.expander(s_label, expanded=n > 0):
                     if slots:
-                        hh1, hh2, hh3, _ = st.columns([1,1,2,0.4])
-                        for lbl, col in zip(["FROM","TO","LABEL (MA3 CHANNEL SET)"],
-                                            [hh1, hh2, hh3]):
+                        heads = ["FROM", "TO", "LABEL (MA3 CHANNEL SET)"]
+                        if with_media:
+                            heads.append("IMAGE")
+                        for lbl, col in zip(heads, st.columns(widths)):
                             with col:
                                 st.markdown(
                                     f'<p style="color:#888;font-size:0.68rem;'
@@ -1132,53 +1012,63 @@ def render_channel_list(ch_list, tab_key, mode_idx):
                                     f'margin-bottom:0.2rem">{lbl}</p>',
                                     unsafe_allow_html=True)
 
-                    slot_to_delete = None
+                    ch_where = (*where, ch_id)
                     for si, slot in enumerate(slots):
-                        sc1, sc2, sc3, sc4 = st.columns([1,1,2,0.4])
+                        sc1, sc2, sc3, *sc_media, sc4 = st.columns(widths)
+                        sk = f"{tab_key}_{ch_id}_{si}"
                         with sc1:
-                            slot["dmx_from"] = st.number_input(
+                            st.number_input(
                                 "From", min_value=0, max_value=255,
-                                value=int(slot["dmx_from"]),
-                                key=f"sf_{tab_key}_{ch_id}_{si}",
-                                label_visibility="collapsed")
+                                value=int(slot["dmx_from"]), key=f"sf_{sk}",
+                                label_visibility="collapsed", on_change=_edit_field,
+                                args=(ch_where, slot, "dmx_from", f"sf_{sk}"))
                         with sc2:
-                            slot["dmx_to"] = st.number_input(
+                            st.number_input(
                                 "To", min_value=0, max_value=255,
-                                value=int(slot["dmx_to"]),
-                                key=f"st_{tab_key}_{ch_id}_{si}",
-                                label_visibility="collapsed")
+                                value=int(slot["dmx_to"]), key=f"st_{sk}",
+                                label_visibility="collapsed", on_change=_edit_field,
+                                args=(ch_where, slot, "dmx_to", f"st_{sk}"))
                         with sc3:
-                            slot["name"] = st.text_input(
+                            st.text_input(
                                 "Label", value=slot["name"],
                                 placeholder="e.g. Open / Gobo 3 / Slow CW",
-                                key=f"sn_{tab_key}_{ch_id}_{si}",
-                                label_visibility="collapsed")
+                                key=f"sn_{sk}", label_visibility="collapsed",
+                                on_change=_edit_field,
+                                args=(ch_where, slot, "name", f"sn_{sk}"))
+                        if with_media:
+                            options = ["", *library]
+                            if slot.get("media") and slot["media"] not in library:
+                                options.append(slot["media"])
+                            with sc_media[0]:
+                                st.selectbox(
+                                    "Image", options,
+                                    index=options.index(slot.get("media", "")),
+                                    format_func=lambda m: library.get(m, m[:8]) or "—",
+                                    key=f"sm_{sk}", label_visibility="collapsed",
+                                    on_change=_edit_field,
+                                    args=(ch_where, slot, "media", f"sm_{sk}"))
                         with sc4:
-                            if st.button("✕", key=f"sdel_{tab_key}_{ch_id}_{si}"):
-                                slot_to_delete = si
-
-                    if slot_to_delete is not None:
-                        slots.pop(slot_to_delete)
-                        st.rerun()
+                            st.button("✕", key=f"sdel_{sk}",
+                                      on_click=_delete_slot,
+                                      args=(ch_where, slots, si, f"{tab_key}_{ch_id}"))
 
                     next_from = slots[-1]["dmx_to"] + 1 if slots else 0
                     next_to   = min(next_from + 10, 255)
-                    if st.button(f"＋ Add channel set  (next: {next_from}–{next_to})",
-                                 key=f"sadd_{tab_key}_{ch_id}",
-                                 use_container_width=True):
-                        slots.append(make_slot_entry(next_from, next_to, ""))
-                        st.rerun()
+                    st.button(f"＋ Add channel set  (next: {next_from}–{next_to})",
+                              key=f"sadd_{tab_key}_{ch_id}",
+                              on_click=_add_slot,
+                              args=(ch_where, slots, next_from, next_to),
+                              use_container_width=True)
 
                     preset_match = next(
                         (v for k, v in PRESETS.items()
                          if k.lower() in ch["name"].lower()), None)
                     if preset_match and not slots:
-                        if st.button("⚡ Quick-fill standard channel sets",
-                                     key=f"preset_{tab_key}_{ch_id}",
-                                     use_container_width=True):
-                            for pf, pt, pn in preset_match:
-                                slots.append(make_slot_entry(pf, pt, pn))
-                            st.rerun()
+                        st.button("⚡ Quick-fill standard channel sets",
+                                  key=f"preset_{tab_key}_{ch_id}",
+                                  on_click=_fill_preset,
+                                  args=(ch_where, slots, preset_match),
+                                  use_container_width=True)
 
                     if slots:
                         st.markdown(
@@ -1187,33 +1077,43 @@ def render_channel_list(ch_list, tab_key, mode_idx):
                             '⟶ Named snap positions on MA3 encoders / channel sets column.</p>',
                             unsafe_allow_html=True)
 
-    # Apply moves/deletes outside the expander
-    if ch_to_delete is not None:
-        ch_list.pop(ch_to_delete)
-        st.rerun()
-    if ch_to_move is not None:
-        i, d = ch_to_move
-        j = i + d
-        if 0 <= j < len(ch_list):
-            ch_list[i], ch_list[j] = ch_list[j], ch_list[i]
-        st.rerun()
+        lint, row_issues = _row_issues(part, mode_idx, fresh=True)
+        for row, issues in row_issues.items():
+            lint_slots[row].markdown(_lint_html(issues), unsafe_allow_html=True)
 
     # ── Channel Picker ─────────────────────────────────────────────────────────
-    with st.expander("＋ ADD CHANNELS — tap a group to browse"):
-        for group_name, group_channels in CHANNEL_CATALOGUE.items():
-            with st.expander(group_name):
-                gcols = st.columns(2)
-                for ci2, (ch_name, ch_fine) in enumerate(group_channels):
-                    with gcols[ci2 % 2]:
-                        already = any(c["name"].lower() == ch_name.lower()
-                                      for c in ch_list)
-                        label = f"✓ {ch_name}" if already else f"＋ {ch_name}"
-                        if st.button(label,
-                                     key=f"pick_{tab_key}_{group_name}_{ch_name}",
-                                     use_container_width=True):
-                            if not already:
-                                ch_list.append(make_channel_entry(ch_name, ch_fine))
-                                st.rerun()
+    # Closed, the picker is one toggle. Open, it renders only the matches for
+    # the typed query (or one browsed group) — never the whole catalogue.
+    with profile_section("picker"):
+        if not st.toggle("＋ ADD CHANNELS", key=f"pickopen_{tab_key}"):
+            return lint
+        pq1, pq2 = st.columns([3, 2])
+        with pq1:
+            query = st.text_input(
+                "Search", label_visibility="collapsed",
+                placeholder="Search channels — gobo, pan, cyan…",
+                key=f"pickq_{tab_key}")
+        with pq2:
+            group = st.selectbox(
+                "Browse", list(CHANNEL_CATALOGUE), index=None,
+                label_visibility="collapsed", placeholder="…or browse a group",
+                key=f"pickg_{tab_key}")
+        if query.strip():
+            choices = [(n, f) for n, f, _ in channel_suggestions(query)]
+            if not choices:
+                st.caption("No match — add it as a custom channel below.")
+        else:
+            choices = CHANNEL_CATALOGUE.get(group, [])
+        added = {c["name"].lower() for c in ch_list}
+        gcols = st.columns(2)
+        for ci2, (ch_name, ch_fine) in enumerate(choices):
+            with gcols[ci2 % 2]:
+                label = (f"✓ {ch_name}" if ch_name.lower() in added
+                         else f"＋ {ch_name}")
+                st.button(label, key=f"pick_{tab_key}_{ch_name}",
+                          on_click=_pick_channel,
+                          args=(where, ch_list, ch_name, ch_fine),
+                          use_container_width=True)
 
         st.markdown(
             '<p style="color:#BBBBBB;font-family:Share Tech Mono,monospace;'
@@ -1222,24 +1122,41 @@ def render_channel_list(ch_list, tab_key, mode_idx):
             unsafe_allow_html=True)
         cc1, cc2 = st.columns([4, 1])
         with cc1:
-            custom_name = st.text_input(
+            st.text_input(
                 "Custom", label_visibility="collapsed",
                 placeholder="e.g. Pixel Row 1 / CTC / Virtual Dimmer",
                 key=f"custom_{tab_key}")
         with cc2:
-            if st.button("ADD", key=f"custom_add_{tab_key}",
-                         use_container_width=True):
-                if custom_name.strip():
-                    ch_list.append(make_channel_entry(
-                        custom_name.strip(), is_fine(custom_name)))
-                    st.rerun()
+            st.button("ADD", key=f"custom_add_{tab_key}",
+                      on_click=_add_custom_channel,
+                      args=(where, ch_list, f"custom_{tab_key}"),
+                      use_container_width=True)
+    return lint
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  PER-MODE RENDERING
+#  Each mode card is a fragment: edits inside a card rerun only that card.
+#  Copy / remove change the card list itself and still rerun the whole app.
+#  Streamlit's text and number inputs each snapshot the whole session state,
+#  so every rendered input costs O(widgets on the page) — a collapsed card
+#  renders only its header and takes its channel widgets off the page.
 # ══════════════════════════════════════════════════════════════════════════════
 
-for mode_idx, mode in enumerate(st.session_state.modes):
+@st.fragment
+def render_mode_card(mode_idx):
+    fragment_run = _in_fragment_rerun()
+    if fragment_run:
+        profile_begin("card")
+        profile_mark("mode cards")
+    with profile_section(f"mode {mode_idx + 1}"):
+        _render_mode_card(mode_idx)
+    if fragment_run:
+        profile_end()
+
+
+def _render_mode_card(mode_idx):
+    mode = st.session_state.modes[mode_idx]
 
     # ── Backwards compat: migrate old channel_list to body_channels ───────────
     if "body_channels" not in mode and "cell_channels" not in mode:
@@ -1248,38 +1165,54 @@ for mode_idx, mode in enumerate(st.session_state.modes):
         mode["cell_channels"] = []
         mode.pop("channel_list", None)
 
+    mode_id   = mode.setdefault("id", _new_channel_id())
     body_list = mode.setdefault("body_channels", [])
     cell_list = mode.setdefault("cell_channels", [])
     is_mc     = int(st.session_state.get("cell_count", 1)) >= 2
+    heads     = int(st.session_state.get("head_count", 1))
+    head_list = mode.setdefault("head_channels", []) if heads >= 2 else []
+    collapsed = mode_id in st.session_state.get("collapsed_modes", ())
 
     st.markdown('<div class="card">', unsafe_allow_html=True)
 
     # ── Mode header ───────────────────────────────────────────────────────────
-    hc1, hc2, hc3, hc4 = st.columns([3, 1, 1, 1])
+    hc0, hc1, hc2, hc3, hc4 = st.columns([0.4, 3, 1, 1, 1])
+    with hc0:
+        st.write(""); st.write("")
+        st.button("▸" if collapsed else "▾", key=f"fold_{mode_id}",
+                  help="Expand mode" if collapsed else "Collapse mode",
+                  on_click=_toggle_mode_card, args=(mode_id,))
     with hc1:
-        mode["name"] = st.text_input(
-            "MODE NAME", value=mode["name"], key=f"mname_{mode_idx}")
+        st.text_input("MODE NAME", value=mode["name"], key=f"mname_{mode_id}",
+                      on_change=_edit_field,
+                      args=((mode_id,), mode, "name", f"mname_{mode_id}"))
     with hc2:
         st.write(""); st.write("")
-        if st.button("⧉ Copy", key=f"copy_{mode_idx}", help="Duplicate this mode"):
+        if st.button("⧉ Copy", key=f"copy_{mode_id}", help="Duplicate this mode"):
             copy_mode(mode_idx)
-            st.rerun()
+            st.rerun(scope="app")
     with hc3:
         st.write(""); st.write("")
-        if is_mc:
+        if is_mc or heads >= 2:
             n_body = sum(1 for c in body_list if not c.get("is_fine"))
             n_cell = sum(1 for c in cell_list if not c.get("is_fine")
-                         and "virtual" not in c["name"].lower())
+                         and "virtual" not in c["name"].lower()) if is_mc else 0
             n_virt = sum(1 for c in cell_list
-                         if "virtual" in c["name"].lower())
+                         if "virtual" in c["name"].lower()) if is_mc else 0
             cells  = int(st.session_state.get("cell_count", 1))
             total  = n_body + n_cell * cells
+            split  = f"B:{n_body} C:{n_cell}×{cells} V:{n_virt}"
+            if heads >= 2:
+                n_head = sum(1 for c in head_list if not c.get("is_fine")
+                             and "virtual" not in c["name"].lower())
+                total  = n_body + heads * (n_head + n_cell * cells)
+                split  = f"B:{n_body} H:{n_head}×{heads} C:{n_cell}×{cells}×{heads}"
             st.markdown(
                 f'<p style="color:var(--ma-amber);font-family:Share Tech Mono,'
                 f'monospace;font-size:0.75rem;margin-top:0.5rem;line-height:1.4">'
                 f'{total} DMX<br>'
                 f'<span style="font-size:0.65rem;color:#AAAAAA">'
-                f'B:{n_body} C:{n_cell}×{cells} V:{n_virt}</span></p>',
+                f'{split}</span></p>',
                 unsafe_allow_html=True)
         else:
             n_ch = sum(1 for c in body_list if not c.get("is_fine"))
@@ -1290,39 +1223,246 @@ for mode_idx, mode in enumerate(st.session_state.modes):
                 unsafe_allow_html=True)
     with hc4:
         st.write(""); st.write("")
-        if st.button("🗑", key=f"rm_{mode_idx}",
+        if st.button("🗑", key=f"rm_{mode_id}",
                      disabled=len(st.session_state.modes) == 1,
                      help="Remove mode"):
             remove_mode(mode_idx)
-            st.rerun()
+            st.rerun(scope="app")
+
+    if collapsed:
+        issues = _mode_issues(mode_idx)
+        if issues:
+            errors = sum(sev == "error" for _c, sev, _m in issues)
+            st.markdown(
+                f'<div class="lint"><span class="l-{"error" if errors else "warning"}">'
+                f'{errors} error(s) · {len(issues) - errors} warning(s) — expand to '
+                f'see them</span></div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
 
     st.divider()
 
-    # ── Body / Cell tabs (tabs only shown in multi-cell mode) ─────────────────
-    if is_mc:
-        tab_body, tab_cell = st.tabs([
-            f"🟡 BODY  ({len(body_list)} ch)",
-            f"🟢 CELL  ({len(cell_list)} ch)  × {int(st.session_state.get('cell_count',1))} cells",
-        ])
-        with tab_body:
-            st.markdown(
-                '<p style="color:#AAAAAA;font-size:0.75rem;margin-bottom:0.5rem">'
-                'Channels emitted <b>once</b> to the Body geometry — '
-                'master dimmer, strobe, color temp, macros, etc.</p>',
-                unsafe_allow_html=True)
-            render_channel_list(body_list, f"m{mode_idx}_body", mode_idx)
-        with tab_cell:
-            st.markdown(
-                '<p style="color:#AAAAAA;font-size:0.75rem;margin-bottom:0.5rem">'
-                'Channels repeated for <b>every cell</b> — RGB, RGBW, etc. '
-                'Each cell gets its own independent wheels and channel sets.</p>',
-                unsafe_allow_html=True)
-            render_channel_list(cell_list, f"m{mode_idx}_cell", mode_idx)
+    # ── Body / Head / Cell tabs (tabs only shown in multi-cell / multi-head) ──
+    cells = int(st.session_state.get("cell_count", 1))
+    lints = {"cell": lint_channel_list((), "cell"), "head": None}
+    if is_mc or heads >= 2:
+        tabs = [("body", body_list, f"🟡 BODY  ({len(body_list)} ch)",
+                 'Channels emitted <b>once</b> to the Body geometry — '
+                 'master dimmer, strobe, color temp, macros, etc.')]
+        if heads >= 2:
+            tabs.append(("head", head_list,
+                         f"🔵 HEAD  ({len(head_list)} ch)  × {heads} heads",
+                         'Channels repeated for <b>every head</b> — pan, tilt, '
+                         'zoom, gobo, etc. The Head template is emitted once.'))
+        if is_mc:
+            per_head = " per head" if heads >= 2 else ""
+            tabs.append(("cell", cell_list,
+                         f"🟢 CELL  ({len(cell_list)} ch)  × {cells} cells{per_head}",
+                         'Channels repeated for <b>every cell</b> — RGB, RGBW, etc. '
+                         'Each cell gets its own independent wheels and channel sets.'))
+        for (part, ch_list, _label, note), tab in zip(tabs, st.tabs([t[2] for t in tabs])):
+            with tab:
+                st.markdown(
+                    '<p style="color:#AAAAAA;font-size:0.75rem;margin-bottom:0.5rem">'
+                    f'{note}</p>', unsafe_allow_html=True)
+                lints[part] = render_channel_list(ch_list, f"m{mode_id}_{part}", mode_idx)
+        body_lint = lints["body"]
     else:
         # Single geometry mode — just body channels, no tabs
-        render_channel_list(body_list, f"m{mode_idx}_body", mode_idx)
+        body_lint = render_channel_list(body_list, f"m{mode_id}_body", mode_idx)
+
+    footprint = lint_footprint(body_lint, lints["cell"], cells,
+                               head=lints["head"], heads=heads)
+    if footprint:
+        st.markdown(f'<div class="warn-box">{footprint[0][2]}</div>',
+                    unsafe_allow_html=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
+
+
+# Full runs only — fragment reruns skip the top level
+reconcile_widget_state()
+
+# ── Undo / redo ───────────────────────────────────────────────────────────────
+profile_mark("undo bar")
+# Toolbar lives outside the card fragments, so its buttons always run the full
+# app and can't be disabled by an edit made inside a card.
+uc1, uc2, uc3 = st.columns([1, 1, 4])
+with uc1:
+    st.button("↶ Undo", key="undo", on_click=undo, use_container_width=True)
+with uc2:
+    st.button("↷ Redo", key="redo", on_click=redo, use_container_width=True)
+with uc3:
+    st.number_input("UNDO DEPTH", min_value=1, max_value=500, value=50,
+                    key="undo_depth", label_visibility="collapsed",
+                    help="Snapshots kept for undo (and for redo)")
+st.session_state.history.resize(st.session_state.undo_depth)
+
+# ── Find a channel ────────────────────────────────────────────────────────────
+# Fuzzy search over every channel name in the workspace; Go expands the mode
+# card holding the hit and marks its row number.
+_FIND_HITS = 24
+
+def _find_goto(mode_id, ch_id):
+    st.session_state.setdefault("collapsed_modes", set()).discard(mode_id)
+    st.session_state.find_focus = ch_id
+
+def _find_channels(query):
+    """[(mode_idx, part, row, channel)] for the names closest to query."""
+    where = {}
+    for mi, mode in enumerate(st.session_state.modes):
+        for part in ("body", "cell", "head"):
+            for row, ch in enumerate(mode.get(f"{part}_channels", [])):
+                where.setdefault(ch["name"], []).append((mi, part, row, ch))
+    index = workspace_index(tuple(sorted(where)))
+    return [loc for hit in index.search(query, _FIND_HITS)
+            for loc in where[hit.payload]][:_FIND_HITS]
+
+profile_mark("find")
+with st.expander("🔎 FIND A CHANNEL — search every mode"):
+    query = st.text_input("Find", key="find_q", label_visibility="collapsed",
+                          placeholder="Channel name — typos are fine: gobo wheal, shuter…")
+    if query.strip():
+        hits = _find_channels(query)
+        if not hits:
+            st.caption("No channel in any mode is close to that.")
+        for i, (mi, part, row, ch) in enumerate(hits):
+            mode = st.session_state.modes[mi]
+            fc1, fc2 = st.columns([5, 1])
+            with fc1:
+                st.markdown(
+                    f'<p class="ch-num" style="text-align:left;margin-top:0.3rem">'
+                    f'{mode["name"] or f"Mode {mi + 1}"} · {part.upper()} {row + 1} · '
+                    f'<span style="color:#EBEBEB">{ch["name"]}</span></p>',
+                    unsafe_allow_html=True)
+            with fc2:
+                st.button("Go", key=f"find_go_{i}", on_click=_find_goto,
+                          args=(mode.setdefault("id", _new_channel_id()), ch["id"]),
+                          use_container_width=True)
+
+# ── Batch edit ────────────────────────────────────────────────────────────────
+# One change to a channel in many modes. Apply is a single undoable callback
+# over every chosen mode: one state update, one rerun, one undo step.
+_BATCH_LABELS = dict(zip(BATCH_OPS, (
+    "Rename", "Insert after", "Insert before", "Delete", "Apply set table",
+    "Move after…")))
+
+def _batch_targets():
+    """{name key: (display name, [mode ids holding it])}, in first-seen order."""
+    modes = st.session_state.modes
+    out = {}
+    for key, locs in channel_locations(modes).items():
+        mi, part, row = locs[0]
+        ids = dict.fromkeys(modes[i].setdefault("id", _new_channel_id())
+                            for i, _p, _r in locs)
+        out[key] = (modes[mi][f"{part}_channels"][row]["name"], list(ids))
+    return out
+
+def _batch_select_all():
+    """New target channel: preselect every mode that has it."""
+    target = _batch_targets().get(st.session_state.get("batch_name"))
+    st.session_state.batch_modes = target[1] if target else []
+
+def _batch_slots(name, src):
+    """Slot dicts for the set-table source: 'preset:<name>' or 'mode:<id>'."""
+    kind, _, ref = src.partition(":")
+    if kind == "preset":
+        return [make_slot_entry(*s) for s in PRESETS.get(ref, ())]
+    mode = next((m for m in st.session_state.modes if m.get("id") == ref), {})
+    key = attr_key(name)
+    for part in ("body", "cell", "head"):
+        for ch in mode.get(f"{part}_channels", []):
+            if attr_key(ch["name"]) == key:
+                return ch.get("slots", [])
+    return []
+
+@_undoable
+def _batch_apply():
+    ss = st.session_state
+    name, op = ss.get("batch_name"), ss.get("batch_op", BATCH_OPS[0])
+    if not name:
+        return None
+    index = {m.get("id"): i for i, m in enumerate(ss.modes)}
+    chosen = [index[m] for m in ss.get("batch_modes", []) if m in index]
+    try:
+        touched = batch_edit(
+            ss.modes, name, op, chosen, new_name=ss.get("batch_new", ""),
+            slots=_batch_slots(name, ss.get("batch_src") or "") if op == "sets" else (),
+            anchor=ss.get("batch_anchor") or "")
+    except ValueError as e:
+        ss.batch_report = f"✖ {e}"
+        return None
+    # Edited rows must render from the model, not their stale widget values
+    ids = {ch["id"] for _mi, _part, ch in touched}
+    for key in list(ss.keys()):
+        m = isinstance(key, str) and _LIST_KEY_RE.match(key)
+        if m and m.group(3) in ids:
+            del ss[key]
+    if op == "rename":
+        ss.batch_name = attr_key(ss.batch_new)
+    ss.batch_report = (f"{_BATCH_LABELS[op]} — {len(touched)} channel(s) in "
+                       f"{len({mi for mi, _p, _c in touched})} mode(s). "
+                       f"Undo reverts the whole batch.")
+    paths = set()
+    for mi, part, ch in touched:
+        mode_id = ss.modes[mi].get("id")
+        paths.update({(mode_id, part), (mode_id, part, ch["id"])})
+    return paths or None
+
+profile_mark("batch edit")
+with st.expander("⧉ BATCH EDIT — one change across many modes"):
+    targets = _batch_targets()
+    if st.session_state.get("batch_name") not in targets:
+        st.session_state.pop("batch_name", None)
+    bc1, bc2 = st.columns([2, 3])
+    with bc1:
+        name = st.selectbox(
+            "CHANNEL", list(targets), index=None, key="batch_name",
+            placeholder="Channel to edit…", on_change=_batch_select_all,
+            format_func=lambda k: f"{targets[k][0]} · {len(targets[k][1])} mode(s)")
+    holders = targets[name][1] if name else []
+    mode_names = {m.get("id"): m["name"] or f"Mode {i + 1}"
+                  for i, m in enumerate(st.session_state.modes)}
+    picked = st.session_state.get("batch_modes")
+    if picked is not None:
+        st.session_state.batch_modes = [m for m in picked if m in holders]
+    with bc2:
+        chosen = st.multiselect("IN MODES", holders, key="batch_modes",
+                                default=holders if picked is None else None,
+                                format_func=lambda m: mode_names.get(m, m))
+    op = st.radio("OPERATION", BATCH_OPS, key="batch_op", horizontal=True,
+                  format_func=_BATCH_LABELS.get)
+    if op in ("rename", "insert_after", "insert_before"):
+        st.text_input("NEW CHANNEL NAME" if op != "rename" else "RENAME TO",
+                      key="batch_new", placeholder="e.g. Strobe / Color Wheel")
+    elif op == "sets":
+        sources = {}
+        for m in holders:
+            n_sets = len(_batch_slots(name, f"mode:{m}"))
+            if n_sets:
+                sources[f"mode:{m}"] = f"{mode_names.get(m, m)} · {n_sets} set(s)"
+        sources.update((f"preset:{p}", f"Preset · {p}") for p in PRESETS)
+        if st.session_state.get("batch_src") not in sources:
+            st.session_state.pop("batch_src", None)
+        st.selectbox("COPY SETS FROM", list(sources), key="batch_src",
+                     format_func=sources.get,
+                     help="Replaces the channel sets of every chosen match.")
+    elif op == "move_after":
+        anchors = ["", *(t[0] for k, t in targets.items() if k != name)]
+        if st.session_state.get("batch_anchor") not in anchors:
+            st.session_state.pop("batch_anchor", None)
+        st.selectbox("MOVE AFTER", anchors, key="batch_anchor",
+                     format_func=lambda a: a or "— top of the list —",
+                     help="Modes without this channel are left as they are.")
+    st.button(f"APPLY TO {len(chosen)} MODE(S)", key="batch_go",
+              on_click=_batch_apply, disabled=not (name and chosen),
+              use_container_width=True)
+    if st.session_state.get("batch_report"):
+        st.caption(st.session_state.batch_report)
+
+profile_mark("mode cards")
+for mode_idx in range(len(st.session_state.modes)):
+    render_mode_card(mode_idx)
 # ── Add Mode ──────────────────────────────────────────────────────────────────
 st.button("＋ Add Mode", on_click=add_mode)
 st.divider()
@@ -1332,85 +1472,600 @@ st.divider()
 #  GENERATE
 # ══════════════════════════════════════════════════════════════════════════════
 
-if st.button("⚡ Generate .gdtf File", type="primary", key="gen_manual"):
+@st.cache_resource
+def _build_store():
+    """
+    Built packages and exports, on disk and shared by every session of this
+    server — its own directory, removed when the server exits. A result
+    panel touches its files on every rerun, so a build lasts as long as
+    someone is looking at it.
+    """
+    root = tempfile.mkdtemp(prefix="gdtf_builder_builds_")
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    return BuildStore(root)
+
+def _stored(name):
+    """Deferred download payload — read from the build store on click."""
+    return lambda: _build_store().read(name)
+
+# ── description.xml viewer ─────────────────────────────────────────────────────
+# Pages of lines read through an XmlIndex: a rerun sends one page, and the
+# outline pickers and search hits jump to an element's line.
+_XML_PAGE = 200
+_XML_PICK = 300
+
+@st.cache_resource(max_entries=4)
+def _xml_index(name):
+    """One index per build — store names are content hashes."""
+    return XmlIndex(_build_store().path(name))
+
+def _xml_goto(key, name):
+    i = st.session_state.get(key)
+    if i is not None:
+        st.session_state.xml_line = _xml_index(name).nodes[i].line + 1
+
+def _xml_step(step, name):
+    last = _xml_index(name).line_count
+    st.session_state.xml_line = min(max(1, st.session_state.xml_line + step), last)
+
+def _xml_viewer(name):
+    index = _xml_index(name)
+    ft = index.find("FixtureType", index.find("GDTF"))
+    if st.session_state.setdefault("xml_line", 1) > index.line_count:
+        st.session_state.xml_line = 1
+
+    def _node(i):
+        return f"L{index.nodes[i].line + 1} · {index.nodes[i].tag} · {index.label(i)}"
+
+    xs1, xs2 = st.columns([1, 2])
+    with xs1:
+        query = st.text_input("SEARCH", key="xml_q",
+                              placeholder="element, Name or Attribute",
+                              help="Exact matches first, else any containing the text")
+    with xs2:
+        hits = index.search(query) if query.strip() else []
+        st.selectbox(f"{len(hits)} MATCH(ES)" + (" — first 200" if len(hits) == 200 else ""),
+                     hits, index=None, format_func=_node, key="xml_hit",
+                     placeholder="Jump to a match…",
+                     on_change=_xml_goto, args=("xml_hit", name))
+
+    xo1, xo2, xo3 = st.columns(3)
+    with xo1:
+        st.selectbox("SECTION", index.children(ft) if ft is not None else [],
+                     index=None, format_func=lambda i: index.nodes[i].tag,
+                     key="xml_sec", placeholder="FixtureType →",
+                     on_change=_xml_goto, args=("xml_sec", name))
+    dmx_modes = index.find("DMXModes", ft) if ft is not None else None
+    with xo2:
+        st.selectbox("DMX MODE", index.children(dmx_modes) if dmx_modes is not None else [],
+                     index=None, format_func=index.label, key="xml_mode",
+                     placeholder="DMXModes →",
+                     on_change=_xml_goto, args=("xml_mode", name))
+    mode_node = st.session_state.get("xml_mode")
+    channels = []
+    if mode_node is not None and mode_node < len(index.nodes):
+        dmx_chs = index.find("DMXChannels", mode_node)
+        channels = index.children(dmx_chs) if dmx_chs is not None else []
+    with xo3:
+        st.selectbox("CHANNEL" + (f" — first {_XML_PICK}" if len(channels) > _XML_PICK else ""),
+                     channels[:_XML_PICK], index=None, format_func=_node,
+                     key="xml_ch", placeholder="DMXChannels →",
+                     on_change=_xml_goto, args=("xml_ch", name))
+
+    xp1, xp2, xp3, xp4 = st.columns([1, 2, 1, 3])
+    with xp1:
+        st.button("◀", key="xml_prev", on_click=_xml_step, args=(-_XML_PAGE, name),
+                  use_container_width=True)
+    with xp2:
+        st.number_input("FROM LINE", min_value=1, max_value=max(1, index.line_count),
+                        step=_XML_PAGE, key="xml_line",
+                        label_visibility="collapsed")
+    with xp3:
+        st.button("▶", key="xml_next", on_click=_xml_step, args=(_XML_PAGE, name),
+                  use_container_width=True)
+    start = st.session_state.xml_line - 1
+    page = index.lines(start, _XML_PAGE)
+    with xp4:
+        st.markdown(
+            f'<p style="color:#AAAAAA;font-size:0.75rem">Lines {start + 1:,}–'
+            f'{start + len(page):,} of {index.line_count:,} · '
+            f'{index.size:,} bytes</p>', unsafe_allow_html=True)
+    st.code("\n".join(page), language="xml")
+
+_PHASE_LABELS = {"compile": "Compiling modes", "gdtf": "Writing description.xml",
+                 "csv": "Address chart", "json": "Console macro JSON",
+                 "package": "Packaging .gdtf", "validate": "Validating wheels",
+                 "separate": "Timing separate builds"}
+
+_MAX_CELLS = 10000
+
+def _family_counts():
+    """Distinct cell counts typed into the family field, in range, sorted."""
+    return sorted({int(n) for n in re.findall(r"\d+", st.session_state.get("family_counts", ""))
+                   if 1 <= int(n) <= _MAX_CELLS})
+
+def _start_generate(family=False):
+    """
+    Snapshot the fixture and hand the build to a worker thread. A running
+    build is superseded: it's cancelled and its result never shown.
+    family=True builds one variant per cell count in the family field.
+    """
     fname = st.session_state.get("fixture_name", "").strip() or "Unknown Fixture"
     mfr   = st.session_state.get("manufacturer", "").strip() or "Generic"
     cells = int(st.session_state.get("cell_count", 1))
+    heads = int(st.session_state.get("head_count", 1))
     modes_dict = {
         m["name"]: channel_defs_from_mode(m)
         for m in st.session_state.modes
         if m["name"].strip()
     }
-    try:
-        xml_data   = build_gdtf(fname, mfr, modes_dict, cell_count=cells)
-        gdtf_bytes = create_gdtf_package(xml_data)
-        # Count real DMX channels (body + cell × cells, excluding virtual)
-        total_dmx = sum(
-            len([c for c in b if not c.is_fine_byte]) +
-            len([c for c in c_ if not c.is_fine_byte and
-                 "virtual" not in c.name.lower()]) * cells
-            for b, c_ in modes_dict.values()
-        )
-        total_sets = sum(
-            len(ch.get("slots", []))
-            for m in st.session_state.modes
-            for ch in (m.get("body_channels", []) + m.get("cell_channels", []))
+    def _real(defs):
+        return len([c for c in defs if not c.is_fine_byte and
+                    "virtual" not in c.name.lower()])
+    # Count real DMX channels (body + cell × cells, or body + heads × (head +
+    # cell × cells) on a multi-head fixture; excluding virtual)
+    total_dmx = sum(
+        len([c for c in b if not c.is_fine_byte]) + (
+            heads * ((_real(h[0]) if h else 0) + _real(c_) * cells)
+            if heads >= 2 else _real(c_) * cells)
+        for b, c_, *h in modes_dict.values()
+    )
+    total_sets = sum(
+        len(ch.get("slots", []))
+        for m in st.session_state.modes
+        for ch in (m.get("body_channels", []) + m.get("cell_channels", []) +
+                   m.get("head_channels", []))
+    )
+    previous = st.session_state.get("gen_job")
+    if previous is not None:
+        previous.cancel()
+    st.session_state.gen_job = GenerateJob(
+        fname, mfr, modes_dict, cell_count=cells,
+        layout=st.session_state.get("cell_layout"),
+        heads=heads, head_layout=st.session_state.get("head_layout"),
+        media_store=_media_store(), build_store=_build_store(),
+        cell_counts=_family_counts() if family else None,
+        measure_separate=family and st.session_state.get("family_measure", False),
+        info={"fname": fname, "cells": cells, "heads": heads, "modes": len(modes_dict),
+              "dmx": total_dmx, "sets": total_sets}).start()
+
+def _cancel_generate():
+    job = st.session_state.get("gen_job")
+    if job is not None:
+        job.cancel()
+
+def _wheel_check(errors):
+    if errors:
+        st.markdown(
+            '<div class="warn-box"><b>⚠ Wheel reference issues detected</b> — ' +
+            'MA3 may silently drop affected channels on import:<br><ul>' +
+            "".join(f"<li>{e}</li>" for e in errors) +
+            '</ul></div>',
+            unsafe_allow_html=True
         )
-        cell_info = f" · {cells} cells" if cells > 1 else ""
-        st.success(
-            f"✅  {total_dmx} DMX channels · {total_sets} channel sets · "
-            f"{len(modes_dict)} mode(s){cell_info} · {len(gdtf_bytes):,} bytes"
+    else:
+        st.markdown(
+            '<div class="info-box" style="border-color:#00E000;background:#001A00">' +
+            '✔ Wheel references validated — all OK</div>',
+            unsafe_allow_html=True
         )
 
-        # ── Wheel reference validation ─────────────────────────────────────
-        wheel_errors = validate_wheel_references(xml_data)
-        if wheel_errors:
-            st.markdown(
-                '<div class="warn-box"><b>⚠ Wheel reference issues detected</b> — ' +
-                'MA3 may silently drop affected channels on import:<br><ul>' +
-                "".join(f"<li>{e}</li>" for e in wheel_errors) +
-                '</ul></div>',
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(
-                '<div class="info-box" style="border-color:#00E000;background:#001A00">' +
-                '✔ Wheel references validated — all OK</div>',
-                unsafe_allow_html=True
-            )
+def _render_family_result(job):
+    res, report = job.result, job.result.report
+    fname = job.info["fname"]
+    variants = report["variants"]
+    if not _build_store().touch(*res.files.values()):
+        st.markdown('<div class="warn-box">⚠ This build has been cleared from '
+                    'the server — generate again to download it.</div>',
+                    unsafe_allow_html=True)
+        return
+    if report["separate_seconds"] is not None:
+        separate = report["separate_seconds"]
+        versus = f"separate builds {separate:.2f} s, measured"
+    else:
+        separate = report["separate_estimate"]
+        versus = f"separate builds ≈ {separate:.2f} s, estimated"
+    st.success(
+        f"✅  {len(variants)} variant(s) · {job.info['modes']} mode(s) each · "
+        f"built in {report['seconds']:.2f} s — {versus} "
+        f"(saved {max(separate - report['seconds'], 0):.2f} s)"
+    )
+    _wheel_check(res.wheel_errors)
+    st.dataframe(
+        [{"cells": v["cells"], "fixture": v["name"],
+          "footprint": " · ".join(f"{m}: {fp}" for m, fp in v["footprints"].items()),
+          "description.xml KB": round(v["bytes"] / 1024, 1)}
+         for v in variants],
+        hide_index=True, use_container_width=True)
+    st.download_button(
+        f"📦 Download family .zip ({len(variants)} × .gdtf)",
+        _stored(res.files["package"]),
+        file_name=f"{fname.replace(' ','_')}_family.zip",
+        mime="application/zip", key="dl_family", on_click="ignore"
+    )
+
+def _render_generate_result(job):
+    """
+    Downloads are served by reference: each button carries a loader for
+    its build-store file, so no package bytes sit in the session or ride
+    along on reruns.
+    """
+    info, res = job.info, job.result
+    store = _build_store()
+    if not store.touch(*res.files.values()):
+        st.markdown('<div class="warn-box">⚠ This build has been cleared from '
+                    'the server — generate again to download it.</div>',
+                    unsafe_allow_html=True)
+        return
+    fname = info["fname"]
+    cell_info = f" · {info['cells']} cells" if info["cells"] > 1 else ""
+    if info.get("heads", 1) > 1:
+        cell_info = f" · {info['heads']} heads" + cell_info.replace(" cells", " cells/head")
+    st.success(
+        f"✅  {info['dmx']} DMX channels · {info['sets']} channel sets · "
+        f"{info['modes']} mode(s){cell_info} · "
+        f"{store.size(res.files['package']):,} bytes · {job.elapsed:.2f} s"
+    )
+
+    # ── Wheel reference validation ─────────────────────────────────────────
+    _wheel_check(res.wheel_errors)
 
-        col_dl, col_xp = st.columns([1, 2])
-        with col_dl:
+    col_dl, col_xp = st.columns([1, 2])
+    with col_dl:
+        st.download_button(
+            "📦 Download .gdtf", _stored(res.files["package"]),
+            file_name=f"{fname.replace(' ','_')}.gdtf",
+            mime="application/octet-stream", on_click="ignore"
+        )
+        for fmt, label in (("csv", "📄 Address chart .csv"),
+                           ("json", "🧾 Console macro .json")):
             st.download_button(
-                "📦 Download .gdtf", gdtf_bytes,
-                file_name=f"{fname.replace(' ','_')}.gdtf",
-                mime="application/octet-stream"
+                label, _stored(res.files[fmt]),
+                file_name=f"{fname.replace(' ','_')}.{EMITTERS[fmt][1]}",
+                mime="text/plain", key=f"dl_{fmt}", on_click="ignore"
             )
-            st.markdown("""
-            <div class="info-box" style="margin-top:0.8rem;font-size:0.78rem">
-            <b>MA3 onPC — place file at:</b><br>
-            <code style="font-size:0.7rem">Documents\\MA Lighting Technologies\\grandMA3\\gma3_library\\fixturetypes\\</code><br><br>
-            Then: <b>Menu → Patch → Fixture Types → Import → User tab</b>
-            </div>
-            """, unsafe_allow_html=True)
-        with col_xp:
-            with st.expander("View description.xml"):
-                st.code(xml_data, language="xml")
-    except Exception as e:
-        st.exception(e)
+        st.markdown("""
+        <div class="info-box" style="margin-top:0.8rem;font-size:0.78rem">
+        <b>MA3 onPC — place file at:</b><br>
+        <code style="font-size:0.7rem">Documents\\MA Lighting Technologies\\grandMA3\\gma3_library\\fixturetypes\\</code><br><br>
+        Then: <b>Menu → Patch → Fixture Types → Import → User tab</b>
+        </div>
+        """, unsafe_allow_html=True)
+    with col_xp:
+        xml_size = store.size(res.files["gdtf"])
+        # Off, a rerun carries none of it; on, one page of lines
+        if st.toggle(f"View description.xml ({xml_size:,} bytes)", key="gen_show_xml"):
+            _xml_viewer(res.files["gdtf"])
+
+def _generate_panel():
+    """
+    Progress while the worker runs (this fragment polls itself), then the
+    result. Finishing triggers one full rerun, which redefines the panel
+    without polling.
+    """
+    job = st.session_state.get("gen_job")
+    if job is None:
+        return
+    if not job.done:
+        pc1, pc2 = st.columns([5, 1])
+        with pc1:
+            st.progress(job.progress, text=f"⚙ {_PHASE_LABELS.get(job.phase, 'Starting')}"
+                                           f" · {time.perf_counter() - job.started:.1f} s")
+        with pc2:
+            st.button("✖ Cancel", key="gen_cancel", on_click=_cancel_generate,
+                      use_container_width=True)
+        return
+    if _in_fragment_rerun():
+        st.rerun()
+    if job.state == "done" and job.result.report:
+        _render_family_result(job)
+    elif job.state == "done":
+        _render_generate_result(job)
+    elif job.state == "failed":
+        st.exception(job.error)
+    else:
+        st.markdown(f'<p style="color:#AAAAAA;font-size:0.8rem">Generation cancelled '
+                    f'after {job.elapsed:.1f} s.</p>', unsafe_allow_html=True)
+
+profile_mark("generate")
+st.button("⚡ Generate .gdtf File", type="primary", key="gen_manual",
+          on_click=_start_generate,
+          help="Builds in the background — keep editing; a new click "
+               "supersedes a build still running.")
+with st.expander("👪 FIXTURE FAMILY — every cell count in one pass"):
+    st.markdown(
+        '''<div class="info-box">
+        One build per length of the same fixture (e.g. a 4 / 8 / 16 / 32 / 64-cell
+        batten). Attributes, wheels and modes are compiled once; each variant only
+        gets its own geometry and name (<code>Fixture Name</code> + cell count).
+        </div>''',
+        unsafe_allow_html=True
+    )
+    st.text_input("CELL COUNTS", value="4, 8, 16, 32, 64", key="family_counts",
+                  help=f"Comma-separated, 1–{_MAX_CELLS:,}")
+    st.checkbox("Measure separate builds", key="family_measure",
+                help="Also build every cell count on its own, uncached, to time "
+                     "what the family build saves — takes that long again. "
+                     "Otherwise the saving is an estimate.")
+    st.button("⚡ Generate family", key="gen_family", on_click=_start_generate,
+              args=(True,), disabled=not _family_counts())
+_gen_job = st.session_state.get("gen_job")
+st.fragment(_generate_panel,
+            run_every=0.25 if _gen_job is not None and not _gen_job.done else None)()
+
+# ── Workspace build / validate ────────────────────────────────────────────────
+# Every fixture in the workspace, on a worker thread like Generate: the open
+# fixture is packed first, so the job sees the edits made so far.
+
+def _start_workspace_job(action):
+    _stash_open()
+    previous = st.session_state.get("ws_job")
+    if previous is not None:
+        previous.cancel()
+    st.session_state.ws_job = WorkspaceJob(
+        list(st.session_state.workspace), action,
+        media_store=_media_store(), build_store=_build_store()).start()
+
+def _cancel_workspace_job():
+    job = st.session_state.get("ws_job")
+    if job is not None:
+        job.cancel()
+
+def _workspace_panel():
+    job = st.session_state.get("ws_job")
+    if job is None:
+        return
+    n = len(job.docs)
+    if not job.done:
+        pc1, pc2 = st.columns([5, 1])
+        with pc1:
+            label = (f"{job.step + 1}/{n} · {job.docs[job.step].name}"
+                     if job.step < n else "Packaging")
+            st.progress(job.progress, text=f"⚙ {label} · "
+                                           f"{time.perf_counter() - job.started:.1f} s")
+        with pc2:
+            st.button("✖ Cancel", key="ws_cancel", on_click=_cancel_workspace_job,
+                      use_container_width=True)
+        return
+    if _in_fragment_rerun():
+        st.rerun()
+    if job.state == "failed":
+        st.exception(job.error)
+        return
+    if job.state == "cancelled":
+        st.markdown(f'<p style="color:#AAAAAA;font-size:0.8rem">Cancelled after '
+                    f'{job.elapsed:.1f} s.</p>', unsafe_allow_html=True)
+        return
+    rows = job.result.report["fixtures"]
+    errors = sum(r["errors"] for r in rows)
+    warnings = sum(r["warnings"] for r in rows)
+    (st.warning if errors else st.success)(
+        f"{'Built' if job.action == 'build' else 'Validated'} {n} fixture(s) in "
+        f"{job.elapsed:.1f} s · {errors} error(s) · {warnings} warning(s)")
+    flagged = [r for r in rows if r["errors"] or r["warnings"]]
+    if flagged:
+        st.dataframe([{"fixture": r["name"], "errors": r["errors"],
+                       "warnings": r["warnings"], "first issue": r["first_issue"]}
+                      for r in flagged], hide_index=True, use_container_width=True)
+    if job.action == "build":
+        package = job.result.files["package"]
+        if _build_store().touch(package):
+            st.download_button(
+                f"📦 Download workspace .zip ({n} × .gdtf)", _stored(package),
+                file_name="gdtf_workspace.zip", mime="application/zip",
+                key="dl_ws", on_click="ignore")
+        else:
+            st.markdown('<div class="warn-box">⚠ This build has been cleared from '
+                        'the server — build again to download it.</div>',
+                        unsafe_allow_html=True)
+
+with st.expander(f"🗂 WORKSPACE BUILD — all {len(st.session_state.workspace)} fixture(s)"):
+    wb1, wb2 = st.columns(2)
+    with wb1:
+        st.button("⚡ Build all", key="ws_build", on_click=_start_workspace_job,
+                  args=("build",), use_container_width=True,
+                  help="One .zip with a .gdtf per fixture, linted as it's built.")
+    with wb2:
+        st.button("✔ Validate all", key="ws_validate", on_click=_start_workspace_job,
+                  args=("validate",), use_container_width=True,
+                  help="Compile and lint every fixture without packaging.")
+    _ws_job = st.session_state.get("ws_job")
+    st.fragment(_workspace_panel,
+                run_every=0.25 if _ws_job is not None and not _ws_job.done else None)()
+
+
+# ── Patch planner ─────────────────────────────────────────────────────────────
+# The plan is cheap to recompute (vectorized) from the fixture snapshot taken
+# on click, so the session keeps only that snapshot and a summary — the
+# address map itself is built when a download button is pressed.
+
+def _plan_patch():
+    cells = int(st.session_state.get("cell_count", 1))
+    modes_dict = {m["name"]: channel_defs_from_mode(m)
+                  for m in st.session_state.modes if m["name"].strip()}
+    spec = (st.session_state.get("fixture_name", "").strip() or "Unknown Fixture",
+            st.session_state.get("manufacturer", "").strip() or "Generic",
+            modes_dict, cells, st.session_state.get("cell_layout"),
+            int(st.session_state.get("head_count", 1)),
+            st.session_state.get("head_layout"))
+    rules = PatchRules(st.session_state.patch_universe, st.session_state.patch_address,
+                       st.session_state.patch_align, st.session_state.patch_gap,
+                       st.session_state.patch_straddle, st.session_state.patch_spacing)
+    args = (spec, st.session_state.patch_mode, st.session_state.patch_count, rules)
+    try:
+        plan = _patch_plan(args)
+    except ValueError as e:
+        st.session_state.patch_result = {"error": str(e)}
+        return
+    st.session_state.patch_result = {
+        "args": args, "summary": patch_summary(plan),
+        "preview": [{"instance": i + 1, "universe": int(u), "address": int(a)}
+                    for i, (u, a) in enumerate(zip(plan.universe[:50], plan.address[:50]))]}
+
+def _patch_plan(args):
+    spec, mode, count, rules = args
+    return plan_patch(compile_fixture(*spec), mode, count, rules,
+                      layout=spec[4], head_layout=spec[6])
+
+def _patch_export(args, fmt):
+    return lambda: (patch_plan_csv if fmt == "csv" else patch_plan_json)(_patch_plan(args))
+
+@st.fragment
+def _patch_planner():
+    mode_names = [m["name"] for m in st.session_state.modes if m["name"].strip()]
+    if not mode_names:
+        st.markdown('<p style="color:#AAAAAA;font-size:0.8rem">Name a mode first.</p>',
+                    unsafe_allow_html=True)
+        return
+    pc1, pc2, pc3, pc4 = st.columns(4)
+    with pc1:
+        if st.session_state.get("patch_mode") not in mode_names:
+            st.session_state.patch_mode = mode_names[0]
+        st.selectbox("MODE", mode_names, key="patch_mode")
+        st.number_input("INSTANCES", min_value=1, max_value=100000, value=100,
+                        key="patch_count")
+    with pc2:
+        st.number_input("START UNIVERSE", min_value=1, max_value=63999, value=1,
+                        key="patch_universe")
+        st.number_input("START ADDRESS", min_value=1, max_value=512, value=1,
+                        key="patch_address")
+    with pc3:
+        st.number_input("ALIGN", min_value=1, max_value=512, value=1, key="patch_align",
+                        help="Start every instance on 1, 1+align, 1+2·align …")
+        st.number_input("GAP", min_value=0, max_value=511, value=0, key="patch_gap",
+                        help="Spare addresses left after each instance")
+    with pc4:
+        st.number_input("SPACING (m)", min_value=0.0, value=1.0, step=0.1,
+                        key="patch_spacing", help="Distance between instances along X")
+        st.toggle("Allow universe straddling", key="patch_straddle")
+    st.button("🗺 Plan patch", key="patch_go", on_click=_plan_patch,
+              use_container_width=True)
+
+    result = st.session_state.get("patch_result")
+    if not result:
+        return
+    if "error" in result:
+        st.markdown(f'<div class="warn-box">⚠ {result["error"]}</div>',
+                    unsafe_allow_html=True)
+        return
+    summ, args = result["summary"], result["args"]
+    q1, q2, q3, q4 = st.columns(4)
+    q1.metric("INSTANCES", f"{summ['instances']:,}", help=f"{summ['cells']:,} cell rows")
+    q2.metric("UNIVERSES", f"{summ['universes']:,}")
+    q3.metric("LAST ADDRESS", summ["last"])
+    q4.metric("DMX USED", f"{summ['utilisation']:.0%}")
+    st.dataframe(result["preview"], hide_index=True, use_container_width=True, height=200)
+    stem = args[0][0].replace(" ", "_")
+    dc1, dc2 = st.columns(2)
+    with dc1:
+        st.download_button("📄 Address map .csv", _patch_export(args, "csv"),
+                           file_name=f"{stem}_patch.csv", mime="text/csv",
+                           key="patch_csv", on_click="ignore", use_container_width=True)
+    with dc2:
+        st.download_button("🧾 Address map .json", _patch_export(args, "json"),
+                           file_name=f"{stem}_patch.json", mime="application/json",
+                           key="patch_json", on_click="ignore", use_container_width=True)
+
+profile_mark("patch planner")
+with st.expander("🗺 PATCH PLANNER — address many instances across universes"):
+    _patch_planner()
 
 
 # ── Attribute reference ───────────────────────────────────────────────────────
 st.divider()
+@st.cache_resource
+def _attr_reference_html():
+    """The whole reference table as one markdown element, built once."""
+    rows = "".join(
+        f'<div><span class="badge b-ok">{raw}</span>'
+        f'<span style="color:#999;font-size:0.7rem"> → {attr}</span></div>'
+        for raw, (attr, *_) in ATTR_MAP.items())
+    return f'<div class="attr-ref">{rows}</div>'
+
+profile_mark("attribute reference")
 with st.expander("📖 Supported Channel Names"):
-    cols = st.columns(3)
-    items = list(ATTR_MAP.items())
-    chunk = len(items) // 3 + 1
-    for i, col in enumerate(cols):
-        with col:
-            for raw, (attr, *_) in items[i*chunk:(i+1)*chunk]:
-                st.markdown(
-                    f'<span class="badge b-ok">{raw}</span>'
-                    f'<span style="color:#999;font-size:0.7rem"> → {attr}</span>',
-                    unsafe_allow_html=True
-                )
+    st.markdown(_attr_reference_html(), unsafe_allow_html=True)
+    query = st.text_input(
+        "LOOK UP A GDTF 1.1 ATTRIBUTE", key="attr_lookup",
+        placeholder="e.g. Gobo2WheelSpin / warm white / CTC / Blade 3 Rot",
+        help="Any GDTF 1.1 attribute name or common alias is recognised "
+             "as a channel name, not only the shortcuts above.")
+    if query.strip():
+        rec = attribute_record(query)
+        key = attr_key(query)
+        hits = [rec] if rec else [a for a in all_attributes()
+                                  if key and key in attr_key(a.name)][:24]
+        if hits:
+            st.markdown('<div class="attr-ref">' + "".join(
+                f'<div><span class="badge b-ok">{a.name}</span>'
+                f'<span style="color:#999;font-size:0.7rem"> {a.feature_group}.'
+                f'{a.feature} · {a.physical_unit} · {a.kind}</span></div>'
+                for a in hits) + '</div>', unsafe_allow_html=True)
+        else:
+            st.markdown('<p style="color:#AAAAAA;font-size:0.8rem">No GDTF '
+                        'attribute matches — it will be a custom Control '
+                        'attribute.</p>', unsafe_allow_html=True)
+
+
+# ── Session diagnostics ───────────────────────────────────────────────────────
+profile_mark("diagnostics")
+with st.expander("🩺 Session diagnostics"):
+    if st.toggle("Measure session memory each rerun", key="diag_on",
+                 help="Pickles every session value — leave off on huge fixtures."):
+        fp   = session_footprint()
+        gc   = st.session_state.get("_widget_gc", {"runs": 0, "last": 0, "total": 0})
+        hist = st.session_state.setdefault("_diag_history", [])
+        hist.append({"t": time.strftime("%H:%M:%S"), "keys": fp["keys"],
+                     "KB": round(fp["bytes"] / 1024, 1)})
+        del hist[:-120]
+        d1, d2, d3, d4 = st.columns(4)
+        d1.metric("SESSION KEYS", fp["keys"])
+        d2.metric("APPROX SIZE", f"{fp['bytes'] / 1024:,.1f} KB")
+        d3.metric("WIDGET KEYS", fp["widget_keys"],
+                  help=f"{fp['widget_bytes'] / 1024:,.1f} KB")
+        d4.metric("MODEL", f"{fp['model_bytes'] / 1024:,.1f} KB",
+                  help=f"Undo history {fp['history_bytes'] / 1024:,.1f} KB "
+                       f"({len(st.session_state.history)} snapshots, shared)")
+        st.markdown(
+            f'<p style="color:#AAAAAA;font-size:0.75rem">'
+            f'Stale widget keys dropped: {gc["last"]} last full run · '
+            f'{gc["total"]} over {gc["runs"]} full runs</p>',
+            unsafe_allow_html=True)
+        if len(hist) > 1:
+            st.line_chart(hist, x="t", y=["keys", "KB"], height=160)
+
+profile_end()
+
+# ── Render profiler ───────────────────────────────────────────────────────────
+with st.expander("⏱ Render profiler"):
+    st.toggle("Profile each rerun", key="prof_on",
+              help="Times every page section and counts the widgets it creates. "
+                   "Mode-card clicks show up as 'card' runs.")
+    prof_hist = st.session_state.get("_prof_history", [])
+    if st.session_state.get("prof_on") and prof_hist:
+        last = prof_hist[-1]
+        p1, p2, p3 = st.columns(3)
+        p1.metric("LAST RUN", f"{last['ms']:,.0f} ms", help=f"{last['kind']} run")
+        counts = [r["widgets"] for path, r in last["sections"].items()
+                  if " › " not in path]
+        p2.metric("WIDGETS", "n/a" if None in counts else sum(counts))
+        p3.metric("RUNS KEPT", len(prof_hist))
+        if None in counts or _in_fragment_rerun() is None:
+            st.caption("n/a — this Streamlit version doesn't expose the run state "
+                       "the profiler reads (widget counts, card runs); see the "
+                       "range pinned in requirements.txt.")
+        st.dataframe(
+            [{"section": path, "ms": round(r["ms"], 1),
+              "widgets": "n/a" if r["widgets"] is None else r["widgets"],
+              "calls": r["calls"]}
+             for path, r in sorted(last["sections"].items(),
+                                   key=lambda kv: -kv[1]["ms"])],
+            hide_index=True, use_container_width=True)
+        tops = sorted({path for run in prof_hist for path in run["sections"]
+                       if " › " not in path})
+        if len(prof_hist) > 1:
+            st.line_chart(
+                [{"run": i, **{p: round(run["sections"].get(p, {}).get("ms", 0), 1)
+                               for p in tops}}
+                 for i, run in enumerate(prof_hist)],
+                x="run", y=tops, height=220)
@@ -0,0 +1,2685 @@
+"""
+GDTF 1.1 Builder — core model, compiler and emitters
+No Streamlit imports: shared by the app and the command-line tools.
+"""
+
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+from collections import namedtuple, deque
+import zipfile, io, uuid, re, csv, itertools, json, functools, html
+import os, shutil, hashlib, tempfile, threading, time, pickle, zlib
+
+import numpy as np
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  GDTF ATTRIBUTE MAP
+# ══════════════════════════════════════════════════════════════════════════════
+ATTR_MAP = {
+    "dimmer":           ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
+    "intensity":        ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
+    "master":           ("Dimmer",              "Dimming",  "Intensity", "Dimmer"),
+    "pan":              ("Pan",                 "Position", "Position",  "PanTilt"),
+    "tilt":             ("Tilt",                "Position", "Position",  "PanTilt"),
+    "pan speed":        ("PanRotate",           "Position", "Position",  "PanTilt"),
+    "tilt speed":       ("TiltRotate",          "Position", "Position",  "PanTilt"),
+    "red":              ("ColorAdd_R",          "Color",    "Color",     "RGB"),
+    "green":            ("ColorAdd_G",          "Color",    "Color",     "RGB"),
+    "blue":             ("ColorAdd_B",          "Color",    "Color",     "RGB"),
+    "white":            ("ColorAdd_W",          "Color",    "Color",     "RGBW"),
+    "amber":            ("ColorAdd_A",          "Color",    "Color",     "RGBW"),
+    "lime":             ("ColorAdd_L",          "Color",    "Color",     "RGBW"),
+    "uv":               ("ColorAdd_UV",         "Color",    "Color",     "RGBW"),
+    "indigo":           ("ColorAdd_I",          "Color",    "Color",     "RGBW"),
+    "cyan":             ("ColorSub_C",          "Color",    "Color",     "CMY"),
+    "magenta":          ("ColorSub_M",          "Color",    "Color",     "CMY"),
+    "yellow":           ("ColorSub_Y",          "Color",    "Color",     "CMY"),
+    "cto":              ("CTO",                 "Color",    "Color",     "CTO"),
+    "ctb":              ("CTB",                 "Color",    "Color",     "CTB"),
+    "hue":              ("CIE_X",              "Color",    "Color",     "HSB"),
+    "saturation":       ("CIE_Y",              "Color",    "Color",     "HSB"),
+    "color wheel":      ("Color1",             "Color",    "Color",     "ColorWheel"),
+    "colour wheel":     ("Color1",             "Color",    "Color",     "ColorWheel"),
+    "color":            ("Color1",             "Color",    "Color",     "ColorWheel"),
+    "colour":           ("Color1",             "Color",    "Color",     "ColorWheel"),
+    "color mix":        ("ColorMixMode",       "Color",    "Color",     "ColorWheel"),
+    "shutter":          ("Shutter1",           "Beam",     "Beam",      "Shutter"),
+    "strobe":           ("Shutter1Strobe",     "Beam",     "Beam",      "Shutter"),
+    "strobe rate":      ("Shutter1StrobeFreq", "Beam",     "Beam",      "Shutter"),
+    "strobe speed":     ("Shutter1StrobeFreq", "Beam",     "Beam",      "Shutter"),
+    "zoom":             ("Zoom",               "Beam",     "Beam",      "Zoom"),
+    "focus":            ("Focus1",             "Beam",     "Beam",      "Focus"),
+    "iris":             ("Iris",               "Beam",     "Beam",      "Iris"),
+    "frost":            ("Frost1",             "Beam",     "Beam",      "Frost"),
+    "diffusion":        ("Frost1",             "Beam",     "Beam",      "Frost"),
+    "gobo":             ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
+    "gobo wheel":       ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
+    "gobo 1":           ("Gobo1",             "Gobo",     "Gobo",      "Gobo"),
+    "gobo 2":           ("Gobo2",             "Gobo",     "Gobo",      "Gobo"),
+    "gobo rotation":    ("Gobo1Pos",          "Gobo",     "Gobo",      "Gobo"),
+    "gobo spin":        ("Gobo1PosRotate",    "Gobo",     "Gobo",      "Gobo"),
+    "gobo index":       ("Gobo1Pos",          "Gobo",     "Gobo",      "Gobo"),
+    "prism":            ("Prism1",            "Beam",     "Beam",      "Prism"),
+    "prism rotation":   ("Prism1Pos",         "Beam",     "Beam",      "Prism"),
+    "effects":          ("Effects1",          "Beam",     "Beam",      "Effects"),
+    "effect":           ("Effects1",          "Beam",     "Beam",      "Effects"),
+    "animation":        ("Effects1",          "Beam",     "Beam",      "Effects"),
+    "effects speed":    ("EffectsSpeed",      "Beam",     "Beam",      "Effects"),
+    "effects fade":     ("EffectsFade",       "Beam",     "Beam",      "Effects"),
+    "blade 1":          ("Blade1A",           "Shapers",  "Shapers",   "Blade"),
+    "blade 2":          ("Blade2A",           "Shapers",  "Shapers",   "Blade"),
+    "blade 3":          ("Blade3A",           "Shapers",  "Shapers",   "Blade"),
+    "blade 4":          ("Blade4A",           "Shapers",  "Shapers",   "Blade"),
+    "blade rotation":   ("ShaperRot",         "Shapers",  "Shapers",   "Blade"),
+    "macro":            ("Macro",             "Control",  "Control",   "Macro"),
+    "scene":            ("Macro",             "Control",  "Control",   "Macro"),
+    "program":          ("Macro",             "Control",  "Control",   "Macro"),
+    "function":         ("Function",          "Control",  "Control",   "Function"),
+    "control":          ("Function",          "Control",  "Control",   "Function"),
+    "reset":            ("Function",          "Control",  "Control",   "Function"),
+    "lamp":             ("LampControl",       "Control",  "Control",   "Function"),
+    "fans":             ("Function",          "Control",  "Control",   "Function"),
+    "speed":            ("EffectsSpeed",      "Beam",     "Beam",      "Effects"),
+    "video":            ("VideoEffect1Type",  "Control",  "Control",   "Function"),
+    "media":            ("VideoEffect1Type",  "Control",  "Control",   "Function"),
+}
+
+WHEEL_ATTRS = {
+    "Color1", "Color2", "Gobo1", "Gobo2", "Gobo1Pos", "Gobo2Pos",
+    "Prism1", "Effects1", "Animation1", "Macro", "LampControl",
+    "Function", "Shutter1", "Shutter1Strobe",
+}
+
+# Channels that are continuous (no DMX slots needed)
+CONTINUOUS = {
+    "Dimmer", "Dimmer Fine", "Pan", "Pan Fine", "Tilt", "Tilt Fine",
+    "Red", "Green", "Blue", "White", "Amber", "Lime", "UV", "Indigo",
+    "Cyan", "Magenta", "Yellow", "CTO", "CTB", "Hue", "Saturation",
+    "Zoom", "Zoom Fine", "Focus", "Focus Fine", "Iris",
+    "Pan Speed", "Tilt Speed", "Effects Speed", "Effects Fade",
+    "Gobo Rotation", "Gobo Spin", "Gobo Index", "Prism Rotation",
+    "Blade 1", "Blade 2", "Blade 3", "Blade 4", "Blade Rotation",
+}
+
+PRESETS = {
+    "Shutter": [
+        (0,9,"Closed"),(10,19,"Open"),
+        (20,129,"Strobe Slow-Fast"),(130,139,"Open"),
+        (140,189,"Pulse"),(190,199,"Open"),
+        (200,249,"Random Strobe"),(250,255,"Open"),
+    ],
+    "Strobe": [(0,9,"Closed"),(10,19,"Open"),(20,255,"Strobe Slow-Fast")],
+    "Macro": [
+        (0,9,"Off"),(10,19,"Macro 1"),(20,29,"Macro 2"),
+        (30,39,"Macro 3"),(40,49,"Macro 4"),(50,59,"Macro 5"),
+    ],
+    "Function": [
+        (0,9,"No Function"),(10,19,"Reset"),
+        (20,29,"Lamp On"),(30,39,"Lamp Off"),
+    ],
+    "Control": [
+        (0,9,"No Function"),(10,19,"Reset"),
+        (20,29,"Lamp On"),(30,39,"Lamp Off"),
+    ],
+    "Color Wheel": [
+        (0,9,"Open"),(10,19,"Color 1"),(20,29,"Color 2"),
+        (30,39,"Color 3"),(40,49,"Color 4"),(50,59,"Color 5"),
+        (60,69,"Color 6"),(70,79,"Color 7"),(80,89,"Color 8"),
+    ],
+    "Colour Wheel": [
+        (0,9,"Open"),(10,19,"Color 1"),(20,29,"Color 2"),
+        (30,39,"Color 3"),(40,49,"Color 4"),(50,59,"Color 5"),
+    ],
+    "Gobo Wheel": [
+        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
+        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
+        (60,69,"Gobo 6"),(70,79,"Gobo 7"),
+    ],
+    "Gobo 1": [
+        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
+        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
+    ],
+    "Gobo 2": [
+        (0,9,"Open"),(10,19,"Gobo 1"),(20,29,"Gobo 2"),
+        (30,39,"Gobo 3"),(40,49,"Gobo 4"),(50,59,"Gobo 5"),
+    ],
+    "Prism": [(0,9,"No Prism"),(10,255,"Prism")],
+    "Effects": [
+        (0,9,"No Effect"),(10,19,"Effect 1"),
+        (20,29,"Effect 2"),(30,39,"Effect 3"),
+    ],
+    "Scene": [
+        (0,9,"Off"),(10,19,"Scene 1"),(20,29,"Scene 2"),
+        (30,39,"Scene 3"),(40,49,"Scene 4"),(50,59,"Scene 5"),
+    ],
+    "Program": [
+        (0,9,"Off"),(10,19,"Program 1"),(20,29,"Program 2"),
+        (30,39,"Program 3"),(40,49,"Program 4"),
+    ],
+}
+
+CHANNEL_CATALOGUE = {
+    "DIMMING": [("Dimmer",False),("Dimmer Fine",True)],
+    "POSITION": [
+        ("Pan",False),("Pan Fine",True),
+        ("Tilt",False),("Tilt Fine",True),
+        ("Pan Speed",False),("Tilt Speed",False),
+    ],
+    "COLOR — RGB/W": [
+        ("Red",False),("Green",False),("Blue",False),
+        ("White",False),("Amber",False),("Lime",False),
+        ("UV",False),("Indigo",False),
+    ],
+    "COLOR — CMY": [("Cyan",False),("Magenta",False),("Yellow",False)],
+    "COLOR — MISC": [
+        ("CTO",False),("CTB",False),
+        ("Hue",False),("Saturation",False),
+        ("Color Wheel",False),("Color Mix",False),
+    ],
+    "BEAM": [
+        ("Shutter",False),("Strobe",False),("Strobe Speed",False),
+        ("Zoom",False),("Zoom Fine",True),
+        ("Focus",False),("Focus Fine",True),
+        ("Iris",False),("Frost",False),("Diffusion",False),
+    ],
+    "GOBO": [
+        ("Gobo Wheel",False),("Gobo 1",False),("Gobo 2",False),
+        ("Gobo Rotation",False),("Gobo Index",False),("Gobo Spin",False),
+    ],
+    "PRISM / EFFECTS": [
+        ("Prism",False),("Prism Rotation",False),
+        ("Effects",False),("Effects Speed",False),
+        ("Effects Fade",False),("Animation",False),
+    ],
+    "SHAPERS": [
+        ("Blade 1",False),("Blade 2",False),
+        ("Blade 3",False),("Blade 4",False),
+        ("Blade Rotation",False),
+    ],
+    "CONTROL": [
+        ("Macro",False),("Scene",False),("Program",False),
+        ("Function",False),("Control",False),("Reset",False),
+        ("Lamp",False),("Fans",False),("Speed",False),
+    ],
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  GDTF ATTRIBUTE DICTIONARY
+#  The full GDTF 1.1 attribute set, prebuilt from data/gdtf_attributes.tsv by
+#  build_attribute_index.py. Loaded on first lookup, not at import; names and
+#  aliases are normalised to one key space, so every lookup is a dict hit.
+# ══════════════════════════════════════════════════════════════════════════════
+
+ATTRIBUTE_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "gdtf_attributes.json")
+
+AttributeDef = namedtuple("AttributeDef", "name pretty feature_group feature "
+                                          "activation_group physical_unit kind")
+
+_KEY_STRIP = re.compile(r"[^a-z0-9]+")
+
+
+def attr_key(text):
+    """Lookup key: 'Gobo 2 Wheel-Spin' and 'Gobo2WheelSpin' -> 'gobo2wheelspin'."""
+    return _KEY_STRIP.sub("", text.lower())
+
+
+@functools.lru_cache(maxsize=None)
+def _attribute_index():
+    """{key: AttributeDef} for every attribute name and alias."""
+    try:
+        with open(ATTRIBUTE_INDEX_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    features, groups = data["features"], data["groups"]
+    units, kinds = data["units"], data["kinds"]
+    defs = [
+        AttributeDef(name, pretty, *features[fi].split(".", 1),
+                     groups[gi], units[ui], kinds[ki])
+        for name, pretty, fi, gi, ui, ki in data["attributes"]]
+    return {key: defs[row] for key, row in data["index"].items()}
+
+
+def attribute_record(name):
+    """AttributeDef for a GDTF attribute name or alias, else None."""
+    return _attribute_index().get(attr_key(name))
+
+
+def all_attributes():
+    """Every AttributeDef once, in dictionary order."""
+    return list(dict.fromkeys(_attribute_index().values()))
+
+
+def is_wheel_attr(attr):
+    """Does a channel with this attribute get a <Wheel> for its sets?"""
+    if attr in WHEEL_ATTRS:
+        return True
+    rec = attribute_record(attr)
+    return rec is not None and rec.name == attr and rec.kind == "wheel"
+
+
+def is_known_channel(name):
+    low = name.lower()
+    return any(k in low for k in ATTR_MAP) or attribute_record(name) is not None
+
+
+def is_continuous_channel(name):
+    """Continuous channels don't take channel sets (DMX slots)."""
+    if name in CONTINUOUS:
+        return True
+    rec = attribute_record(name)
+    return rec is not None and rec.kind == "continuous"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  NAME SEARCH
+#  Trigram index over channel names. A query's trigrams pull posting arrays
+#  that one np.bincount turns into per-entry overlap, so typos and half-
+#  remembered aliases still land; exact / prefix / substring matches rank
+#  first. The static index (catalogue, dictionary names and aliases, ATTR_MAP
+#  shortcuts) is built once; workspace indexes are cached on their names.
+# ══════════════════════════════════════════════════════════════════════════════
+
+NameHit = namedtuple("NameHit", "text score payload")
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Fuzzy lookup over (text, payload) entries; texts are matched by attr_key."""
+
+    def __init__(self, entries):
+        self.texts, self.keys, self.payloads = [], [], []
+        postings, sizes, seen = {}, [], set()
+        for text, payload in entries:
+            key = attr_key(text)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            row = len(self.keys)
+            grams = _trigrams(key)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+            self.texts.append(text)
+            self.keys.append(key)
+            self.payloads.append(payload)
+            sizes.append(len(grams))
+        self.sizes = np.array(sizes, dtype=np.float64)
+        self.postings = {g: np.array(rows, dtype=np.int32) for g, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query, limit=10, cutoff=0.45):
+        """
+        NameHits best first. score = containment of the query's trigrams
+        (plus Dice overlap as the tie-break); hits below cutoff are dropped.
+        """
+        key = attr_key(query)
+        if not key or not self.keys:
+            return []
+        grams = _trigrams(key)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        score = shared / len(grams) + shared / (len(grams) + self.sizes)
+        pool = min(len(score), limit * 4)
+        rows = np.argpartition(-score, pool - 1)[:pool]
+        hits = []
+        for row in rows[score[rows] >= cutoff].tolist():
+            k = self.keys[row]
+            rank = 3 if k == key else 2 if k.startswith(key) else 1 if key in k else 0
+            hits.append((rank, float(score[row]), row))
+        hits.sort(key=lambda h: (-h[0], -h[1], h[2]))
+        return [NameHit(self.texts[row], round(sc, 3), self.payloads[row])
+                for _, sc, row in hits[:limit]]
+
+
+@functools.lru_cache(maxsize=None)
+def _channel_choices():
+    """(key, name, fine, group) for the catalogue, then dictionary-only names."""
+    choices = [(attr_key(name), name, fine, group)
+               for group, channels in CHANNEL_CATALOGUE.items()
+               for name, fine in channels]
+    seen = {c[0] for c in choices}
+    for a in all_attributes():
+        key = attr_key(a.name)
+        if key not in seen:
+            seen.add(key)
+            choices.append((key, a.name, False, a.feature_group))
+    return tuple(choices)
+
+
+@functools.lru_cache(maxsize=None)
+def name_index():
+    """
+    Static index; each payload is the (name, fine, group) a picker would add.
+    Aliases point at their attribute's entry, ATTR_MAP shortcuts at themselves.
+    """
+    choices = {key: rest for key, *rest in _channel_choices()}
+    entries = [(name, (name, fine, group)) for name, fine, group in choices.values()]
+    for key, rec in _attribute_index().items():
+        target = choices.get(attr_key(rec.name))
+        if target:
+            entries.append((key, tuple(target)))
+    entries += [(raw, (raw.title(), is_fine(raw), "Shortcut")) for raw in ATTR_MAP]
+    return NameIndex(entries)
+
+
+@functools.lru_cache(maxsize=256)
+def channel_suggestions(query, limit=12):
+    """Picker matches for a typed query as (name, fine, group), best first."""
+    found = []
+    for hit in name_index().search(query, limit * 2):
+        if hit.payload not in found:
+            found.append(hit.payload)
+    return tuple(found[:limit])
+
+
+def suggest_attribute(name):
+    """Closest known channel name for an unrecognised one, else None."""
+    hits = name_index().search(name, 1, cutoff=0.9)
+    return hits[0].payload[0] if hits else None
+
+
+@functools.lru_cache(maxsize=8)
+def workspace_index(names):
+    """NameIndex over a workspace's distinct channel names (payload: the name)."""
+    return NameIndex((n, n) for n in names)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DATA STRUCTURES
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ChannelSlot:
+    def __init__(self, name, dmx_from, dmx_to,
+                 physical_from=0.0, physical_to=1.0, slot_name="", media=""):
+        self.name          = name
+        self.dmx_from      = dmx_from
+        self.dmx_to        = dmx_to
+        self.physical_from = physical_from
+        self.physical_to   = physical_to
+        self.slot_name     = slot_name or name
+        self.media         = media      # MediaStore name of the slot image
+
+class ChannelDef:
+    def __init__(self, name, is_fine_byte=False, slots=None, geometry="body"):
+        self.name         = name
+        self.is_fine_byte = is_fine_byte
+        self.slots        = slots or []
+        self.geometry     = geometry  # "body" | "cell" | "virtual"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  HELPERS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def resolve_attr(raw):
+    """
+    (attribute, feature group, feature, activation group) for a channel name:
+    exact ATTR_MAP name, then exact GDTF attribute / alias, then the first
+    ATTR_MAP name contained in it, else a custom Control attribute.
+    """
+    clean = raw.lower().strip()
+    if clean in ATTR_MAP:
+        return ATTR_MAP[clean]
+    rec = attribute_record(clean)
+    if rec is not None:
+        return (rec.name, rec.feature_group, rec.feature, rec.activation_group)
+    for key, val in ATTR_MAP.items():
+        if key in clean:
+            return val
+    safe = re.sub(r'[^A-Za-z0-9_]', '_', raw.strip()) or "Custom"
+    return (safe, "Control", "Control", safe)
+
+def is_fine(name):
+    return any(w in name.lower()
+               for w in ["fine", " lsb", "16-bit", "16bit", "low byte"])
+
+def _safe(text, fallback="Ch"):
+    s = text.strip()
+    for old, new in [("°","deg"),("%","pct"),("/","_"),(".","_"),
+                     (":","_"),(";","_")]:
+        s = s.replace(old, new)
+    s = re.sub(r'[^A-Za-z0-9_ \-]', '', s)
+    s = re.sub(r'[ _]+', '_', s).strip('_')
+    if not s or s[0].isdigit():
+        s = fallback + "_" + s
+    return s or fallback
+
+def _guid():
+    raw = uuid.uuid4().hex.upper()
+    return f"{raw[:8]}-{raw[8:12]}-{raw[12:16]}-{raw[16:20]}-{raw[20:]}"
+
+def _new_channel_id():
+    return uuid.uuid4().hex[:8]
+
+def make_channel_entry(name, fine=False, geometry="body"):
+    return {"id": _new_channel_id(), "name": name,
+            "is_fine": fine, "slots": [], "geometry": geometry}
+
+def make_slot_entry(dmx_from=0, dmx_to=10, name=""):
+    return {"dmx_from": dmx_from, "dmx_to": dmx_to, "name": name}
+
+def _ch_list_to_defs(ch_list):
+    """Convert a list of channel dicts to ChannelDef objects."""
+    defs = []
+    for ch in ch_list:
+        slots = [
+            ChannelSlot(
+                name=s["name"],
+                dmx_from=int(s["dmx_from"]),
+                dmx_to=int(s["dmx_to"]),
+                physical_from=round(int(s["dmx_from"]) / 255, 6),
+                physical_to=round(int(s["dmx_to"]) / 255, 6),
+                slot_name=s["name"],
+                media=s.get("media", ""),
+            )
+            for s in ch.get("slots", [])
+            if s.get("name", "").strip()
+        ]
+        defs.append(ChannelDef(
+            name=ch["name"],
+            is_fine_byte=ch.get("is_fine", False),
+            slots=slots,
+        ))
+    return defs
+
+
+def channel_defs_from_mode(mode):
+    """
+    Returns (body_defs, cell_defs) — two independent ChannelDef lists — plus
+    head_defs when the mode has head channels (multi-head fixtures).
+    """
+    # Backwards compat: old single channel_list treated as body
+    if "body_channels" not in mode and "cell_channels" not in mode:
+        body = _ch_list_to_defs(mode.get("channel_list", []))
+        return body, []
+    body = _ch_list_to_defs(mode.get("body_channels", []))
+    cell = _ch_list_to_defs(mode.get("cell_channels", []))
+    if mode.get("head_channels"):
+        return body, cell, _ch_list_to_defs(mode["head_channels"])
+    return body, cell
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DMX CHART IMPORTER
+#  Manufacturer charts: one row per channel, or one row per DMX range with the
+#  channel columns left blank on continuation rows. Rows are streamed — the
+#  whole file is never held as a list of rows.
+# ══════════════════════════════════════════════════════════════════════════════
+
+CHART_COLUMNS = {
+    "mode":     ("mode", "dmx mode", "personality", "mode name"),
+    "channel":  ("channel", "ch", "#", "offset", "address", "dmx channel", "ch no"),
+    "name":     ("name", "channel name", "function", "attribute", "parameter"),
+    "fine":     ("fine", "16bit", "16-bit", "fine byte", "resolution"),
+    "geometry": ("geometry", "placement", "body/cell", "part", "section"),
+    "range":    ("range", "dmx range", "values", "dmx values"),
+    "dmx_from": ("from", "dmx from", "start", "min", "value from"),
+    "dmx_to":   ("to", "dmx to", "end", "max", "value to"),
+    "label":    ("label", "set", "channel set", "description", "slot", "value name"),
+}
+
+# Positional layout when the chart has no header row
+CHART_DEFAULT_ORDER = ("channel", "name", "dmx_from", "dmx_to", "label")
+
+_TRUTHY  = {"1", "y", "yes", "true", "x", "fine", "16", "16bit", "16-bit", "lsb"}
+_CELL    = {"cell", "cells", "pixel", "pixels", "c", "p", "per cell"}
+_RANGE_RE = re.compile(r'^\s*(\d{1,3})\s*(?:-|–|—|to|\.\.)\s*(\d{1,3})\s*$')
+
+
+def _chart_header_map(row):
+    """Map column index -> field for a header row, or None if it isn't one."""
+    lookup = {alias: field for field, aliases in CHART_COLUMNS.items()
+              for alias in aliases}
+    mapping = {}
+    for idx, cell in enumerate(row):
+        field = lookup.get(cell.strip().lower())
+        if field and field not in mapping.values():
+            mapping[idx] = field
+    return mapping if "name" in mapping.values() else None
+
+
+def _sniff_delimiter(first_line):
+    if "\t" in first_line:
+        return "\t"
+    return ";" if first_line.count(";") > first_line.count(",") else ","
+
+
+def _int_or_none(text):
+    try:
+        return max(0, min(255, int(float(text))))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_dmx_chart(lines, default_mode="Imported Mode"):
+    """
+    Stream a CSV / TSV DMX chart into mode dicts ready for session state.
+
+    lines — any iterable of text lines (an open file, a TextIOWrapper around
+            an upload, or pasted text split into lines).
+
+    Returns (modes, report). Each distinct channel name is passed through
+    resolve_attr exactly once: report["attributes"] maps it to its GDTF
+    attribute, and names that fall back to a custom attribute are also
+    listed in report["unknown"]. A channel whose only range is 0–255 is treated
+    as continuous and gets no channel sets.
+    """
+    it = iter(lines)
+    first = next(it, "")
+    while first is not None and not first.strip():
+        first = next(it, None)
+    report = {"rows": 0, "channels": 0, "sets": 0, "unknown": [], "skipped": 0,
+              "attributes": {}}
+    if not first:
+        return [], report
+
+    delimiter = _sniff_delimiter(first)
+    reader = csv.reader(itertools.chain([first], it), delimiter=delimiter)
+    header_row = next(reader, [])
+    mapping = _chart_header_map(header_row)
+    # No header — positional; the leading number column is optional and is
+    # detected from the first row so continuation rows line up the same way
+    pending = [header_row] if mapping is None else []
+    order = CHART_DEFAULT_ORDER
+    if mapping is None and header_row and _int_or_none(header_row[0]) is None:
+        order = order[1:]
+
+    modes    = {}
+    checked  = set()     # lower-cased names already resolved
+    current  = None      # (mode_name, channel dict, channel number)
+
+    def _fields(row):
+        if mapping is not None:
+            return {field: row[idx].strip() for idx, field in mapping.items()
+                    if idx < len(row)}
+        return dict(zip(order, (c.strip() for c in row)))
+
+    for row in itertools.chain(pending, reader):
+        if not any(c.strip() for c in row):
+            continue
+        report["rows"] += 1
+        f = _fields(row)
+        mode_name = f.get("mode") or (current[0] if current else default_mode)
+        mode = modes.setdefault(mode_name, {
+            "name": mode_name, "body_channels": [], "cell_channels": []})
+
+        name = f.get("name", "")
+        number = f.get("channel", "")
+        same = (current is not None and current[0] == mode_name and
+                (not name or (name == current[1]["name"] and
+                              number in ("", current[2]))))
+        if not same:
+            if not name:
+                report["skipped"] += 1
+                continue
+            geometry = "cell" if (
+                f.get("geometry", "").lower() in _CELL or
+                "virtual" in name.lower()) else "body"
+            fine_col = f.get("fine", "").lower()
+            fine = fine_col in _TRUTHY if fine_col else is_fine(name)
+            ch = make_channel_entry(name, fine, geometry)
+            mode[f"{geometry}_channels"].append(ch)
+            current = (mode_name, ch, number)
+            report["channels"] += 1
+            if not fine and name.lower() not in checked:
+                checked.add(name.lower())
+                report["attributes"][name] = resolve_attr(name)[0]
+                if not is_known_channel(name):
+                    report["unknown"].append(name)
+
+        dmx_from, dmx_to = None, None
+        m = _RANGE_RE.match(f.get("range", ""))
+        if m:
+            dmx_from, dmx_to = _int_or_none(m.group(1)), _int_or_none(m.group(2))
+        else:
+            dmx_from = _int_or_none(f.get("dmx_from"))
+            dmx_to   = _int_or_none(f.get("dmx_to"))
+            if dmx_from is not None and dmx_to is None:
+                dmx_to = dmx_from
+        if dmx_from is not None and not current[1]["is_fine"]:
+            current[1]["slots"].append(make_slot_entry(
+                dmx_from, max(dmx_from, dmx_to), f.get("label", "")))
+
+    # Single full-range row = continuous channel, not a channel set
+    for mode in modes.values():
+        for ch in mode["body_channels"] + mode["cell_channels"]:
+            s = ch["slots"]
+            if len(s) == 1 and s[0]["dmx_from"] == 0 and s[0]["dmx_to"] == 255:
+                s.clear()
+            report["sets"] += len(s)
+    return list(modes.values()), report
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  BATCH EDITS
+#  One edit applied to a channel in many modes at once. Channels match by
+#  attr_key of their name ('Colour Wheel' == 'colour-wheel'); a single pass
+#  indexes where every name occurs, so an edit touches only the lists that
+#  hold it. Edits mutate the mode dicts in place — the caller records them.
+# ══════════════════════════════════════════════════════════════════════════════
+
+CHANNEL_PARTS = ("body", "cell", "head")
+BATCH_OPS = ("rename", "insert_after", "insert_before", "delete", "sets", "move_after")
+
+
+def channel_locations(modes, parts=CHANNEL_PARTS):
+    """{attr_key(name): [(mode index, part, row), ...]} over every channel list."""
+    where = {}
+    for mi, mode in enumerate(modes):
+        for part in parts:
+            for row, ch in enumerate(mode.get(f"{part}_channels", ())):
+                where.setdefault(attr_key(ch["name"]), []).append((mi, part, row))
+    return where
+
+
+def batch_edit(modes, name, op, mode_indices=None, new_name="", slots=(), anchor=""):
+    """
+    Apply op to every channel called name in the chosen modes (all if None).
+    Returns [(mode index, part, channel dict)] for the channels edited, added
+    or removed.
+
+    rename        — renamed to new_name
+    insert_after  — a new channel new_name after each match
+    insert_before — … before each match
+    delete        — removed
+    sets          — slots replaced by copies of slots (slot dicts)
+    move_after    — moved to just after the channel called anchor, or to the
+                    top with anchor="" (lists without the anchor are skipped)
+    """
+    if op not in BATCH_OPS:
+        raise ValueError(f"unknown batch op {op!r}")
+    if op in ("rename", "insert_after", "insert_before") and not new_name.strip():
+        raise ValueError(f"{op} needs a channel name")
+    new_name = new_name.strip()
+    chosen = None if mode_indices is None else set(mode_indices)
+    # Matches grouped per list, rows descending so inserts / deletes don't
+    # shift the rows still to visit
+    lists = {}
+    for mi, part, row in channel_locations(modes).get(attr_key(name), ()):
+        if chosen is None or mi in chosen:
+            lists.setdefault((mi, part), []).append(row)
+
+    touched = []
+    for (mi, part), rows in lists.items():
+        ch_list = modes[mi][f"{part}_channels"]
+        if op == "move_after":
+            row = rows[0]
+            to = 0
+            if anchor:
+                key = attr_key(anchor)
+                to = next((r + 1 for r, c in enumerate(ch_list)
+                           if attr_key(c["name"]) == key), None)
+                if to is None:
+                    continue
+            ch = ch_list.pop(row)
+            ch_list.insert(to - (to > row), ch)
+            touched.append((mi, part, ch))
+            continue
+        for row in reversed(rows):
+            ch = ch_list[row]
+            if op == "rename":
+                ch["name"] = new_name
+                touched.append((mi, part, ch))
+            elif op == "delete":
+                touched.append((mi, part, ch_list.pop(row)))
+            elif op == "sets":
+                ch["slots"] = [dict(s) for s in slots]
+                touched.append((mi, part, ch))
+            else:
+                added = make_channel_entry(new_name, is_fine(new_name), part)
+                ch_list.insert(row + (op == "insert_after"), added)
+                touched.append((mi, part, added))
+    return touched
+
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  UNDO HISTORY
+#  Snapshots are persistent records: each mode, channel and slot dict freezes
+#  into an immutable Record. A mutation names the paths it touched and only
+#  those are re-frozen — every other mode, list and channel in the next
+#  snapshot is the previous snapshot's own record, taken by id without being
+#  walked or compared. A one-channel edit costs one channel however large the
+#  fixture, and consecutive snapshots share everything it didn't touch.
+# ══════════════════════════════════════════════════════════════════════════════
+
+_CHANNEL_LISTS = ("body_channels", "cell_channels", "head_channels", "channel_list")
+
+
+class Record(tuple):
+    """Frozen dict: a tuple of (key, value) pairs in key order."""
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        for k, v in self:
+            if k == key:
+                return v
+        return default
+
+
+def _freeze_slot(slot, prev):
+    rec = Record(sorted(slot.items()))
+    return prev if rec == prev else rec
+
+
+def _freeze_channel(ch, prev):
+    prev_slots = prev.get("slots", ()) if prev is not None else ()
+    slots = tuple(
+        _freeze_slot(s, prev_slots[i] if i < len(prev_slots) else None)
+        for i, s in enumerate(ch.get("slots", ())))
+    if slots == prev_slots:
+        slots = prev_slots
+    rec = Record(sorted((k, slots if k == "slots" else v)
+                        for k, v in ch.items()))
+    return prev if rec == prev else rec
+
+
+def _by_id(records):
+    out = {r.get("id"): r for r in records or ()}
+    out.pop(None, None)
+    return out
+
+
+def _freeze_channels(chs, prev, fresh=None):
+    """
+    A channel list's tuple. With fresh (the channel ids to re-freeze), any
+    other channel already in prev is reused as-is; without it, every channel
+    is re-frozen, sharing the records that come out equal.
+    """
+    by_id = _by_id(prev)
+    out = tuple(
+        by_id[i] if fresh is not None and i in by_id and i not in fresh
+        else _freeze_channel(ch, by_id.get(i))
+        for ch in chs for i in (ch.get("id"),))
+    return prev if out == prev else out
+
+
+def _freeze_mode(mode, prev, dirty=None):
+    """
+    A mode's record. dirty ({list key: channel ids}) limits the re-freeze to
+    those lists; the others are prev's tuples.
+    """
+    def value(k, v):
+        if k not in _CHANNEL_LISTS:
+            return v
+        old = prev.get(k) if prev is not None else None
+        if dirty is None:
+            return _freeze_channels(v, old)
+        if k not in dirty and old is not None:
+            return old
+        return _freeze_channels(v, old, dirty.get(k, ()))
+    rec = Record(sorted((k, value(k, v)) for k, v in mode.items()))
+    return prev if rec == prev else rec
+
+
+def freeze_modes(modes, prev=(), touched=None):
+    """
+    Immutable snapshot of the mode list, sharing unchanged records with prev.
+
+    touched — the paths a mutation changed, so only they are re-frozen:
+        ()                           the mode list (modes added / removed / moved)
+        (mode_id,)                   a mode's own fields
+        (mode_id, part)              a channel list (channels added / removed / moved)
+        (mode_id, part, channel_id)  one channel and its sets
+    Modes and channels are matched to prev by id, so new ones are frozen in
+    full and removed ones just drop out. None re-freezes the whole model.
+    """
+    by_id = _by_id(prev)
+    if touched is None:
+        out = tuple(
+            _freeze_mode(m, by_id.get(m.get("id"),
+                                      prev[i] if i < len(prev) and m.get("id") is None
+                                      else None))
+            for i, m in enumerate(modes))
+        return prev if out == prev else out
+    dirty = {}
+    for path in touched:
+        if path:
+            lists = dirty.setdefault(path[0], {})
+            if len(path) > 1:
+                ids = lists.setdefault(f"{path[1]}_channels", set())
+                ids.update(path[2:])
+    out = []
+    for m in modes:
+        mode_id = m.get("id")
+        old = by_id.get(mode_id)
+        if old is None:
+            out.append(_freeze_mode(m, None))
+        elif mode_id in dirty:
+            out.append(_freeze_mode(m, old, dirty[mode_id]))
+        else:
+            out.append(old)
+    out = tuple(out)
+    return prev if out == prev else out
+
+
+def thaw_modes(snapshot):
+    """Fresh mutable mode dicts from a snapshot."""
+    def _thaw(value):
+        if isinstance(value, Record):
+            return {k: _thaw(v) for k, v in value}
+        if isinstance(value, tuple):
+            return [_thaw(v) for v in value]
+        return value
+    return [_thaw(m) for m in snapshot]
+
+
+class History:
+    """
+    Bounded undo / redo over mode-list snapshots.
+    History(depth, modes) freezes the starting model; record(modes, touched)
+    after every mutation takes the next snapshot (touched as for
+    freeze_modes); undo() / redo() return the mode list to restore, or None
+    when there is nothing to step to. The current snapshot stands in for the
+    model, so every change to it must be recorded.
+    """
+
+    def __init__(self, depth=50, modes=()):
+        self.depth = max(1, int(depth))
+        self._undo = deque(maxlen=self.depth)
+        self._redo = deque(maxlen=self.depth)
+        self.current = freeze_modes(modes)
+
+    def resize(self, depth):
+        depth = max(1, int(depth))
+        if depth != self.depth:
+            self.depth = depth
+            self._undo = deque(self._undo, maxlen=depth)
+            self._redo = deque(self._redo, maxlen=depth)
+
+    def record(self, modes, touched=None):
+        snap = freeze_modes(modes, self.current, touched)
+        if snap is not self.current:
+            self._undo.append(self.current)
+            self.current = snap
+            self._redo.clear()
+
+    def _step(self, src, dst):
+        if not src:
+            return None
+        dst.append(self.current)
+        self.current = src.pop()
+        return thaw_modes(self.current)
+
+    def undo(self):
+        return self._step(self._undo, self._redo)
+
+    def redo(self):
+        return self._step(self._redo, self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def __len__(self):
+        return len(self._undo) + len(self._redo)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CELL LAYOUT
+#  Pixel_N GeometryReference positions for multi-cell fixtures. Positions are
+#  computed as one (n, 3) array and formatted with a single %-operation over
+#  the whole matrix list, so 10k-cell matrices lay out in milliseconds.
+#  Units are metres; cell 1 sits at the origin.
+# ══════════════════════════════════════════════════════════════════════════════
+
+CellLayout = namedtuple("CellLayout", "kind columns pitch_x pitch_y radius "
+                                      "order points")
+CellLayout.__new__.__defaults__ = ("line", 0, 0.1, 0.1, 0.5, "raster", ())
+
+LAYOUT_KINDS = ("line", "grid", "ring", "custom")
+LINEAR = CellLayout()
+
+_TRANSLATE_FMT = "1,0,0,0 0,1,0,0 0,0,1,0 {},{},{},1"
+_ROTATE_FMT    = "{},{},0,0 {},{},0,0 0,0,1,0 {},{},{},1"
+
+
+def cell_positions(layout, cell_count):
+    """(cell_count, 3) float array of cell origins for a CellLayout."""
+    layout = layout or LINEAR
+    n = np.arange(cell_count)
+    pos = np.zeros((cell_count, 3))
+    if layout.kind == "line":
+        pos[:, 0] = n * layout.pitch_x
+    elif layout.kind == "grid":
+        cols = max(1, int(layout.columns) or int(np.ceil(np.sqrt(cell_count))))
+        row, col = np.divmod(n, cols)
+        if layout.order == "serpentine":
+            col = np.where(row % 2 == 1, cols - 1 - col, col)
+        pos[:, 0] = col * layout.pitch_x
+        pos[:, 1] = row * layout.pitch_y
+    elif layout.kind == "ring":
+        theta = 2 * np.pi * n / max(cell_count, 1)
+        pos[:, 0] = layout.radius * np.sin(theta)
+        pos[:, 1] = layout.radius * (1 - np.cos(theta))
+    elif layout.kind == "custom":
+        if len(layout.points) < cell_count:
+            raise ValueError(f"custom layout has {len(layout.points)} points "
+                             f"for {cell_count} cells")
+        pos[:] = np.asarray(layout.points[:cell_count], dtype=float)
+    else:
+        raise ValueError(f"unknown cell layout {layout.kind!r}")
+    return pos
+
+
+def cell_transforms(layout, cell_count):
+    """Position matrix strings for Pixel_1..N. Ring cells face outward."""
+    if cell_count < 1:
+        return []
+    layout = layout or LINEAR
+    pos = cell_positions(layout, cell_count)
+    if layout.kind == "ring":
+        theta = 2 * np.pi * np.arange(cell_count) / cell_count
+        c, s = np.cos(theta), np.sin(theta)
+        cols, fmt = (c, s, -s, c, pos[:, 0], pos[:, 1], pos[:, 2]), _ROTATE_FMT
+    else:
+        cols, fmt = (pos[:, 0], pos[:, 1], pos[:, 2]), _TRANSLATE_FMT
+    # Round first and add 0.0 so -0.0 never prints as "-0.000". Columns that
+    # are zero for every cell print as a literal 0 and aren't formatted.
+    m = np.round(np.column_stack(cols), 3) + 0.0
+    live = m.any(axis=0)
+    fmt = fmt.format(*("%.3f" if on else "0" for on in live))
+    flat = m[:, live].ravel().tolist()
+    return ("\n".join([fmt] * cell_count) % tuple(flat)).split("\n")
+
+
+def parse_cell_layout_csv(lines):
+    """
+    Measured layout from rows of x,y[,z] in metres (comma, tab or semicolon
+    separated; a non-numeric first row is taken as a header).
+    Returns a custom CellLayout.
+    """
+    points = []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = [p for p in re.split(r"[,\t;]", line) if p.strip()]
+        try:
+            xyz = tuple(float(p) for p in parts[:3])
+        except ValueError:
+            if not points and lineno == 1:
+                continue
+            raise ValueError(f"line {lineno}: expected x,y[,z] — got {line!r}")
+        if len(xyz) < 2:
+            raise ValueError(f"line {lineno}: expected x,y[,z] — got {line!r}")
+        points.append(xyz + (0.0,) * (3 - len(xyz)))
+    return CellLayout("custom", points=tuple(points))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  COMPILED FIXTURE IR
+#  Modes are compiled once into an immutable intermediate representation:
+#  attributes resolved, offsets paired, wheels registered, geometries laid out
+#  and relations linked. Emitters (GDTF XML, CSV address chart, JSON) only
+#  read from it, so producing every output costs one compile.
+# ══════════════════════════════════════════════════════════════════════════════
+
+AttributeIR = namedtuple("AttributeIR", "name feature_group feature activation_group")
+WheelIR     = namedtuple("WheelIR", "name slots media")
+# parent: the geometry this one nests in ("" = top level of <Geometries>)
+GeometryIR  = namedtuple("GeometryIR", "tag name position reference parent")
+GeometryIR.__new__.__defaults__ = ("",)
+SetIR       = namedtuple("SetIR", "name dmx_from dmx_to physical_from physical_to "
+                                  "wheel_slot_index")
+ChannelIR   = namedtuple("ChannelIR", "name attr part geometry dmx_break offset "
+                                      "virtual wheel sets")
+RelationIR  = namedtuple("RelationIR", "name master follower type")
+ModeIR      = namedtuple("ModeIR", "name safe_name channels relations "
+                                   "body_footprint cell_footprint head_footprint")
+ModeIR.__new__.__defaults__ = (0,)
+# head_count >= 2 nests the template: Body, Head_1..H, each Head carrying
+# Pixel_1..cell_count; otherwise cells hang off the Body directly
+FixtureIR   = namedtuple("FixtureIR", "name short_name manufacturer cell_count "
+                                      "attributes wheels geometries modes head_count")
+FixtureIR.__new__.__defaults__ = (1,)
+
+IDENTITY = "1,0,0,0 0,1,0,0 0,0,1,0 0,0,0,1"
+
+
+def fixture_spec_key(fixture_name, manufacturer, modes_dict, cell_count=1,
+                     layout=None, heads=1, head_layout=None):
+    """Hashable snapshot of everything compile_fixture reads — the IR cache key."""
+    def _chs(defs):
+        return tuple(
+            (ch.name, bool(ch.is_fine_byte),
+             tuple((s.name, s.dmx_from, s.dmx_to, s.physical_from,
+                    s.physical_to, s.slot_name, s.media) for s in ch.slots))
+            for ch in defs)
+    nested = int(heads) >= 2
+    return (fixture_name, manufacturer, int(cell_count), layout or LINEAR,
+            tuple((mode_name, _chs(body), _chs(cell),
+                   _chs(head[0]) if nested and head else ())
+                  for mode_name, (body, cell, *head) in modes_dict.items()),
+            int(heads) if nested else 1, (head_layout or LINEAR) if nested else None)
+
+
+def compile_fixture(fixture_name, manufacturer, modes_dict, cell_count=1,
+                    layout=None, heads=1, head_layout=None):
+    """
+    modes_dict values are (body_defs, cell_defs[, head_defs]) tuples; layout
+    is a CellLayout for the Pixel_N positions (default: a line at 0.1 m
+    pitch). heads >= 2 makes a multi-head fixture: head_defs repeat per head
+    (Head_N, laid out by head_layout) and cell_defs per pixel of each head.
+    Returns a FixtureIR. Identical specs share one cached IR.
+    """
+    return _compile_spec(fixture_spec_key(fixture_name, manufacturer, modes_dict,
+                                          cell_count, layout, heads, head_layout))
+
+
+def _fixture_names(fixture_name):
+    """(Name, ShortName) as written to FixtureType."""
+    safe_name  = _safe(fixture_name, "Fixture")
+    safe_short = re.sub(r'[^A-Z0-9]', '', safe_name.upper())[:8] or "FIXTURE"
+    return safe_name, safe_short
+
+
+def _pixel_geometries(layout, cell_count, parent=""):
+    """Pixel geometry plus its Pixel_1..N references (nested in parent)."""
+    return (GeometryIR("Geometry", "Pixel", IDENTITY, ""),) + tuple(
+        GeometryIR("GeometryReference", f"Pixel_{n}", position, "Pixel", parent)
+        for n, position in enumerate(cell_transforms(layout, cell_count), 1))
+
+
+def _fixture_geometries(cell_count, layout, heads=1, head_layout=None):
+    """
+    Every GeometryIR of a fixture. Multi-head fixtures get each template
+    once — Body, Head (holding the Pixel_N references), Pixel — and one
+    Head_N reference per head, so size grows with references, not channels.
+    """
+    geometries = (GeometryIR("Geometry", "Body", IDENTITY, ""),)
+    if heads >= 2:
+        geometries += (GeometryIR("Geometry", "Head", IDENTITY, ""),)
+        if cell_count >= 2:
+            geometries += _pixel_geometries(layout, cell_count, parent="Head")
+        return geometries + tuple(
+            GeometryIR("GeometryReference", f"Head_{n}", position, "Head")
+            for n, position in enumerate(cell_transforms(head_layout, heads), 1))
+    if cell_count >= 2:
+        # Body and Pixel are siblings in <Geometries>; the Pixel_N references
+        # are plain top-level elements with no <Break> children.
+        geometries += _pixel_geometries(layout, cell_count)
+    return geometries
+
+
+def mode_footprint(ir, mode):
+    """DMX addresses one instance of a mode takes, every head and cell included."""
+    cells = ir.cell_count if ir.cell_count >= 2 else 0
+    if ir.head_count >= 2:
+        return mode.body_footprint + ir.head_count * (
+            mode.head_footprint + mode.cell_footprint * cells)
+    return mode.body_footprint + mode.cell_footprint * cells
+
+
+def pixel_offsets(ir, mode):
+    """
+    0-based first address of each patchable element of one instance, in
+    element order: every pixel (head by head), else every head, else the
+    fixture itself. Returns (offsets array, head_number array) — head 0 when
+    the fixture has no heads.
+    """
+    cells = ir.cell_count if ir.cell_count >= 2 else 0
+    if ir.head_count >= 2:
+        head = np.arange(ir.head_count, dtype=np.int64)
+        base = mode.body_footprint + head * (mode.head_footprint +
+                                             mode.cell_footprint * cells)
+        if not cells:
+            return base, head + 1
+        cell = np.arange(cells, dtype=np.int64)
+        offsets = (base[:, None] + mode.head_footprint +
+                   cell[None, :] * mode.cell_footprint).ravel()
+        return offsets, np.repeat(head + 1, cells)
+    if cells:
+        return (mode.body_footprint + np.arange(cells, dtype=np.int64) *
+                mode.cell_footprint, np.zeros(cells, np.int64))
+    return np.zeros(1, np.int64), np.zeros(1, np.int64)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_spec(spec):
+    fixture_name, manufacturer, cell_count, layout, modes, heads, head_layout = spec
+    multi_cell = cell_count >= 2
+
+    safe_name, safe_short = _fixture_names(fixture_name)
+    safe_mfr   = _safe(manufacturer, "Generic")
+
+    # Every distinct channel name goes through resolve_attr exactly once
+    resolved = {}
+    def _attr(name):
+        if name not in resolved:
+            resolved[name] = resolve_attr(name)
+        return resolved[name]
+
+    # Attributes used by body and cell channel lists, first-use order
+    used_attrs = {}
+    for _, body_chs, cell_chs, head_chs in modes:
+        for name, fine, _slots in body_chs + head_chs + cell_chs:
+            if not fine and name.strip():
+                attr, fg, feat, ag = _attr(name)
+                used_attrs[attr] = AttributeIR(attr, fg, feat, ag)
+
+    # Wheels — body and cell are independent, so collect separately.
+    # Each geometry can have its own wheel with the same attribute name.
+    # We prefix cell wheels with "Cell_" (head wheels "Head_") to avoid name
+    # clashes with body wheels.
+    registries = {"body": {}, "head": {}, "cell": {}}
+    wheels = {}
+    for _, body_chs, cell_chs, head_chs in modes:
+        for part, chs, prefix in (("body", body_chs, ""), ("head", head_chs, "Head_"),
+                                  ("cell", cell_chs, "Cell_")):
+            registry = registries[part]
+            for name, fine, slots in chs:
+                if fine or not slots:
+                    continue
+                attr = _attr(name)[0]
+                if not is_wheel_attr(attr):
+                    continue
+                if attr not in registry:
+                    registry[attr] = prefix + _safe(name, attr)
+                wname = registry[attr]
+                if wname not in wheels:
+                    wheels[wname] = WheelIR(
+                        wname,
+                        ("Open",) + tuple(_safe(s[5], "Slot") for s in slots),
+                        ("",) + tuple(s[6] for s in slots))
+
+    # Geometries
+    # ── Official GDTF spec pattern (from gdtf.eu DMX Mode Collect Listing 1) ─
+    #
+    #  Body channels:  DMXBreak="1"         Geometry="Body"
+    #  Cell channels:  DMXBreak="Overwrite" Geometry="Pixel"  Offset="1","2"...
+    #    "Overwrite" = the console replaces this with the GeometryReference's
+    #    break number at patch time → each cell sub-fixture gets its own break
+    #  Head channels (multi-head): DMXBreak="Overwrite" Geometry="Head", per Head_N
+    #
+    geometries = _fixture_geometries(cell_count, layout, heads, head_layout)
+
+    def _channels(out, chs, part, geometry, start_offset, dmx_break):
+        """
+        Append ChannelIR entries as lists (offsets are patched by fine bytes).
+        Fine channels fold into the previous real channel's Offset pair;
+        virtual channels don't consume a DMX offset.
+        """
+        offset = start_offset
+        prev = None
+        for name, fine, slots in chs:
+            if not name.strip():
+                continue
+            if fine:
+                if prev is not None:
+                    prev[5] = (prev[5][0], offset)
+                offset += 1
+                prev = None
+                continue
+            attr = _attr(name)[0]
+            virtual = "virtual" in name.lower()
+            wname = "" if virtual or not slots else registries[part].get(attr, "")
+            sets = () if virtual else tuple(
+                SetIR(_safe(s[0], f"Set{i+1}"), s[1], s[2], s[3], s[4],
+                      i + 1 if wname else 0)
+                for i, s in enumerate(slots))
+            entry = [name, attr, part, geometry, str(dmx_break),
+                     None if virtual else (offset,), virtual, wname, sets]
+            out.append(entry)
+            if not virtual:
+                prev = entry
+                offset += 1
+        return offset - start_offset
+
+    mode_irs = []
+    for mode_name, body_chs, cell_chs, head_chs in modes:
+        safe_mode = _safe(mode_name, "Mode")
+        chans = []
+        body_fp = _channels(chans, body_chs, "body", "Body", 1, 1)
+        head_fp = cell_fp = 0
+        if heads >= 2:
+            virt = tuple(c for c in head_chs if "virtual" in c[0].lower())
+            real = tuple(c for c in head_chs if "virtual" not in c[0].lower())
+            _channels(chans, virt, "head", "Head", 1, 1)
+            head_fp = _channels(chans, real, "head", "Head", 1, "Overwrite")
+        if multi_cell:
+            virt = tuple(c for c in cell_chs if "virtual" in c[0].lower())
+            real = tuple(c for c in cell_chs if "virtual" not in c[0].lower())
+            _channels(chans, virt, "cell", "Pixel", 1, 1)
+            cell_fp = _channels(chans, real, "cell", "Pixel", 1, "Overwrite")
+
+        # Relations — virtual dimmer multiplies each cell colour channel.
+        # Master path:   ModeName.Geometry_Attribute
+        # Follower path: ModeName.Geometry_Attribute.LogicalChannel.ChannelFunction
+        relations = []
+        virt_chs = [c for c in cell_chs if "virtual" in c[0].lower() and not c[1]]
+        real_chs = [c for c in cell_chs if "virtual" not in c[0].lower() and not c[1]]
+        if virt_chs and real_chs:
+            v_attr = _attr(virt_chs[0][0])[0]
+            for name, _fine, _slots in real_chs:
+                c_attr = _attr(name)[0]
+                relations.append(RelationIR(
+                    f"VDim_{c_attr}", f"{safe_mode}.Pixel_{v_attr}",
+                    f"{safe_mode}.Pixel_{c_attr}.{c_attr}.{c_attr}", "Multiply"))
+
+        mode_irs.append(ModeIR(mode_name, safe_mode,
+                               tuple(ChannelIR(*c) for c in chans),
+                               tuple(relations), body_fp, cell_fp, head_fp))
+
+    return FixtureIR(safe_name, safe_short, safe_mfr, cell_count,
+                     tuple(used_attrs.values()), tuple(wheels.values()),
+                     geometries, tuple(mode_irs), heads)
+
+
+def channel_address_rows(ir):
+    """
+    Yield one address row per DMX channel in address order, cells expanded:
+    body channels first, then each cell's block in turn.
+    (mode, cell, address, fine_address, channel, attr, geometry, sets)
+    """
+    for mode in ir.modes:
+        yield from sorted(_mode_address_rows(ir, mode), key=lambda r: r[2])
+
+
+def _mode_address_rows(ir, mode):
+    cells = ir.cell_count if ir.cell_count >= 2 else 1
+    nested = ir.head_count >= 2
+    if nested:
+        head_bases = [(n, f"Head_{n}", mode.body_footprint + (n - 1) * (
+            mode.head_footprint + mode.cell_footprint * (cells if cells >= 2 else 0)))
+            for n in range(1, ir.head_count + 1)]
+        offsets, head_of = pixel_offsets(ir, mode)
+        pixels = [(p, f"Head_{h}.Pixel_{(p - 1) % cells + 1}", base)
+                  for p, (base, h) in enumerate(zip(offsets.tolist(),
+                                                    head_of.tolist()), 1)]
+    else:
+        pixels = [(n, f"Pixel_{n}", mode.body_footprint + (n - 1) * mode.cell_footprint)
+                  for n in range(1, cells + 1)]
+    for ch in mode.channels:
+        if ch.virtual:
+            continue
+        if ch.part == "body":
+            bases = [(0, ch.geometry, 0)]
+        elif ch.part == "head":
+            bases = [(0, label, base) for _n, label, base in head_bases]
+        else:
+            bases = pixels
+        for cell, geometry, base in bases:
+            fine = base + ch.offset[1] if len(ch.offset) > 1 else ""
+            yield (mode.name, cell, base + ch.offset[0], fine,
+                   ch.name, ch.attr, geometry, len(ch.sets))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  EMITTERS
+#  Each emitter takes a FixtureIR and returns text. Register new formats with
+#  @emitter("name", "file extension").
+# ══════════════════════════════════════════════════════════════════════════════
+
+EMITTERS = {}
+
+def emitter(name, extension):
+    def _register(fn):
+        EMITTERS[name] = (fn, extension)
+        return fn
+    return _register
+
+
+def emit_all(ir, formats=None):
+    """Run several emitters over one compiled IR — {format: text}."""
+    return {fmt: EMITTERS[fmt][0](ir) for fmt in (formats or EMITTERS)}
+
+
+def _emit_channel_xml(chs_el, ch, safe_mode):
+    """
+    Emit a single DMXChannel element.
+
+    Virtual channels — per the official GDTF spec example, omit DMXBreak,
+    Offset, Default and InitialFunction entirely. Only Highlight and Geometry
+    are present on the element. LogicalChannel gets Master="Grand".
+
+    DMXBreak "Overwrite" on real cell channels lets the console fill in the
+    break number from each GeometryReference.
+    """
+    attr = ch.attr
+    cf_kw = dict(
+        Name=attr, Attribute=attr,
+        OriginalAttribute=_safe(ch.name),
+        DMXFrom="0/1", Default="0/1",
+        PhysicalFrom="0.000000", PhysicalTo="1.000000",
+        RealFade="0", RealAcceleration="0", WheelSlotIndex="0",
+    )
+    if ch.virtual:
+        ch_el = ET.SubElement(chs_el, "DMXChannel",
+            Highlight="255/1", Geometry=ch.geometry)
+        log_el = ET.SubElement(ch_el, "LogicalChannel",
+            Attribute=attr, Snap="No",
+            Master="Grand", MibFade="0", DMXChangeTimeLimit="0")
+        ET.SubElement(log_el, "ChannelFunction", **cf_kw)
+        return ch_el
+
+    # InitialFunction: ModeName.GeometryName_Attribute.Attribute.Attribute
+    ch_el = ET.SubElement(chs_el, "DMXChannel",
+        DMXBreak=ch.dmx_break, Offset=",".join(map(str, ch.offset)),
+        Default="0/1", Highlight="255/1", Geometry=ch.geometry,
+        InitialFunction=f"{safe_mode}.{ch.geometry}_{attr}.{attr}.{attr}")
+    log_el = ET.SubElement(ch_el, "LogicalChannel",
+        Attribute=attr, Snap="Yes" if ch.sets else "No",
+        Master="None", MibFade="0", DMXChangeTimeLimit="0")
+    if ch.wheel:
+        cf_kw["Wheel"] = ch.wheel
+    cf_el = ET.SubElement(log_el, "ChannelFunction", **cf_kw)
+    for cs in ch.sets:
+        cs_kw = dict(
+            Name=cs.name,
+            DMXFrom=f"{cs.dmx_from}/1",
+            PhysicalFrom=f"{cs.physical_from:.6f}",
+            PhysicalTo=f"{cs.physical_to:.6f}",
+        )
+        if cs.wheel_slot_index:
+            cs_kw["WheelSlotIndex"] = str(cs.wheel_slot_index)
+        ET.SubElement(cf_el, "ChannelSet", **cs_kw)
+    return ch_el
+
+
+@emitter("gdtf", "xml")
+def emit_gdtf_xml(ir, fixture_type_id=None):
+    """description.xml — MA3 / Vectorworks / Capture / Onyx compatible."""
+    root = ET.Element("GDTF", DataVersion="1.1")
+    ft = ET.SubElement(root, "FixtureType",
+        Name=ir.name, ShortName=ir.short_name, LongName=ir.name,
+        Manufacturer=ir.manufacturer, Description="Generated by GDTF Builder",
+        FixtureTypeID=fixture_type_id or _guid(), Thumbnail="", RefFT="",
+        CanHaveChildren="Yes" if ir.cell_count >= 2 or ir.head_count >= 2 else "No")
+
+    # AttributeDefinitions
+    attr_defs = ET.SubElement(ft, "AttributeDefinitions")
+    ag_xml = ET.SubElement(attr_defs, "ActivationGroups")
+    for ag in dict.fromkeys(a.activation_group for a in ir.attributes
+                            if a.activation_group):
+        ET.SubElement(ag_xml, "ActivationGroup", Name=ag)
+    fg_xml = ET.SubElement(attr_defs, "FeatureGroups")
+    fg_used = {}
+    for a in ir.attributes:
+        fg_used.setdefault(a.feature_group, set()).add(a.feature)
+    for fg_name, feats in fg_used.items():
+        fg_el = ET.SubElement(fg_xml, "FeatureGroup", Name=fg_name, Pretty=fg_name)
+        for f in sorted(feats):
+            ET.SubElement(fg_el, "Feature", Name=f)
+    attrs_xml = ET.SubElement(attr_defs, "Attributes")
+    for a in ir.attributes:
+        # PhysicalUnit stays None: channel functions use 0-1 physical ranges
+        ag_kw = {"ActivationGroup": a.activation_group} if a.activation_group else {}
+        ET.SubElement(attrs_xml, "Attribute",
+            Name=a.name, Pretty=a.name, **ag_kw,
+            Feature=f"{a.feature_group}.{a.feature}", PhysicalUnit="None",
+            Color="0.3127,0.3290,100.000000")
+
+    wheels_el = ET.SubElement(ft, "Wheels")
+    for wheel in ir.wheels:
+        wheel_el = ET.SubElement(wheels_el, "Wheel", Name=wheel.name)
+        for slot_name, media in zip(wheel.slots, wheel.media):
+            ET.SubElement(wheel_el, "Slot", Name=slot_name,
+                          Color="0.3127,0.3290,100.000000", MediaFileName=media)
+
+    # Physical / Models
+    phys = ET.SubElement(ft, "PhysicalDescriptions")
+    ET.SubElement(phys, "Emitters")
+    ET.SubElement(phys, "Filters")
+    ET.SubElement(phys, "DMXProfiles")
+    ET.SubElement(phys, "CRIs")
+    ET.SubElement(ft, "Models")
+
+    geos = ET.SubElement(ft, "Geometries")
+    placed = {"": geos}
+    for g in ir.geometries:
+        if g.tag == "GeometryReference":
+            ET.SubElement(placed[g.parent], g.tag, Name=g.name, Position=g.position,
+                          Geometry=g.reference)
+        else:
+            placed[g.name] = ET.SubElement(placed[g.parent], g.tag, Name=g.name,
+                                           Model="", Position=g.position)
+
+    # DMX Modes — DMXMode always points to Body (the root geometry)
+    dmx_modes_el = ET.SubElement(ft, "DMXModes")
+    for mode in ir.modes:
+        mode_el = ET.SubElement(dmx_modes_el, "DMXMode",
+                                Name=mode.safe_name, Geometry="Body")
+        chs_el  = ET.SubElement(mode_el, "DMXChannels")
+        for ch in mode.channels:
+            _emit_channel_xml(chs_el, ch, mode.safe_name)
+        relations_el = ET.SubElement(mode_el, "Relations")
+        for rel in mode.relations:
+            ET.SubElement(relations_el, "Relation", Name=rel.name,
+                          Master=rel.master, Follower=rel.follower, Type=rel.type)
+        ET.SubElement(mode_el, "FTMacros")
+
+    revisions = ET.SubElement(ft, "Revisions")
+    ET.SubElement(revisions, "Revision",
+                  UserID="0", Date="2024-01-01T00:00:00",
+                  Text="Created by GDTF Builder", ModifiedBy="GDTFBuilder")
+    ET.SubElement(ft, "FTPresets")
+    ET.SubElement(ft, "FTRDMInfo")
+
+    raw = ET.tostring(root, encoding="unicode", xml_declaration=False)
+    pretty = minidom.parseString(
+        f'<?xml version="1.0" encoding="UTF-8"?>{raw}'
+    ).toprettyxml(indent="  ", encoding=None)
+    return pretty.replace('<?xml version="1.0" ?>',
+                          '<?xml version="1.0" encoding="UTF-8"?>')
+
+
+@emitter("csv", "csv")
+def emit_address_csv(ir):
+    """Patch-sheet address chart — one row per DMX channel per cell."""
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(["Mode", "Cell", "Address", "Fine Address", "Channel",
+                "Attribute", "Geometry", "Channel Sets"])
+    w.writerows(channel_address_rows(ir))
+    return buf.getvalue()
+
+
+@emitter("json", "json")
+def emit_fixture_json(ir):
+    """Compact JSON for console macro tooling."""
+    return json.dumps({
+        "fixture": ir.name,
+        "manufacturer": ir.manufacturer,
+        "cells": ir.cell_count,
+        **({"heads": ir.head_count} if ir.head_count >= 2 else {}),
+        "wheels": {w.name: list(w.slots) for w in ir.wheels},
+        "modes": [{
+            "name": m.name,
+            "footprint": mode_footprint(ir, m),
+            "body_footprint": m.body_footprint,
+            **({"head_footprint": m.head_footprint} if ir.head_count >= 2 else {}),
+            "cell_footprint": m.cell_footprint,
+            "channels": [{
+                "name": ch.name, "attribute": ch.attr, "part": ch.part,
+                "geometry": ch.geometry, "break": ch.dmx_break,
+                "offset": list(ch.offset) if ch.offset else None,
+                "virtual": ch.virtual, "wheel": ch.wheel or None,
+                "sets": [{"name": s.name, "from": s.dmx_from, "to": s.dmx_to}
+                         for s in ch.sets],
+            } for ch in m.channels],
+            "relations": [r._asdict() for r in m.relations],
+        } for m in ir.modes],
+    }, indent=1)
+
+
+def build_gdtf(fixture_name, manufacturer, modes_dict, cell_count=1, layout=None,
+               heads=1, head_layout=None):
+    """
+    modes_dict values are (body_defs, cell_defs[, head_defs]) tuples.
+    cell_count=1  -> single Body geometry, body_defs only (par, wash, strobe)
+    cell_count>=2 -> pixel bar: body_defs to Body once, cell_defs to Pixel,
+                     referenced by Pixel_1..N GeometryReferences
+    heads>=2      -> Body → Head_1..H → Pixel_1..N nesting (see compile_fixture)
+    MA3 treats each Pixel_N as a pixel-mappable element with independent wheels.
+    """
+    return emit_gdtf_xml(compile_fixture(fixture_name, manufacturer, modes_dict,
+                                         cell_count, layout, heads, head_layout))
+
+
+def media_references(ir):
+    """Sorted MediaStore names referenced by the fixture's wheel slots."""
+    return sorted({m for w in ir.wheels for m in w.media if m})
+
+
+def write_gdtf_package(dest, xml_content, media_files=()):
+    """
+    Write a .gdtf archive to dest (path or binary file object).
+    media_files: (archive name, disk path) pairs — each file is streamed
+    from disk into the zip in chunks, never read whole. Duplicate archive
+    names are written once.
+    """
+    written = set()
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("description.xml", xml_content.encode("utf-8"))
+        for arcname, path in media_files:
+            if arcname in written:
+                continue
+            written.add(arcname)
+            with open(path, "rb") as src, z.open(arcname, "w") as out:
+                shutil.copyfileobj(src, out, MEDIA_CHUNK)
+
+
+def create_gdtf_package(xml_content, media_files=()):
+    buf = io.BytesIO()
+    write_gdtf_package(buf, xml_content, media_files)
+    return buf.getvalue()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  FIXTURE FAMILIES
+#  One definition sold in several lengths (4/8/16/32/64 cells). Attributes,
+#  wheels and modes don't depend on the cell count, so a family compiles and
+#  emits them once: every multi-cell variant reuses that description.xml
+#  text and swaps in only its FixtureType header and <Geometries> block.
+#  Each variant is byte-identical to a separate build with the same
+#  FixtureTypeID.
+# ══════════════════════════════════════════════════════════════════════════════
+
+FAMILY_NAME = "{name} {cells}"
+
+FamilyVariant = namedtuple("FamilyVariant", "cell_count ir xml")
+# seconds: the family build; separate_estimate: what building every variant
+# on its own would cost, extrapolated from the first full variant build with
+# each variant's own geometry cost swapped in; separate_seconds: that cost
+# measured (an uncached build per count), or None if it wasn't asked for
+FamilyBuild = namedtuple("FamilyBuild", "variants seconds separate_estimate "
+                                        "separate_seconds", defaults=(None,))
+
+
+def _fixture_type_xml(ir, fixture_type_id):
+    """The <FixtureType> start tag exactly as emit_gdtf_xml writes it."""
+    return (f'  <FixtureType Name="{ir.name}" ShortName="{ir.short_name}" '
+            f'LongName="{ir.name}" Manufacturer="{ir.manufacturer}" '
+            f'Description="Generated by GDTF Builder" '
+            f'FixtureTypeID="{fixture_type_id}" Thumbnail="" RefFT="" '
+            f'CanHaveChildren="{"Yes" if ir.cell_count >= 2 or ir.head_count >= 2 else "No"}">\n')
+
+
+def _geometries_xml(geometries):
+    """The <Geometries> block exactly as emit_gdtf_xml writes it."""
+    children = {}
+    for g in geometries:
+        children.setdefault(g.parent, []).append(g)
+    lines = ["    <Geometries>"]
+
+    def _write(g, pad):
+        if g.tag == "GeometryReference":
+            lines.append(f'{pad}<GeometryReference Name="{g.name}" '
+                         f'Position="{g.position}" Geometry="{g.reference}"/>')
+        elif g.name in children:
+            lines.append(f'{pad}<{g.tag} Name="{g.name}" Model="" '
+                         f'Position="{g.position}">')
+            for child in children[g.name]:
+                _write(child, pad + "  ")
+            lines.append(f'{pad}</{g.tag}>')
+        else:
+            lines.append(f'{pad}<{g.tag} Name="{g.name}" Model="" '
+                         f'Position="{g.position}"/>')
+
+    for g in children.get("", ()):
+        _write(g, "      ")
+    lines.append("    </Geometries>\n")
+    return "\n".join(lines)
+
+
+def _split_family_template(xml):
+    """(before FixtureType, between FixtureType and Geometries, after) of xml."""
+    ft = xml.index("\n  <FixtureType ") + 1
+    ft_end = xml.index("\n", ft) + 1
+    geo = xml.index("    <Geometries>\n", ft_end)
+    geo_end = xml.index("    </Geometries>\n", geo) + len("    </Geometries>\n")
+    return xml[:ft], xml[ft_end:geo], xml[geo_end:]
+
+
+def build_family(fixture_name, manufacturer, modes_dict, cell_counts,
+                 layout=None, name_format=FAMILY_NAME, on_phase=None,
+                 heads=1, head_layout=None, measure_separate=False):
+    """
+    Build one variant per distinct cell count, named by name_format
+    ({name}, {cells}); for multi-head fixtures the count is pixels per head.
+    on_phase(phase) is called before the compile and
+    before each variant's emission — raise from it to abort.
+    A 1-cell variant has no Pixel geometry or cell channels, so it is
+    compiled and emitted on its own. measure_separate then times an
+    uncached build of every count on its own ("separate" phases), which
+    costs as much again as the savings it measures. Returns a FamilyBuild.
+    """
+    on_phase = on_phase or (lambda phase: None)
+    counts = sorted({int(n) for n in cell_counts if int(n) >= 1})
+    t_start = time.perf_counter()
+    on_phase("compile")
+    base = None
+    if any(n >= 2 for n in counts):
+        # Uncached, so the timing (and the estimate built on it) is honest
+        base = _compile_spec.__wrapped__(fixture_spec_key(
+            fixture_name, manufacturer, modes_dict, 2, layout, heads, head_layout))
+    t_compile = time.perf_counter() - t_start
+
+    variants, template, separate = [], None, 0.0
+    for n in counts:
+        on_phase("gdtf")
+        t0 = time.perf_counter()
+        vname = name_format.format(name=fixture_name, cells=n)
+        if n < 2:
+            ir = _compile_spec.__wrapped__(fixture_spec_key(
+                vname, manufacturer, modes_dict, n, layout, heads, head_layout))
+            xml = emit_gdtf_xml(ir)
+            separate += time.perf_counter() - t0
+            variants.append(FamilyVariant(n, ir, xml))
+            continue
+        name, short = _fixture_names(vname)
+        ir = base._replace(name=name, short_name=short, cell_count=n,
+                           geometries=_fixture_geometries(n, layout, heads, head_layout))
+        if template is None:
+            xml = emit_gdtf_xml(ir)
+            template = _split_family_template(xml)
+            full = t_compile + time.perf_counter() - t0
+            t1 = time.perf_counter()
+            _geometries_xml(ir.geometries)
+            shared = full - (time.perf_counter() - t1)
+            separate += full
+        else:
+            head, middle, tail = template
+            xml = "".join((head, _fixture_type_xml(ir, _guid()), middle,
+                           _geometries_xml(ir.geometries), tail))
+            separate += shared + time.perf_counter() - t0
+        variants.append(FamilyVariant(n, ir, xml))
+    seconds = time.perf_counter() - t_start
+
+    measured = None
+    if measure_separate:
+        measured = 0.0
+        for n in counts:
+            on_phase("separate")
+            t0 = time.perf_counter()
+            emit_gdtf_xml(_compile_spec.__wrapped__(fixture_spec_key(
+                name_format.format(name=fixture_name, cells=n), manufacturer,
+                modes_dict, n, layout, heads, head_layout)))
+            measured += time.perf_counter() - t0
+    return FamilyBuild(tuple(variants), seconds, separate, measured)
+
+
+def write_family_archive(dest, variants, media=()):
+    """
+    Zip of one .gdtf package per variant, each streamed straight into the
+    outer archive. dest is a path or binary file object; media is empty or
+    holds one media file list per variant.
+    """
+    variants, media = list(variants), list(media)
+    if media and len(media) != len(variants):
+        raise ValueError(f"{len(media)} media lists for {len(variants)} variants")
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_STORED) as z:
+        for v, files in zip(variants, media or [()] * len(variants)):
+            with z.open(f"{v.ir.name}.gdtf", "w", force_zip64=True) as out:
+                write_gdtf_package(out, v.xml, files)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  PATCH PLANNER
+#  Addresses for many instances of one fixture mode, computed as arrays:
+#  instance starts come from a closed-form packing (stride, instances per
+#  universe), cell addresses and positions are broadcast from those — no
+#  per-cell Python loop, so a 50k-cell rig plans in milliseconds.
+#  Addresses are 1-based within 1-based universes.
+# ══════════════════════════════════════════════════════════════════════════════
+
+UNIVERSE_SIZE = 512
+
+PatchRules = namedtuple("PatchRules", "start_universe start_address align gap "
+                                      "straddle spacing",
+                        defaults=(1, 1, 1, 0, False, 1.0))
+# Per instance: universe, address (arrays of length instances).
+# Per cell row: instance, cell, universe, address, position (n, 3) — one
+# row per cell, or one per instance (cell 0) for a single-cell fixture.
+PatchPlan = namedtuple("PatchPlan", "fixture mode footprint stride rules "
+                                    "universe address cell_instance cell "
+                                    "cell_universe cell_address position")
+
+
+def _patch_starts(count, footprint, rules):
+    """Linear 0-based start address of each instance, and the stride."""
+    if footprint < 1:
+        raise ValueError("mode has no DMX footprint to patch")
+    align = max(1, int(rules.align))
+    stride = -(-(footprint + max(0, int(rules.gap))) // align) * align
+    u0 = max(0, int(rules.start_universe) - 1)
+    off0 = -(-max(0, int(rules.start_address) - 1) // align) * align
+    i = np.arange(count, dtype=np.int64)
+    if rules.straddle:
+        return u0 * UNIVERSE_SIZE + off0 + i * stride, stride
+    if footprint > UNIVERSE_SIZE:
+        raise ValueError(f"footprint {footprint} is larger than a universe — "
+                         f"allow straddling to patch it")
+    per_universe = (UNIVERSE_SIZE - footprint) // stride + 1
+    if off0 + footprint > UNIVERSE_SIZE:
+        u0, off0 = u0 + 1, 0
+    in_first = (UNIVERSE_SIZE - off0 - footprint) // stride + 1
+    rest = np.maximum(i - in_first, 0)
+    uni = np.where(i < in_first, u0, u0 + 1 + rest // per_universe)
+    off = np.where(i < in_first, off0 + i * stride, (rest % per_universe) * stride)
+    return uni * UNIVERSE_SIZE + off, stride
+
+
+def plan_patch(ir, mode_name, count, rules=None, layout=None, head_layout=None):
+    """
+    Plan `count` instances of one mode of a compiled fixture.
+    rules: PatchRules — start universe / address, align (start addresses on
+    multiples of align, counted from 1), gap (spare addresses after each
+    instance), straddle (may an instance cross a universe boundary) and
+    spacing (metres between instance origins along X).
+    layout / head_layout: the CellLayouts the fixture was compiled with (for
+    positions). Multi-head fixtures get a row per pixel of every head (per
+    head if they have no pixels), numbered across the instance.
+    """
+    rules = rules or PatchRules()
+    mode = next((m for m in ir.modes if m.name == mode_name), None)
+    if mode is None:
+        raise ValueError(f"no mode named {mode_name!r}")
+    cells = ir.cell_count if ir.cell_count >= 2 else 0
+    footprint = mode_footprint(ir, mode)
+    starts, stride = _patch_starts(int(count), footprint, rules)
+
+    offsets, head_of = pixel_offsets(ir, mode)
+    per = len(offsets)
+    inst = np.repeat(np.arange(int(count), dtype=np.int64), per)
+    elements = ir.head_count >= 2 or cells
+    cell = np.tile(np.arange(1, per + 1) if elements else np.zeros(1, np.int64),
+                   int(count))
+    linear = starts[inst] + np.tile(offsets, int(count))
+    if ir.head_count >= 2:
+        local = cell_positions(head_layout, ir.head_count)[head_of - 1]
+        if cells:
+            local = local + np.tile(cell_positions(layout, cells), (ir.head_count, 1))
+    elif cells:
+        local = cell_positions(layout, cells)
+    else:
+        local = np.zeros((1, 3))
+    position = np.tile(local, (int(count), 1))
+    position[:, 0] += inst * float(rules.spacing)
+    return PatchPlan(ir.name, mode.name, footprint, stride, rules,
+                     starts // UNIVERSE_SIZE + 1, starts % UNIVERSE_SIZE + 1,
+                     inst + 1, cell, linear // UNIVERSE_SIZE + 1,
+                     linear % UNIVERSE_SIZE + 1, position)
+
+
+def patch_summary(plan):
+    """Universes used, last address and DMX utilisation of a plan."""
+    count = len(plan.universe)
+    if not count:
+        return {"instances": 0, "cells": 0, "universes": 0, "last": "",
+                "utilisation": 0.0}
+    end = ((int(plan.universe[-1]) - 1) * UNIVERSE_SIZE + int(plan.address[-1]) - 1
+           + plan.footprint - 1)
+    last_u, last_a = divmod(end, UNIVERSE_SIZE)
+    universes = last_u + 2 - int(plan.universe[0])
+    return {"instances": count, "cells": len(plan.cell),
+            "universes": universes, "last": f"{last_u + 1}.{last_a + 1:03d}",
+            "utilisation": count * plan.footprint / (universes * UNIVERSE_SIZE)}
+
+
+def patch_plan_csv(plan):
+    """Address map, one row per cell (per instance for single-cell fixtures)."""
+    head = "Instance,Cell,Universe,Address,Absolute,X,Y,Z\n"
+    absolute = (plan.cell_universe - 1) * UNIVERSE_SIZE + plan.cell_address
+    pos = np.round(plan.position, 3) + 0.0
+    rows = len(plan.cell)
+    if not rows:
+        return head
+    # One %-operation over every row, as cell_transforms does
+    flat = [v for row in zip(plan.cell_instance.tolist(), plan.cell.tolist(),
+                             plan.cell_universe.tolist(), plan.cell_address.tolist(),
+                             absolute.tolist(), *pos.T.tolist())
+            for v in row]
+    fmt = "%d,%d,%d,%d,%d,%.3f,%.3f,%.3f"
+    return head + "\n".join([fmt] * rows) % tuple(flat) + "\n"
+
+
+def patch_plan_json(plan):
+    """Address map grouped by instance, for console macro tooling."""
+    per = max(len(plan.cell) // max(len(plan.universe), 1), 1)
+    pos = (np.round(plan.position, 3) + 0.0).reshape(len(plan.universe), per, 3).tolist()
+    cu = plan.cell_universe.reshape(-1, per).tolist()
+    ca = plan.cell_address.reshape(-1, per).tolist()
+    cn = plan.cell.reshape(-1, per).tolist()
+    return json.dumps({
+        "fixture": plan.fixture, "mode": plan.mode,
+        "footprint": plan.footprint, "stride": plan.stride,
+        "rules": plan.rules._asdict(),
+        "instances": [{
+            "instance": i + 1, "universe": u, "address": a,
+            "cells": [{"cell": c, "universe": cu_, "address": ca_, "position": p}
+                      for c, cu_, ca_, p in zip(cn[i], cu[i], ca[i], pos[i])],
+        } for i, (u, a) in enumerate(zip(plan.universe.tolist(),
+                                         plan.address.tolist()))],
+    }, separators=(",", ":"))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  WHEEL MEDIA
+#  Gobo / colour slot images live in a content-addressed store: a file's name
+#  is the hash of its bytes, so an image reused across wheels, modes and
+#  uploads is stored — and packaged — exactly once. Slots reference it by
+#  name (MediaFileName), and the archive holds it as wheels/<name>.png.
+# ══════════════════════════════════════════════════════════════════════════════
+
+MEDIA_CHUNK = 1 << 16
+MEDIA_SUFFIX = ".png"
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+class MediaStore:
+    """Directory of slot images named by the first 20 hex digits of SHA-256."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name + MEDIA_SUFFIX)
+
+    def __contains__(self, name):
+        return os.path.exists(self.path(name))
+
+    def add(self, src):
+        """
+        Store a PNG from a path or binary file object, streaming it through
+        the hash. Returns its media name; re-adding the same bytes is free.
+        """
+        owned = isinstance(src, (str, os.PathLike))
+        fobj = open(src, "rb") if owned else src
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                head = fobj.read(MEDIA_CHUNK)
+                if not head.startswith(_PNG_MAGIC):
+                    raise ValueError("wheel slot media must be a PNG image")
+                while head:
+                    digest.update(head)
+                    out.write(head)
+                    head = fobj.read(MEDIA_CHUNK)
+            name = digest.hexdigest()[:20]
+            if name in self:
+                os.remove(tmp)
+            else:
+                os.replace(tmp, self.path(name))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            if owned:
+                fobj.close()
+        return name
+
+    def package_files(self, names):
+        """(archive name, disk path) pairs for write_gdtf_package."""
+        return [(f"wheels/{n}{MEDIA_SUFFIX}", self.path(n)) for n in names]
+
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  LIBRARY LINT
+#  Checks a description.xml the way a console will read it: wheel references,
+#  ChannelSet ordering, Relation paths and per-break DMX footprints.
+#  Every Wheel= in a ChannelFunction must name a Wheel that exists — MA3
+#  silently drops channels with broken wheel references on import.
+#  Shared by the app (validate_wheel_references) and gdtf_lint.py.
+# ══════════════════════════════════════════════════════════════════════════════
+
+LintIssue = namedtuple("LintIssue", "check severity mode channel message")
+
+MAX_FOOTPRINT = 512
+RELATION_TYPES = ("Multiply", "Override")
+
+
+def _dmx_value(text):
+    """'128/1' -> 128 (value in the channel's own resolution), None if junk."""
+    try:
+        return int((text or "").split("/")[0])
+    except ValueError:
+        return None
+
+
+def _channel_name(ch_el):
+    """GDTF 1.1 DMXChannel name is implicit: Geometry_FirstLogicalAttribute."""
+    if ch_el.get("Name"):
+        return ch_el.get("Name")
+    log_el = ch_el.find("LogicalChannel")
+    attr = log_el.get("Attribute", "") if log_el is not None else ""
+    return f"{ch_el.get('Geometry', '')}_{attr}"
+
+
+def _lint_wheels(ft):
+    defined = {w.get("Name") for w in ft.findall(".//Wheels/Wheel")}
+    for cf in ft.iterfind(".//ChannelFunction"):
+        wref = cf.get("Wheel")
+        if wref and wref not in defined:
+            ch_name = cf.get("OriginalAttribute", "?")
+            yield LintIssue(
+                "wheel", "error", "", ch_name,
+                f"Channel '{ch_name}': references Wheel '{wref}' "
+                f"which is not defined. Defined: {sorted(defined) or 'none'}")
+
+
+def _lint_mode(mode_el, max_footprint):
+    mode = mode_el.get("Name", "")
+    channels = {}
+    footprint = {}
+    for ch_el in mode_el.iterfind("DMXChannels/DMXChannel"):
+        name = _channel_name(ch_el)
+        channels[name] = ch_el
+        # Virtual channels have no DMX address: Offset="None" (or none at all)
+        raw = (ch_el.get("Offset") or "").strip()
+        offsets = [] if raw == "None" else [o for o in raw.split(",") if o.strip()]
+        if offsets:
+            brk = ch_el.get("DMXBreak", "1")
+            try:
+                footprint[brk] = max(footprint.get(brk, 0), *map(int, offsets))
+            except ValueError:
+                yield LintIssue("footprint", "error", mode, name,
+                                f"unreadable Offset {ch_el.get('Offset')!r}")
+        for cf in ch_el.iterfind("LogicalChannel/ChannelFunction"):
+            prev = None
+            for cs in cf.iterfind("ChannelSet"):
+                start = _dmx_value(cs.get("DMXFrom"))
+                if start is None:
+                    continue
+                if prev is not None and start <= prev[1]:
+                    yield LintIssue(
+                        "channel_sets", "error", mode, name,
+                        f"ChannelSet '{cs.get('Name', '')}' starts at {start}, "
+                        f"overlapping '{prev[0]}' from {prev[1]}")
+                prev = (cs.get("Name", ""), start)
+
+    for brk, size in footprint.items():
+        if size > max_footprint:
+            yield LintIssue(
+                "footprint", "error", mode, "",
+                f"break {brk} spans {size} DMX addresses (limit {max_footprint})")
+
+    if not channels:
+        yield LintIssue("footprint", "warning", mode, "", "mode has no DMX channels")
+
+    for rel in mode_el.iterfind("Relations/Relation"):
+        rname = rel.get("Name", "")
+        if rel.get("Type") not in RELATION_TYPES:
+            yield LintIssue("relations", "error", mode, rname,
+                            f"Relation '{rname}': unknown Type {rel.get('Type')!r}")
+        for role in ("Master", "Follower"):
+            path = (rel.get(role) or "").split(".")
+            problem = None
+            if path[0] != mode:
+                problem = f"points into mode '{path[0]}'"
+            elif len(path) < 2 or path[1] not in channels:
+                problem = f"channel '{'.'.join(path[1:2])}' does not exist"
+            elif role == "Follower":
+                ch_el = channels[path[1]]
+                found = len(path) < 4 or any(
+                    cf.get("Name") == path[3]
+                    for log_el in ch_el.iterfind("LogicalChannel")
+                    if log_el.get("Name", log_el.get("Attribute")) == path[2]
+                    for cf in log_el.iterfind("ChannelFunction"))
+                if not found:
+                    problem = f"function '{'.'.join(path[2:])}' does not exist"
+            if problem:
+                yield LintIssue("relations", "error", mode, rname,
+                                f"Relation '{rname}': {role} "
+                                f"'{rel.get(role)}' {problem}")
+
+
+def lint_description(xml, max_footprint=MAX_FOOTPRINT):
+    """
+    Lint description.xml (str or bytes). Returns a list of LintIssue;
+    an unparseable file yields a single "parse" error.
+    """
+    try:
+        root = ET.fromstring(xml.encode("utf-8") if isinstance(xml, str) else xml)
+    except ET.ParseError as e:
+        return [LintIssue("parse", "error", "", "", f"XML parse error: {e}")]
+    ft = root.find("FixtureType")
+    if ft is None:
+        return [LintIssue("parse", "error", "", "", "Could not find FixtureType element")]
+    issues = list(_lint_wheels(ft))
+    for mode_el in ft.iterfind("DMXModes/DMXMode"):
+        issues.extend(_lint_mode(mode_el, max_footprint))
+    return issues
+
+
+def validate_wheel_references(xml_str):
+    errors = []
+    try:
+        root = ET.fromstring(xml_str.encode("utf-8"))
+        ft   = root.find("FixtureType")
+        if ft is None:
+            return ["Could not find FixtureType element"]
+        errors.extend(issue.message for issue in _lint_wheels(ft))
+    except Exception as e:
+        errors.append(f"Validation parse error: {e}")
+    return errors
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  LIVE LINT
+#  Editor-time checks on the channel model, before anything is compiled.
+#  Each channel is linted alone, cached on its content key; list checks
+#  (duplicates, fine bytes, wheel definitions) are cached on the list's
+#  channel keys. An edit re-lints only the channel and list it touched.
+#  Issues are (check, severity, message) tuples, keyed by row in the list.
+# ══════════════════════════════════════════════════════════════════════════════
+
+def channel_lint_key(ch):
+    """Hashable content of one channel dict — everything the lint reads."""
+    return (ch.get("name", ""), bool(ch.get("is_fine", False)),
+            tuple((int(s.get("dmx_from", 0)), int(s.get("dmx_to", 0)),
+                   s.get("name", ""), s.get("media", ""))
+                  for s in ch.get("slots", ())))
+
+
+def _is_virtual(name):
+    return "virtual" in name.lower()
+
+
+@functools.lru_cache(maxsize=8192)
+def lint_channel(key):
+    """Issues of one channel on its own: (check, severity, message) tuples."""
+    name, fine, slots = key
+    issues = []
+    if not name.strip():
+        issues.append(("name", "warning", "no name — skipped on export"))
+        return tuple(issues)
+    if fine or _is_virtual(name):
+        return tuple(issues)
+    attr = resolve_attr(name)[0]
+    if not is_known_channel(name):
+        near = suggest_attribute(name)
+        hint = f" — did you mean '{near}'?" if near else ""
+        issues.append(("attribute", "warning",
+                       f"not a GDTF attribute — exported as custom '{attr}'{hint}"))
+    named = []
+    for i, (lo, hi, sname, media) in enumerate(slots, 1):
+        if not sname.strip():
+            issues.append(("channel_sets", "warning",
+                           f"set {i} has no label — skipped on export"))
+            continue
+        if lo > hi:
+            issues.append(("channel_sets", "error",
+                           f"set '{sname}': From {lo} is above To {hi}"))
+        if media and not is_wheel_attr(attr):
+            issues.append(("wheels", "warning",
+                           f"set '{sname}': images only apply to wheel channels"))
+        named.append((lo, hi, sname))
+    for (lo1, hi1, n1), (lo2, hi2, n2) in zip(named, named[1:]):
+        if lo2 <= hi1:
+            issues.append(("channel_sets", "error",
+                           f"sets '{n1}' ({lo1}–{hi1}) and '{n2}' ({lo2}–{hi2}) "
+                           f"overlap or are out of DMX order"))
+    return tuple(issues)
+
+
+ListLint = namedtuple("ListLint", "rows wheels footprint")
+
+
+@functools.lru_cache(maxsize=512)
+def lint_channel_list(keys, part):
+    """
+    Checks across one body or cell list. Returns ListLint:
+    rows      {row index: ((check, severity, message), ...)} — channel and list issues
+    wheels    {attribute: (slot names, row)} — wheels this list would define
+    footprint DMX addresses the list uses (fine bytes included, virtuals not)
+    """
+    rows, wheels, seen = {}, {}, {}
+    footprint, prev_coarse = 0, False
+    geometry = {"cell": "Pixel", "head": "Head"}.get(part, "Body")
+    for row, key in enumerate(keys):
+        name, fine, slots = key
+        found = list(lint_channel(key))
+        if fine and name.strip():
+            footprint += 1
+            if not prev_coarse:
+                found.append(("fine", "warning",
+                              "fine byte with no coarse channel right before it"))
+            prev_coarse = False
+        elif name.strip() and not _is_virtual(name):
+            footprint += 1
+            prev_coarse = True
+            attr = resolve_attr(name)[0]
+            if attr in seen:
+                found.append(("duplicate", "error",
+                              f"{geometry}_{attr} is already row {seen[attr] + 1} "
+                              f"— each attribute once per geometry"))
+            else:
+                seen[attr] = row
+            named = tuple(s[2] for s in slots if s[2].strip())
+            if named and is_wheel_attr(attr) and attr not in wheels:
+                wheels[attr] = (named, row)
+        if found:
+            rows[row] = tuple(found)
+    return ListLint(rows, wheels, footprint)
+
+
+def lint_wheel_consistency(earlier, current):
+    """
+    Wheels are shared across modes per geometry: the first mode to give an
+    attribute slots defines its wheel, later channels use it. earlier is a
+    list of (mode name, ListLint) before this list; returns {row: issues}
+    for current rows whose slots differ from that wheel.
+    """
+    rows = {}
+    for attr, (names, row) in current.wheels.items():
+        for mode_name, other in earlier:
+            if attr in other.wheels:
+                if other.wheels[attr][0] != names:
+                    rows[row] = (("wheels", "warning",
+                                  f"sets differ from the {attr} wheel defined in "
+                                  f"'{mode_name}' — consoles will show that wheel's "
+                                  f"slots"),)
+                break
+    return rows
+
+
+def lint_footprint(body, cell, cell_count, max_footprint=MAX_FOOTPRINT,
+                   head=None, heads=1):
+    """Mode-level issue when the whole fixture no longer fits the limit."""
+    total = cell.footprint * cell_count if cell_count >= 2 else 0
+    if heads >= 2:
+        total = heads * (total + (head.footprint if head else 0))
+    total += body.footprint
+    if total > max_footprint:
+        return (("footprint", "error",
+                 f"{total} DMX addresses — more than one universe ({max_footprint})"),)
+    return ()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  BUILD OUTPUTS
+#  Generated packages and exports go to disk, named by content hash, and are
+#  handed around by name — a session holds a few short strings per build
+#  however large the fixture. Rebuilding an unchanged fixture reuses the
+#  same files. Outputs are dropped by age, not by count, and whoever still
+#  shows a build touch()es it, so other users' builds never evict it.
+# ══════════════════════════════════════════════════════════════════════════════
+
+BUILD_MAX_AGE = 24 * 3600      # seconds since an output was written or touched
+
+
+class BuildStore:
+    """Directory of build outputs named <sha256[:20]>.<extension>."""
+
+    def __init__(self, root, max_age=BUILD_MAX_AGE):
+        self.root = root
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def __contains__(self, name):
+        return os.path.exists(self.path(name))
+
+    def size(self, name):
+        return os.path.getsize(self.path(name))
+
+    def read(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def write(self, writer, extension):
+        """
+        writer(binary file object) fills a temp file in the store; it is
+        hashed from disk and renamed. Returns the output's name.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "w+b") as out:
+                writer(out)
+                out.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: out.read(MEDIA_CHUNK), b""):
+                    digest.update(chunk)
+            name = f"{digest.hexdigest()[:20]}.{extension}"
+            os.replace(tmp, self.path(name))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.prune()
+        return name
+
+    def write_text(self, text, extension):
+        return self.write(lambda out: out.write(text.encode("utf-8")), extension)
+
+    def touch(self, *names):
+        """Keep outputs that are still in use for another max_age. False if one is gone."""
+        try:
+            for name in names:
+                os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def prune(self):
+        """Drop outputs untouched for max_age seconds; in-flight writes are left."""
+        cutoff = time.time() - self.max_age
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.name.endswith(".part"):
+                    continue
+                try:
+                    if e.stat().st_mtime < cutoff:
+                        os.remove(e.path)
+                except OSError:
+                    continue
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DESCRIPTION.XML INDEX
+#  One pass over a pretty-printed description.xml records where every line
+#  starts and every element opens, so a viewer can read any page of lines,
+#  walk the outline and search names without loading the document — the
+#  cost of a page is the same for a 10 KB file and a 10 MB one.
+# ══════════════════════════════════════════════════════════════════════════════
+
+XmlNode = namedtuple("XmlNode", "line depth tag name attribute")
+
+_XML_OPEN_RE = re.compile(rb'^( *)<([A-Za-z][\w.:-]*)([^>]*)>')
+_XML_NAME_RE = re.compile(rb'\bName="([^"]*)"')
+_XML_ATTRIBUTE_RE = re.compile(rb'\bAttribute="([^"]*)"')
+
+
+def _xml_attr(rx, attrs):
+    """An attribute's value as the document means it (&amp; → &)."""
+    m = rx.search(attrs)
+    return html.unescape(m.group(1).decode()) if m else ""
+
+
+class XmlIndex:
+    """
+    Line offsets and element outline of one XML file, built once. Nodes are
+    in document order; node_end[i] is the index just past node i's subtree.
+    """
+
+    def __init__(self, path, indent=2):
+        self.path = path
+        offsets, nodes, ends, stack = [0], [], [], []
+        with open(path, "rb") as f:
+            for lineno, line in enumerate(f):
+                offsets.append(offsets[-1] + len(line))
+                m = _XML_OPEN_RE.match(line)
+                if not m or m.group(2).startswith(b"?"):
+                    continue
+                depth = len(m.group(1)) // indent
+                while stack and nodes[stack[-1]].depth >= depth:
+                    ends[stack.pop()] = len(nodes)
+                attrs = m.group(3)
+                nodes.append(XmlNode(lineno, depth, m.group(2).decode(),
+                                     _xml_attr(_XML_NAME_RE, attrs),
+                                     _xml_attr(_XML_ATTRIBUTE_RE, attrs)))
+                ends.append(len(nodes))
+                if not attrs.rstrip().endswith(b"/"):
+                    stack.append(len(nodes) - 1)
+        for i in stack:
+            ends[i] = len(nodes)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nodes, self.node_end = nodes, ends
+        # Exact tag / Name / Attribute lookups are one dict hit; substring
+        # queries scan one prepared lowercase key per node
+        self._terms, self._keys = {}, []
+        for i, n in enumerate(nodes):
+            for term in {n.tag, n.name, n.attribute} - {""}:
+                self._terms.setdefault(term.lower(), []).append(i)
+            self._keys.append(f"{n.tag}\0{n.name}\0{n.attribute}".lower())
+
+    @property
+    def line_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def size(self):
+        return int(self.offsets[-1])
+
+    def lines(self, start, count):
+        """Lines [start, start + count) read straight from the file."""
+        start = max(0, min(start, self.line_count))
+        stop = min(self.line_count, start + count)
+        with open(self.path, "rb") as f:
+            f.seek(int(self.offsets[start]))
+            data = f.read(int(self.offsets[stop] - self.offsets[start]))
+        return data.decode("utf-8").splitlines()
+
+    def children(self, i=None):
+        """Indices of node i's child elements (None: the top-level elements)."""
+        j, end = (0, len(self.nodes)) if i is None else (i + 1, self.node_end[i])
+        out = []
+        while j < end:
+            out.append(j)
+            j = self.node_end[j]
+        return out
+
+    def label(self, i):
+        """Display name of node i: its Name, Attribute or first child's."""
+        n = self.nodes[i]
+        if n.name or n.attribute:
+            return n.name or n.attribute
+        if i + 1 < self.node_end[i]:
+            first = self.nodes[i + 1]
+            return first.name or first.attribute or n.tag
+        return n.tag
+
+    def find(self, tag, parent=None):
+        """First child of parent with this tag, or None."""
+        return next((j for j in self.children(parent)
+                     if self.nodes[j].tag == tag), None)
+
+    def search(self, query, limit=200):
+        """
+        Nodes whose tag, Name or Attribute equals query (case-insensitive),
+        else contains it — at most limit, in document order.
+        """
+        q = query.strip().lower()
+        if not q:
+            return []
+        exact = self._terms.get(q)
+        if exact:
+            return exact[:limit]
+        return list(itertools.islice(
+            (i for i, key in enumerate(self._keys) if q in key), limit))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  GENERATE JOBS
+#  A build — compile, every emitter, packaging, wheel validation — runs on a
+#  worker thread so the UI stays live. The job reports its phase as it goes
+#  and checks for cancellation between phases; a cancelled job's thread
+#  finishes its current phase and throws the work away. Outputs are written
+#  to a BuildStore; the result carries their names, not their bytes.
+# ══════════════════════════════════════════════════════════════════════════════
+
+GENERATE_PHASES = ("compile", "gdtf", "csv", "json", "package", "validate")
+FAMILY_PHASES   = ("compile", "gdtf", "package", "validate")
+FAMILY_TIMED_PHASES = ("compile", "gdtf", "separate", "package", "validate")
+
+# files: {"package" | emitter format: BuildStore name}; family builds have
+# only "package" (a zip of variant packages) and a report
+GenerateResult = namedtuple("GenerateResult", "files wheel_errors seconds report",
+                            defaults=(None,))
+
+
+class GenerateCancelled(Exception):
+    pass
+
+
+class GenerateJob:
+    """
+    One background build. start() returns immediately; poll state / phase /
+    progress, then read result (a GenerateResult) or error. Outputs go to
+    build_store (default: a BuildStore under the system temp directory).
+    With cell_counts, builds a fixture family instead (see build_family;
+    measure_separate is passed through).
+    State: queued → running → done | failed | cancelled.
+    """
+
+    def __init__(self, fixture_name, manufacturer, modes_dict, cell_count=1,
+                 layout=None, media_store=None, build_store=None, info=None,
+                 cell_counts=None, heads=1, head_layout=None, measure_separate=False):
+        self.args = (fixture_name, manufacturer, modes_dict, cell_count, layout,
+                     heads, head_layout)
+        self.cell_counts = cell_counts
+        self.measure_separate = measure_separate
+        self.phases = (GENERATE_PHASES if not cell_counts else
+                       FAMILY_TIMED_PHASES if measure_separate else FAMILY_PHASES)
+        self.media_store = media_store
+        self.build_store = build_store or BuildStore(
+            os.path.join(tempfile.gettempdir(), "gdtf_builds"))
+        self.info = info or {}          # caller's summary, kept with the result
+        self.state = "queued"
+        self.phase = ""
+        self.step = 0
+        self.result = None
+        self.error = None
+        self.started = None
+        self.elapsed = 0.0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def done(self):
+        return self.state in ("done", "failed", "cancelled")
+
+    @property
+    def progress(self):
+        return self.step / len(self.phases)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="gdtf-generate")
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop at the next phase boundary; the job reads as cancelled at once."""
+        self._cancel.set()
+        with self._lock:
+            if not self.done:
+                self.state = "cancelled"
+                self.elapsed = time.perf_counter() - (self.started or time.perf_counter())
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+    def _enter(self, phase):
+        if self._cancel.is_set():
+            raise GenerateCancelled
+        self.phase = phase
+        self.step = self.phases.index(phase)
+
+    def _media(self, irs):
+        if self.media_store is None:
+            return ()
+        return self.media_store.package_files(
+            sorted({m for ir in irs for m in media_references(ir)}))
+
+    def _build(self):
+        self._enter("compile")
+        ir = compile_fixture(*self.args)
+        store, files = self.build_store, {}
+        self._enter("gdtf")
+        xml = EMITTERS["gdtf"][0](ir)
+        files["gdtf"] = store.write_text(xml, EMITTERS["gdtf"][1])
+        for fmt in ("csv", "json"):
+            self._enter(fmt)
+            files[fmt] = store.write_text(EMITTERS[fmt][0](ir), EMITTERS[fmt][1])
+        self._enter("package")
+        media = self._media([ir])
+        files["package"] = store.write(
+            lambda out: write_gdtf_package(out, xml, media), "gdtf")
+        self._enter("validate")
+        wheel_errors = validate_wheel_references(xml)
+        return GenerateResult(files, wheel_errors,
+                              time.perf_counter() - self.started)
+
+    def _build_family(self):
+        fixture_name, manufacturer, modes_dict, _cells, layout, heads, head_layout = self.args
+        family = build_family(fixture_name, manufacturer, modes_dict,
+                              self.cell_counts, layout, on_phase=self._enter,
+                              heads=heads, head_layout=head_layout,
+                              measure_separate=self.measure_separate)
+        self._enter("package")
+        media = [self._media([v.ir]) for v in family.variants]
+        package = self.build_store.write(
+            lambda out: write_family_archive(out, family.variants, media), "zip")
+        # Spliced variants share their template's wheels and modes, so only
+        # the separately emitted ones (first multi-cell, 1-cell) need checking
+        self._enter("validate")
+        wheel_errors, checked = [], set()
+        for v in family.variants:
+            if (v.cell_count >= 2) not in checked:
+                checked.add(v.cell_count >= 2)
+                wheel_errors.extend(e for e in validate_wheel_references(v.xml)
+                                    if e not in wheel_errors)
+        report = {
+            "variants": [{"cells": v.cell_count, "name": v.ir.name,
+                          "footprints": {m.name: mode_footprint(v.ir, m)
+                                         for m in v.ir.modes},
+                          "bytes": len(v.xml.encode("utf-8"))}
+                         for v in family.variants],
+            "seconds": family.seconds,
+            "separate_estimate": family.separate_estimate,
+            "separate_seconds": family.separate_seconds,
+        }
+        return GenerateResult({"package": package}, wheel_errors,
+                              time.perf_counter() - self.started, report)
+
+    def _run(self):
+        try:
+            result = self._build_family() if self.cell_counts else self._build()
+        except GenerateCancelled:
+            return
+        except Exception as e:
+            with self._lock:
+                if not self.done:
+                    self.error, self.state = e, "failed"
+                    self.elapsed = time.perf_counter() - self.started
+            return
+        with self._lock:
+            if not self.done:
+                self.result, self.step = result, len(self.phases)
+                self.elapsed, self.state = result.seconds, "done"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  WORKSPACE
+#  Many fixtures in one session. Only the fixture being edited lives in the
+#  editor's state; every fixture is also kept as a FixtureDoc — names, counts,
+#  layouts and the mode list as one compressed pickle — so a stored fixture
+#  costs its compressed size and nothing renders it. Workspace-wide builds
+#  and validation run as a WorkspaceJob over the docs snapshotted at submit.
+# ══════════════════════════════════════════════════════════════════════════════
+
+FixtureDoc = namedtuple("FixtureDoc", "id name manufacturer cell_count head_count "
+                                      "cell_layout head_layout modes_blob "
+                                      "n_modes n_channels")
+
+
+def pack_fixture(fixture_id, name, manufacturer, modes, cell_count=1,
+                 head_count=1, cell_layout=None, head_layout=None):
+    """FixtureDoc for one fixture; modes are the editor's mode dicts."""
+    blob = zlib.compress(pickle.dumps(modes, pickle.HIGHEST_PROTOCOL))
+    n_channels = sum(len(m.get(f"{part}_channels", ()))
+                     for m in modes for part in CHANNEL_PARTS)
+    return FixtureDoc(fixture_id, name, manufacturer, int(cell_count),
+                      int(head_count), cell_layout, head_layout, blob,
+                      len(modes), n_channels)
+
+
+def unpack_modes(doc):
+    """Fresh, mutable mode dicts of a stored fixture."""
+    return pickle.loads(zlib.decompress(doc.modes_blob))
+
+
+def fixture_build_args(doc):
+    """compile_fixture / build_gdtf keyword arguments for a stored fixture."""
+    return {"fixture_name": doc.name.strip() or "Unknown Fixture",
+            "manufacturer": doc.manufacturer.strip() or "Generic",
+            "modes_dict": {m["name"]: channel_defs_from_mode(m)
+                           for m in unpack_modes(doc) if m["name"].strip()},
+            "cell_count": doc.cell_count, "layout": doc.cell_layout,
+            "heads": doc.head_count, "head_layout": doc.head_layout}
+
+
+class Workspace:
+    """
+    FixtureDocs by id, in creation order, plus the id of the fixture open in
+    the editor. The open fixture's doc is only as fresh as its last store(),
+    except its name, which the editor keeps current through rename().
+    """
+
+    def __init__(self, recent=8):
+        self.docs = {}
+        self.active = None
+        self._recent = deque(maxlen=recent)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __iter__(self):
+        return iter(self.docs.values())
+
+    def store(self, doc):
+        self.docs[doc.id] = doc
+
+    def open(self, fixture_id):
+        self.active = fixture_id
+        if fixture_id in self._recent:
+            self._recent.remove(fixture_id)
+        self._recent.appendleft(fixture_id)
+
+    def rename(self, fixture_id, name):
+        """Refresh a doc's name without re-storing it (the open fixture's, as typed)."""
+        doc = self.docs.get(fixture_id)
+        if doc is not None and doc.name != name:
+            self.docs[fixture_id] = doc._replace(name=name)
+
+    def remove(self, fixture_id):
+        self.docs.pop(fixture_id, None)
+        if fixture_id in self._recent:
+            self._recent.remove(fixture_id)
+
+    def recent(self):
+        """Recently opened docs, newest first."""
+        return [self.docs[i] for i in self._recent if i in self.docs]
+
+    def names(self):
+        """(name, id) pairs — for workspace_index() search."""
+        return tuple((doc.name, doc.id) for doc in self.docs.values())
+
+
+WORKSPACE_ACTIONS = ("build", "validate")
+
+
+class WorkspaceJob(GenerateJob):
+    """
+    Build or validate every fixture of a workspace on a worker thread. One
+    phase per fixture (its doc id), then "package" for a build. Each fixture
+    is compiled, emitted and linted; a build also zips every .gdtf into one
+    archive. result.report["fixtures"] has one row per fixture.
+    """
+
+    def __init__(self, docs, action="build", media_store=None, build_store=None,
+                 info=None):
+        if action not in WORKSPACE_ACTIONS:
+            raise ValueError(f"unknown workspace action {action!r}")
+        super().__init__(None, None, None, media_store=media_store,
+                         build_store=build_store, info=info)
+        self.docs = tuple(docs)
+        self.action = action
+        self.phases = tuple(doc.id for doc in self.docs) + (
+            ("package",) if action == "build" else ())
+
+    def _build(self):
+        rows, built, names = [], [], set()
+        for doc in self.docs:
+            self._enter(doc.id)
+            ir = compile_fixture(**fixture_build_args(doc))
+            xml = emit_gdtf_xml(ir)
+            issues = lint_description(xml)
+            errors = sum(i.severity == "error" for i in issues)
+            rows.append({"id": doc.id, "name": ir.name, "modes": len(ir.modes),
+                         "errors": errors, "warnings": len(issues) - errors,
+                         "first_issue": issues[0].message if issues else ""})
+            if self.action == "build":
+                # Archive entries are named by fixture; same-named ones get a suffix
+                name, n = ir.name, 1
+                while name in names:
+                    n += 1
+                    name = f"{ir.name}_{n}"
+                names.add(name)
+                built.append(FamilyVariant(ir.cell_count, ir._replace(name=name), xml))
+        files = {}
+        if self.action == "build":
+            self._enter("package")
+            media = [self._media([v.ir]) for v in built]
+            files["package"] = self.build_store.write(
+                lambda out: write_family_archive(out, built, media), "zip")
+        return GenerateResult(files, [], time.perf_counter() - self.started,
+                              {"action": self.action, "fixtures": rows})
+
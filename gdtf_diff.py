@@ -0,0 +1,329 @@
+"""
+GDTF Builder — differential build check
+Build random fixtures through the reference path (a fresh compile and the
+ElementTree emitter) and through every alternate engine, then compare the
+canonical description.xml. A divergence is shrunk to a minimal fixture and
+saved as a .json spec that gdtf_watch.py builds as-is.
+
+    python gdtf_diff.py                                 # 300 fixtures, every engine
+    python gdtf_diff.py --runs 2000 --seed 7 -e family  # one engine, more cases
+    python gdtf_diff.py -e mymod:build_fast -o repro/   # an engine under development
+
+An engine is a callable taking build_gdtf's keyword arguments and returning
+description.xml text. FixtureTypeID (a fresh GUID per build) is ignored.
+Exit status: 0 every engine matches, 1 divergences found.
+"""
+
+import argparse, copy, functools, importlib, json, os, random, sys, tempfile, time, zipfile
+import xml.etree.ElementTree as ET
+
+from gdtf_core import (ATTR_MAP, CHANNEL_CATALOGUE, BuildStore, GenerateJob,
+                       all_attributes, build_family, build_gdtf, emit_gdtf_xml,
+                       fixture_spec_key, is_fine, _compile_spec)
+from gdtf_watch import spec_build_args
+
+ENGINES = {}
+
+
+def engine(name):
+    """Register an alternate build path: fn(**build_gdtf kwargs) -> xml."""
+    def register(fn):
+        ENGINES[name] = fn
+        return fn
+    return register
+
+
+def reference(**kw):
+    """The reference build: no IR cache, straight through emit_gdtf_xml."""
+    return emit_gdtf_xml(_compile_spec.__wrapped__(fixture_spec_key(**kw)))
+
+
+@engine("build_gdtf")
+def _cached(**kw):
+    """The public path, its IR cache shared by every fixture in the run."""
+    return build_gdtf(**kw)
+
+
+@engine("family")
+def _family(**kw):
+    """A family variant; past the first multi-cell count it's template-spliced."""
+    cells = kw.pop("cell_count")
+    counts = [2, cells] if cells > 2 else [cells]
+    family = build_family(cell_counts=counts, name_format="{name}", **kw)
+    return next(v.xml for v in family.variants if v.cell_count == cells)
+
+
+@engine("package")
+def _package(**kw):
+    """A background GenerateJob, read back out of its .gdtf package."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BuildStore(tmp)
+        job = GenerateJob(build_store=store, **kw).start()
+        job.wait()
+        if job.error is not None:
+            raise job.error
+        with zipfile.ZipFile(store.path(job.result.files["package"])) as z:
+            return z.read("description.xml").decode("utf-8")
+
+
+def load_engine(name):
+    """A registered engine, or 'module:function' for one outside this file."""
+    if name in ENGINES:
+        return ENGINES[name]
+    module, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"unknown engine {name!r} (registered: {', '.join(ENGINES)})")
+    return getattr(importlib.import_module(module), attr)
+
+
+# ── Random fixtures ───────────────────────────────────────────────────────────
+# Specs are gdtf_watch.py's .json shape. Names mix catalogue channels, GDTF
+# attributes, aliases-as-typed and junk; text fields carry the characters an
+# emitter has to escape.
+
+_CUSTOM = ["Virtual Dimmer", "Dimmer Fine", "Pan Fine", "16-bit Zoom",
+           "Hazer Fan", "weird/x.y", "Foo", ""]
+_TEXT = ["Fx", "Spot 300", "Bar & Co", 'Say "hi"', "Ünïcode <1>", "9 Lives"]
+_MODE_NAMES = ["Std", "Std/8ch", "Ext. 16-bit", "Mode", "Ünï"]
+_SLOT_NAMES = ["Open", "Closed", "Gobo 1", "Gobo 1", "", " ", "Red/Blue",
+               "x.y", "Ünï & <c>"]
+
+
+@functools.lru_cache(maxsize=1)
+def _channel_names():
+    names = {n for group in CHANNEL_CATALOGUE.values() for n, _ in group}
+    names |= set(ATTR_MAP) | {a.name for a in all_attributes()}
+    return sorted(names) + _CUSTOM
+
+
+def random_spec(rng):
+    """One random fixture spec."""
+    names = _channel_names()
+    heads = rng.choice([1, 1, 1, 2, 3])
+
+    def channels(most):
+        out = []
+        for _ in range(rng.randint(0, most)):
+            name = rng.choice(names)
+            if rng.random() < 0.2:
+                name = rng.choice([name.upper(), name.lower(), name + " Fine"])
+            slots = []
+            for _ in range(rng.choice([0, 0, 1, 2, 4])):
+                lo = rng.randint(0, 255)
+                slots.append({"dmx_from": lo, "dmx_to": min(255, lo + rng.randint(0, 20)),
+                              "name": rng.choice(_SLOT_NAMES)})
+            out.append({"name": name, "is_fine": rng.random() < 0.1 or is_fine(name),
+                        "slots": slots})
+        return out
+
+    spec = {"fixture": rng.choice(_TEXT), "manufacturer": rng.choice(_TEXT),
+            "cells": rng.choice([1, 1, 2, 3, 8]), "heads": heads,
+            "modes": [{"name": f"{rng.choice(_MODE_NAMES)} {i}",
+                       "body_channels": channels(8), "cell_channels": channels(5),
+                       "head_channels": channels(4) if heads >= 2 else []}
+                      for i in range(1, rng.randint(1, 3) + 1)]}
+    if rng.random() < 0.3:
+        spec["layout"] = {"kind": rng.choice(["line", "grid", "ring"]),
+                          "columns": rng.randint(0, 4),
+                          "pitch_x": rng.choice([0.1, 0.125]),
+                          "pitch_y": rng.choice([0.1, 0.2])}
+    return spec
+
+
+# ── Comparison ────────────────────────────────────────────────────────────────
+
+def canonical(xml):
+    """(C14N text, element tree) with the per-build FixtureTypeID blanked."""
+    root = ET.fromstring(xml.encode("utf-8"))
+    for ft in root.iter("FixtureType"):
+        ft.set("FixtureTypeID", "")
+    return ET.canonicalize(ET.tostring(root, encoding="unicode"), strip_text=True), root
+
+
+def divergence(ref, alt, path=""):
+    """Where alt first differs from ref, as 'path: detail' — None if nowhere."""
+    if ref.tag != alt.tag:
+        return f"{path or '/'}: <{alt.tag}>, reference <{ref.tag}>"
+    path = path or f"/{ref.tag}"
+    for k in sorted(set(ref.attrib) | set(alt.attrib)):
+        if ref.get(k) != alt.get(k):
+            return f"{path}/@{k}: {alt.get(k)!r}, reference {ref.get(k)!r}"
+    seen = {}
+    for a, b in zip(ref, alt):
+        seen[a.tag] = seen.get(a.tag, 0) + 1
+        name = a.get("Name")
+        step = f"{a.tag}[@Name={name!r}]" if name is not None else f"{a.tag}[{seen[a.tag]}]"
+        found = divergence(a, b, f"{path}/{step}")
+        if found:
+            return found
+    if len(ref) != len(alt):
+        return f"{path}: {len(alt)} children, reference {len(ref)}"
+    if (ref.text or "").strip() != (alt.text or "").strip():
+        return f"{path}: text {alt.text!r}, reference {ref.text!r}"
+    return None
+
+
+def check(spec, engines, timings=None):
+    """{engine name: divergence detail or None} for one spec."""
+    kw = spec_build_args(spec)
+    t0 = time.perf_counter()
+    ref_xml = reference(**kw)
+    if timings is not None:
+        timings["reference"] = timings.get("reference", 0.0) + time.perf_counter() - t0
+    ref_text, ref_root = canonical(ref_xml)
+    out = {}
+    for name, fn in engines.items():
+        t0 = time.perf_counter()
+        try:
+            xml = fn(**dict(kw))
+        except Exception as e:
+            out[name] = f"raised {type(e).__name__}: {e}"
+            continue
+        finally:
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+        try:
+            text, root = canonical(xml)
+        except ET.ParseError as e:
+            out[name] = f"not well-formed XML: {e}"
+            continue
+        out[name] = None if text == ref_text else (
+            divergence(ref_root, root) or "canonical text differs")
+    return out
+
+
+# ── Shrinking ─────────────────────────────────────────────────────────────────
+
+_SIMPLE = (("cells", 1), ("heads", 1), ("layout", None), ("fixture", "Fx"),
+           ("manufacturer", "Fx"))
+_PARTS = ("body", "cell", "head")
+
+
+def _edit(spec, mi, part, ci, channel):
+    """Copy of spec with one channel replaced (None removes it)."""
+    out = copy.deepcopy(spec)
+    chs = out["modes"][mi][f"{part}_channels"]
+    if channel is None:
+        del chs[ci]
+    else:
+        chs[ci] = channel
+    return out
+
+
+def _shrinks(spec):
+    """Simpler variants of spec, biggest cuts first."""
+    modes = spec["modes"]
+    if len(modes) > 1:
+        for mi in range(len(modes)):
+            yield {**spec, "modes": modes[:mi] + modes[mi + 1:]}
+    for key, simple in _SIMPLE:
+        if spec.get(key) != simple:
+            yield {k: v for k, v in spec.items() if k != key} if simple is None \
+                else {**spec, key: simple}
+    if spec["cells"] > 2:
+        yield {**spec, "cells": 2}
+    for mi, mode in enumerate(modes):
+        if mode["name"] != f"Mode {mi + 1}":
+            yield {**spec, "modes": modes[:mi] + [{**mode, "name": f"Mode {mi + 1}"}]
+                   + modes[mi + 1:]}
+    for mi, mode in enumerate(modes):
+        for part in _PARTS:
+            for ci in range(len(mode.get(f"{part}_channels", []))):
+                yield _edit(spec, mi, part, ci, None)
+    for mi, mode in enumerate(modes):
+        for part in _PARTS:
+            for ci, ch in enumerate(mode.get(f"{part}_channels", [])):
+                for si in range(len(ch["slots"])):
+                    yield _edit(spec, mi, part, ci,
+                                {**ch, "slots": ch["slots"][:si] + ch["slots"][si + 1:]})
+                if ch["name"] != "Dimmer":
+                    yield _edit(spec, mi, part, ci, {**ch, "name": "Dimmer"})
+                if ch["is_fine"]:
+                    yield _edit(spec, mi, part, ci, {**ch, "is_fine": False})
+                for si, slot in enumerate(ch["slots"]):
+                    for simple in ({"name": "Open"}, {"dmx_from": 0, "dmx_to": 0}):
+                        if any(slot[k] != v for k, v in simple.items()):
+                            slots = list(ch["slots"])
+                            slots[si] = {**slot, **simple}
+                            yield _edit(spec, mi, part, ci, {**ch, "slots": slots})
+
+
+def shrink(spec, still_fails):
+    """Greedy: take the first simpler variant that still fails until none does."""
+    steps = 0
+    while True:
+        for candidate in _shrinks(spec):
+            if still_fails(candidate):
+                spec, steps = candidate, steps + 1
+                break
+        else:
+            return spec, steps
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def run(engines, runs, seed, out_dir=None, log=print):
+    """Check runs random fixtures; returns {engine: summary dict}."""
+    summary = {name: {"checked": 0, "diverged": 0, "repro": None} for name in engines}
+    timings = {}
+    for i in range(runs):
+        spec = random_spec(random.Random(f"{seed}:{i}"))
+        for name, detail in check(spec, engines, timings).items():
+            row = summary[name]
+            row["checked"] += 1
+            if detail is None:
+                continue
+            row["diverged"] += 1
+            if row["repro"] is not None:
+                continue
+            # Shrink the first divergence per engine; later ones are counted
+            fails = lambda s, n=name: check(s, {n: engines[n]})[n] is not None
+            small, steps = shrink(spec, fails)
+            row["repro"] = {"case": i, "detail": check(small, {name: engines[name]})[name],
+                            "spec": small}
+            log(f"✖ {name}: case {i} diverges — shrunk in {steps} steps to:\n"
+                f"  {row['repro']['detail']}")
+            text = json.dumps(small, indent=1, ensure_ascii=False)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+                path = os.path.join(out_dir, f"{name.replace(':', '_')}-{seed}-{i}.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+                log(f"  spec → {path}")
+            else:
+                log(text)
+    ref = timings.get("reference", 0.0)
+    for name, row in summary.items():
+        row["ms_per_build"] = round(timings.get(name, 0.0) / max(1, runs) * 1000, 2)
+        row["vs_reference"] = round(timings.get(name, 0.0) / ref, 2) if ref else None
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("--runs", "-n", type=int, default=300,
+                    help="random fixtures to check")
+    ap.add_argument("--seed", default="0", help="seed for the fixture generator")
+    ap.add_argument("--engine", "-e", action="append", metavar="NAME",
+                    help=f"engine to check (default: all of {', '.join(ENGINES)}); "
+                         "module:function for one outside this file")
+    ap.add_argument("-o", "--output", help="write minimal repro specs here")
+    args = ap.parse_args(argv)
+    try:
+        engines = {name: load_engine(name) for name in args.engine or ENGINES}
+    except (ValueError, ImportError, AttributeError) as e:
+        ap.error(str(e))
+
+    t0 = time.perf_counter()
+    summary = run(engines, args.runs, args.seed, args.output)
+    for name, row in summary.items():
+        ratio = f" · {row['vs_reference']:.2f}× reference" if row["vs_reference"] else ""
+        print(f"{'✔' if not row['diverged'] else '✖'} {name:<12} "
+              f"{row['checked']} checked · {row['diverged']} diverged · "
+              f"{row['ms_per_build']:.1f} ms/build{ratio}")
+    print(f"{args.runs} fixtures · seed {args.seed} · {time.perf_counter() - t0:.1f} s")
+    return 1 if any(row["diverged"] for row in summary.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
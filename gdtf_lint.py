@@ -0,0 +1,112 @@
+"""
+GDTF Builder — library linter
+Scan a show drive for .gdtf files and lint each one's description.xml:
+wheel references, overlapping ChannelSets, broken Relations and oversized
+DMX footprints. Archives are read in memory, never extracted.
+
+    python gdtf_lint.py /Volumes/SHOW                 # JSON report on stdout
+    python gdtf_lint.py lib/ --format jsonl --jobs 8  # one line per file
+    python gdtf_lint.py lib/ --strict                 # warnings fail too
+
+Exit status: 0 clean, 1 issues at the failing severity, 2 no files found.
+"""
+
+import argparse, json, os, sys, time, zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from gdtf_core import lint_description, MAX_FOOTPRINT
+
+
+def find_gdtf(paths):
+    """Yield .gdtf files under each path (files are taken as given)."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith(".gdtf") and not name.startswith("._"):
+                    yield os.path.join(dirpath, name)
+
+
+def lint_file(path, max_footprint=MAX_FOOTPRINT):
+    """{"path", "issues": [LintIssue dicts]} for one archive."""
+    try:
+        with zipfile.ZipFile(path) as z:
+            xml = z.read("description.xml")
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        issues = [{"check": "parse", "severity": "error", "mode": "",
+                   "channel": "", "message": f"unreadable archive: {e}"}]
+    else:
+        issues = [i._asdict() for i in lint_description(xml, max_footprint)]
+    return {"path": path, "issues": issues}
+
+
+def _lint_args(args):
+    return lint_file(*args)
+
+
+def lint_paths(paths, jobs=None, max_footprint=MAX_FOOTPRINT):
+    """
+    Lint every .gdtf under paths, yielding results in path order.
+    Files are spread over a process pool in chunks; jobs=1 runs in-process.
+    """
+    files = list(find_gdtf(paths))
+    jobs = jobs or os.cpu_count() or 1
+    work = [(f, max_footprint) for f in files]
+    if jobs == 1 or len(files) < 2:
+        yield from map(_lint_args, work)
+        return
+    chunk = max(1, len(files) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+        yield from pool.map(_lint_args, work, chunksize=chunk)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("paths", nargs="+", help=".gdtf files or directories")
+    ap.add_argument("--jobs", "-j", type=int, default=None,
+                    help="worker processes (default: CPU count; 1 = no pool)")
+    ap.add_argument("--format", choices=["json", "jsonl"], default="json")
+    ap.add_argument("--all", action="store_true",
+                    help="list clean files in the report too")
+    ap.add_argument("--strict", action="store_true",
+                    help="exit non-zero on warnings as well as errors")
+    ap.add_argument("--max-footprint", type=int, default=MAX_FOOTPRINT,
+                    help="DMX addresses allowed per break")
+    args = ap.parse_args(argv)
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        ap.error(f"no such file or directory: {', '.join(missing)}")
+
+    failing = {"error", "warning"} if args.strict else {"error"}
+    t0 = time.perf_counter()
+    totals = {"files": 0, "failed": 0, "errors": 0, "warnings": 0}
+    results = []
+    for result in lint_paths(args.paths, args.jobs, args.max_footprint):
+        severities = [i["severity"] for i in result["issues"]]
+        totals["files"]    += 1
+        totals["errors"]   += severities.count("error")
+        totals["warnings"] += severities.count("warning")
+        totals["failed"]   += any(s in failing for s in severities)
+        if not (result["issues"] or args.all):
+            continue
+        if args.format == "jsonl":
+            print(json.dumps(result), flush=True)
+        else:
+            results.append(result)
+
+    totals["seconds"] = round(time.perf_counter() - t0, 3)
+    if args.format == "jsonl":
+        print(json.dumps({"summary": totals}))
+    else:
+        print(json.dumps({"summary": totals, "files": results}, indent=1))
+
+    if not totals["files"]:
+        return 2
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+GDTF Builder — watch mode
+Poll a directory of fixture specs and rebuild a fixture's .gdtf in the
+output folder whenever its spec changes on disk. A spec is a DMX chart
+(.csv / .tsv / .txt, as the chart importer reads it; the file name is the
+fixture name) or a .json spec:
+
+    {"fixture": "Batten 8", "manufacturer": "Acme", "cells": 8,
+     "layout": {"kind": "line", "pitch_x": 0.125},                # optional
+     "heads": 2, "head_layout": {"kind": "line", "pitch_x": 0.5}, # optional
+     "modes": [{"name": "Std", "body_channels": [...], "cell_channels": [...],
+                "head_channels": [...]}]}
+
+A channel is {"name", "is_fine"?, "slots"?}; a slot is {"dmx_from", "dmx_to",
+"name", "media"?}, where media is a PNG path relative to the spec and is
+packaged into the fixture's wheels/ (editing only the PNG doesn't trigger a
+rebuild — re-save the spec).
+
+    python gdtf_watch.py specs/ out/                 # watch until Ctrl-C
+    python gdtf_watch.py specs/ out/ --once          # build everything, exit
+    python gdtf_watch.py specs/ out/ --debounce 0.5 --interval 0.2
+
+A poll is one scandir: only files whose mtime or size moved are read, and
+only those whose content hash changed are rebuilt, once their saves have
+settled for --debounce seconds.
+"""
+
+import argparse, hashlib, json, os, shutil, statistics, sys, tempfile, time
+
+from gdtf_core import (CellLayout, MediaStore, channel_defs_from_mode,
+                       compile_fixture, emit_gdtf_xml, make_channel_entry,
+                       make_slot_entry, media_references, parse_dmx_chart,
+                       write_gdtf_package)
+
+CHART_EXTENSIONS = (".csv", ".tsv", ".txt")
+SPEC_EXTENSIONS = CHART_EXTENSIONS + (".json",)
+
+
+PARTS = ("body", "cell", "head")
+
+
+def _objects(value, what):
+    if not isinstance(value, list) or not all(isinstance(v, dict) for v in value):
+        raise ValueError(f"{what} must be a list of objects")
+    return value
+
+
+def check_spec(spec):
+    """Raise ValueError unless a parsed .json spec has the shape above."""
+    if not isinstance(spec, dict):
+        raise ValueError("spec must be a JSON object")
+    for key in ("layout", "head_layout"):
+        if spec.get(key) is not None and not isinstance(spec[key], dict):
+            raise ValueError(f"'{key}' must be an object")
+    for i, mode in enumerate(_objects(spec.get("modes", []), "'modes'"), 1):
+        for part in PARTS:
+            for ch in _objects(mode.get(f"{part}_channels", []),
+                               f"mode {i} '{part}_channels'"):
+                if not isinstance(ch.get("name"), str):
+                    raise ValueError(f"mode {i}: every channel needs a \"name\"")
+                for slot in _objects(ch.get("slots", []), f"'{ch['name']}' slots"):
+                    if not {"dmx_from", "dmx_to"} <= slot.keys():
+                        raise ValueError(f"'{ch['name']}': every slot needs "
+                                         f"\"dmx_from\" and \"dmx_to\"")
+
+
+def _json_modes(modes, media=None):
+    """
+    Mode dicts from a .json spec, with the defaults the editor fills in.
+    media maps a slot's media path to its MediaStore name; without it slot
+    media is left out.
+    """
+    out = []
+    for i, mode in enumerate(modes, 1):
+        lists = {}
+        for part in PARTS:
+            chs = []
+            for ch in mode.get(f"{part}_channels", []):
+                entry = make_channel_entry(ch["name"], bool(ch.get("is_fine")), part)
+                entry["slots"] = []
+                for s in ch.get("slots", []):
+                    slot = make_slot_entry(s["dmx_from"], s["dmx_to"], s.get("name", ""))
+                    if media and s.get("media"):
+                        slot["media"] = media(s["media"])
+                    entry["slots"].append(slot)
+                chs.append(entry)
+            lists[f"{part}_channels"] = chs
+        out.append({"name": mode.get("name") or f"Mode {i}", **lists})
+    return out
+
+
+def _layout(spec):
+    if not spec:
+        return None
+    return CellLayout(**{**spec, "points": tuple(map(tuple, spec.get("points", ())))})
+
+
+def spec_build_args(spec, manufacturer="Generic", cells=1, media=None):
+    """
+    build_gdtf keyword arguments for a .json spec (already parsed and
+    checked). media is as for _json_modes.
+    """
+    return {"fixture_name": spec["fixture"],
+            "manufacturer": spec.get("manufacturer", manufacturer),
+            "modes_dict": {m["name"]: channel_defs_from_mode(m)
+                           for m in _json_modes(spec.get("modes", []), media)},
+            "cell_count": int(spec.get("cells", cells)),
+            "layout": _layout(spec.get("layout")),
+            "heads": int(spec.get("heads", 1)),
+            "head_layout": _layout(spec.get("head_layout"))}
+
+
+def load_spec(path, manufacturer="Generic", cells=1, media_store=None):
+    """
+    build_gdtf keyword arguments for one spec file. Charts take the file
+    name as the fixture name and the command-line defaults. Slot media of
+    a .json spec is added to media_store (and dropped without one).
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        check_spec(spec)
+        base = os.path.dirname(path)
+        media = media_store and (
+            lambda src: media_store.add(os.path.join(base, src)))
+        kw = spec_build_args({**spec, "fixture": spec.get("fixture") or stem},
+                             manufacturer, cells, media)
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            modes, _report = parse_dmx_chart(f, default_mode=stem)
+        kw = {"fixture_name": stem, "manufacturer": manufacturer,
+              "modes_dict": {m["name"]: channel_defs_from_mode(m) for m in modes},
+              "cell_count": cells}
+    if not kw["modes_dict"]:
+        raise ValueError("no modes / channels found")
+    return kw
+
+
+def build_spec(path, out_dir, manufacturer="Generic", cells=1, media_store=None):
+    """
+    Build one spec into out_dir/<fixture>.gdtf (atomically), with its slot
+    media when a media_store is given. Returns the path.
+    """
+    kw = load_spec(path, manufacturer, cells, media_store)
+    ir = compile_fixture(**kw)
+    xml = emit_gdtf_xml(ir)
+    media = (media_store.package_files(media_references(ir))
+             if media_store is not None else ())
+    dest = os.path.join(out_dir, f"{kw['fixture_name'].replace(' ', '_')}.gdtf")
+    part = dest + ".part"
+    write_gdtf_package(part, xml, media)
+    os.replace(part, dest)
+    return dest
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class SpecWatcher:
+    """
+    Change detection for one spec directory. poll() returns the specs whose
+    content changed and whose last save is at least debounce seconds old,
+    each with the mtime of that save (for save → package latency).
+    """
+
+    def __init__(self, spec_dir, debounce=0.3):
+        self.spec_dir = spec_dir
+        self.debounce = debounce
+        self.stats = {}      # path -> (mtime_ns, size) last seen
+        self.built = {}      # path -> content hash last built (or attempted)
+        self.pending = {}    # path -> (mtime_ns, size) waiting to settle
+
+    def _scan(self):
+        with os.scandir(self.spec_dir) as it:
+            for entry in it:
+                if (entry.is_file() and not entry.name.startswith(".") and
+                        entry.name.lower().endswith(SPEC_EXTENSIONS)):
+                    st = entry.stat()
+                    yield entry.path, (st.st_mtime_ns, st.st_size)
+
+    def poll(self, now=None):
+        now = time.time() if now is None else now
+        seen = dict(self._scan())
+        for path in self.stats.keys() - seen.keys():
+            self.built.pop(path, None)
+            self.pending.pop(path, None)
+        for path, stat in seen.items():
+            if self.stats.get(path) != stat:
+                self.pending[path] = stat
+        self.stats = seen
+
+        ready = []
+        for path, (mtime_ns, _size) in list(self.pending.items()):
+            if now - mtime_ns / 1e9 < self.debounce:
+                continue                      # still being saved — wait
+            del self.pending[path]
+            try:
+                digest = _digest(path)
+            except OSError:
+                continue
+            if self.built.get(path) == digest:
+                continue                      # touched, not changed
+            self.built[path] = digest
+            ready.append((path, mtime_ns / 1e9))
+        return sorted(ready)
+
+
+def _summary(latencies, builds, failures):
+    if not latencies:
+        return f"{builds} built · {failures} failed"
+    lat = sorted(latencies)
+    return (f"{builds} built · {failures} failed · save → package "
+            f"median {statistics.median(lat) * 1000:.0f} ms · "
+            f"p95 {lat[int(0.95 * (len(lat) - 1))] * 1000:.0f} ms")
+
+
+def watch(spec_dir, out_dir, interval=0.25, debounce=0.3, once=False,
+          manufacturer="Generic", cells=1, log=print):
+    """Poll until interrupted (or one pass with once=True). Returns failures."""
+    os.makedirs(out_dir, exist_ok=True)
+    watcher = SpecWatcher(spec_dir, 0.0 if once else debounce)
+    media_dir = tempfile.mkdtemp(prefix="gdtf_watch_media_")
+    media_store = MediaStore(media_dir)
+    latencies, builds, failures = [], 0, 0
+    started = time.time()
+    try:
+        while True:
+            for path, saved in watcher.poll():
+                t0 = time.time()
+                try:
+                    dest = build_spec(path, out_dir, manufacturer, cells, media_store)
+                except Exception as e:     # one bad save must not stop the watch
+                    failures += 1
+                    log(f"✖ {os.path.basename(path)}: {e}")
+                    continue
+                done = time.time()
+                builds += 1
+                # Specs already on disk at startup aren't saves we waited for
+                live = saved >= started
+                if live:
+                    latencies.append(done - saved)
+                log(f"✔ {os.path.basename(dest)}  build {(done - t0) * 1000:.0f} ms"
+                    + (f" · {done - saved:.2f} s from save" if live else "")
+                    + f"  [{_summary(latencies, builds, failures)}]")
+            if once:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+    log(_summary(latencies, builds, failures))
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("spec_dir", help="directory of chart / .json fixture specs")
+    ap.add_argument("out_dir", help="where the .gdtf files are written")
+    ap.add_argument("--interval", type=float, default=0.25,
+                    help="seconds between polls")
+    ap.add_argument("--debounce", type=float, default=0.3,
+                    help="seconds a spec must be unchanged before it's rebuilt")
+    ap.add_argument("--once", action="store_true",
+                    help="build every spec once and exit")
+    ap.add_argument("--manufacturer", default="Generic",
+                    help="manufacturer for chart specs")
+    ap.add_argument("--cells", type=int, default=1,
+                    help="cell count for chart specs")
+    args = ap.parse_args(argv)
+    if not os.path.isdir(args.spec_dir):
+        ap.error(f"not a directory: {args.spec_dir}")
+    failures = watch(args.spec_dir, args.out_dir, args.interval, args.debounce,
+                     args.once, args.manufacturer, args.cells)
+    return 1 if failures and args.once else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
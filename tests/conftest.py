@@ -0,0 +1,4 @@
+import os, sys
+
+# The modules live at the repo root, next to gdtf_builder.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
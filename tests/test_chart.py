@@ -0,0 +1,56 @@
+import io
+
+from gdtf_core import parse_dmx_chart
+
+
+def _parse(text, **kw):
+    return parse_dmx_chart(io.StringIO(text), **kw)
+
+
+def test_header_rows_and_continuation_ranges():
+    modes, report = _parse(
+        "Mode,Channel,Name,From,To,Label\n"
+        "Std,1,Dimmer,,,\n"
+        "Std,2,Strobe,0,9,Closed\n"
+        ",,,10,255,Strobe Slow-Fast\n"
+        "Std,3,Pan,,,\n"
+        "Std,4,Pan Fine,,,\n")
+    assert [m["name"] for m in modes] == ["Std"]
+    chs = modes[0]["body_channels"]
+    assert [c["name"] for c in chs] == ["Dimmer", "Strobe", "Pan", "Pan Fine"]
+    assert [c["is_fine"] for c in chs] == [False, False, False, True]
+    assert [(s["dmx_from"], s["dmx_to"], s["name"]) for s in chs[1]["slots"]] == [
+        (0, 9, "Closed"), (10, 255, "Strobe Slow-Fast")]
+    assert report["channels"] == 4 and report["sets"] == 2 and report["rows"] == 5
+
+
+def test_tab_separated_without_header():
+    modes, _ = _parse("1\tDimmer\t\t\t\n2\tGobo1\t0\t9\tOpen\n\t\t10\t19\tStar\n",
+                      default_mode="Pasted")
+    assert modes[0]["name"] == "Pasted"
+    assert [len(c["slots"]) for c in modes[0]["body_channels"]] == [0, 2]
+
+
+def test_names_resolve_once_to_gdtf_attributes():
+    _, report = _parse("Name\nDimmer\nRed\nred\nWidget X\nWidget X\n")
+    assert report["attributes"] == {"Dimmer": "Dimmer", "Red": "ColorAdd_R",
+                                    "Widget X": "Widget_X"}
+    assert report["unknown"] == ["Widget X"]
+
+
+def test_full_range_row_is_continuous():
+    modes, report = _parse("Name,Range\nDimmer,0-255\n")
+    assert modes[0]["body_channels"][0]["slots"] == [] and report["sets"] == 0
+
+
+def test_cell_geometry_and_modes_column():
+    modes, _ = _parse("Mode,Name,Geometry\nA,Dimmer,body\nA,Red,cell\nB,Dimmer,\n")
+    assert [m["name"] for m in modes] == ["A", "B"]
+    assert [c["name"] for c in modes[0]["cell_channels"]] == ["Red"]
+
+
+def test_blank_and_nameless_rows():
+    modes, report = _parse("\n\n")
+    assert modes == [] and report["rows"] == 0
+    _, report = _parse("Channel,Name\n1,\n")
+    assert report["skipped"] == 1
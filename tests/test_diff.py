@@ -0,0 +1,58 @@
+import json, random
+
+from gdtf_core import build_gdtf
+from gdtf_diff import ENGINES, canonical, check, divergence, random_spec, run, shrink
+from gdtf_watch import check_spec, load_spec
+
+
+def _channels(spec):
+    return [ch for m in spec["modes"] for part in ("body", "cell", "head")
+            for ch in m.get(f"{part}_channels", [])]
+
+
+def test_shrink_reaches_a_minimal_failing_spec():
+    rng = random.Random("shrink")
+    spec = next(s for s in (random_spec(rng) for _ in range(200))
+                if len(_channels(s)) > 6 and any(ch["slots"] for ch in _channels(s)))
+    fails = lambda s: any(ch["slots"] for ch in _channels(s))
+    small, steps = shrink(spec, fails)
+    assert steps > 0 and fails(small)
+    [channel] = _channels(small)
+    assert channel["name"] == "Dimmer" and len(channel["slots"]) == 1
+    assert channel["slots"][0] == {"dmx_from": 0, "dmx_to": 0, "name": "Open"}
+    assert len(small["modes"]) == 1 and small["cells"] == 1 and "layout" not in small
+
+
+def test_shrink_returns_the_spec_when_nothing_simpler_fails():
+    spec = random_spec(random.Random(3))
+    assert shrink(spec, lambda s: s == spec) == (spec, 0)
+
+
+def test_engines_match_the_reference():
+    rng = random.Random("engines")
+    for _ in range(5):
+        assert set(check(random_spec(rng), ENGINES).values()) == {None}
+
+
+def test_divergence_names_the_first_difference():
+    xml = build_gdtf("Par", "Acme", {})
+    ref, ref_root = canonical(xml)
+    other, root = canonical(xml.replace('Manufacturer="Acme"', 'Manufacturer="Acne"'))
+    assert ref != other
+    assert divergence(ref_root, root) == (
+        "/GDTF/FixtureType[@Name='Par']/@Manufacturer: 'Acne', reference 'Acme'")
+    assert divergence(ref_root, ref_root) is None
+
+
+def test_broken_engine_is_shrunk_to_a_repro_spec(tmp_path):
+    def drops_sets(**kw):
+        return build_gdtf(**kw).replace("<ChannelSet ", "<ChannelSetX ", 1)
+
+    summary = run({"broken": drops_sets}, 20, "t", str(tmp_path), log=lambda *_: None)
+    row = summary["broken"]
+    assert row["diverged"] > 0 and row["repro"] is not None
+    [path] = tmp_path.iterdir()
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    assert spec == row["repro"]["spec"]
+    check_spec(spec)
+    assert load_spec(str(path))["modes_dict"]
@@ -0,0 +1,58 @@
+import io, re, zipfile
+
+import pytest
+
+from gdtf_core import (CellLayout, FamilyVariant, build_family, channel_defs_from_mode,
+                       compile_fixture, emit_gdtf_xml, make_channel_entry,
+                       make_slot_entry, write_family_archive)
+
+
+def _modes_dict():
+    modes = []
+    for m in range(2):
+        body = [make_channel_entry(n) for n in ("Dimmer", "Strobe", "Pan", "Pan Fine")]
+        body[1]["slots"] = [make_slot_entry(0, 9, "Closed"), make_slot_entry(10, 255, "Fast")]
+        cell = [make_channel_entry(n) for n in ("Red", "Green", "Blue", "Gobo Wheel")]
+        cell[-1]["slots"] = [make_slot_entry(0, 9, "A"), make_slot_entry(10, 19, "B")]
+        modes.append({"name": f"Mode {m + 1}", "body_channels": body,
+                      "cell_channels": cell})
+    return {m["name"]: channel_defs_from_mode(m) for m in modes}
+
+
+@pytest.mark.parametrize("layout", [
+    None, CellLayout("grid", 4, 0.05, 0.05, 0.5, "serpentine", ()),
+])
+def test_variants_are_byte_identical_to_separate_builds(layout):
+    md = _modes_dict()
+    family = build_family("Batten", "Acme", md, [16, 1, 4, 4, 8], layout=layout)
+    assert [v.cell_count for v in family.variants] == [1, 4, 8, 16]
+    for v in family.variants:
+        fid = re.search(r'FixtureTypeID="([^"]+)"', v.xml).group(1)
+        ref = emit_gdtf_xml(compile_fixture(f"Batten {v.cell_count}", "Acme", md,
+                                            v.cell_count, layout), fid)
+        assert v.xml == ref
+
+
+def test_measured_separate_builds():
+    family = build_family("Batten", "Acme", _modes_dict(), [1, 4], measure_separate=True)
+    assert family.separate_seconds is not None and family.separate_estimate > 0
+    assert build_family("Batten", "Acme", _modes_dict(), [4]).separate_seconds is None
+
+
+def test_archive_media_per_variant(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"A")
+    family = build_family("Batten", "Acme", _modes_dict(), [1, 4])
+    buf = io.BytesIO()
+    write_family_archive(buf, family.variants,
+                         [[], [("wheels/a.png", str(tmp_path / "a.png"))]])
+    outer = zipfile.ZipFile(buf)
+    inner = [zipfile.ZipFile(io.BytesIO(outer.read(n))).namelist()
+             for n in outer.namelist()]
+    assert outer.namelist() == ["Batten_1.gdtf", "Batten_4.gdtf"]
+    assert inner == [["description.xml"], ["description.xml", "wheels/a.png"]]
+
+
+def test_archive_media_length_must_match():
+    v = FamilyVariant(1, compile_fixture("Par", "Acme", _modes_dict()), "<x/>")
+    with pytest.raises(ValueError):
+        write_family_archive(io.BytesIO(), [v], [[], []])
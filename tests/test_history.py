@@ -0,0 +1,89 @@
+import copy
+
+from gdtf_core import History, freeze_modes, make_channel_entry, thaw_modes
+
+
+def _modes():
+    return [{"id": f"m{m}", "name": f"Mode {m}",
+             "body_channels": [make_channel_entry(n) for n in ("Dimmer", "Strobe")],
+             "cell_channels": [make_channel_entry("Red")]}
+            for m in range(3)]
+
+
+def test_freeze_thaw_round_trip():
+    modes = _modes()
+    assert thaw_modes(freeze_modes(modes)) == modes
+
+
+def test_unchanged_model_returns_prev():
+    modes = _modes()
+    snap = freeze_modes(modes)
+    assert freeze_modes(modes, snap) is snap
+    assert freeze_modes(modes, snap, [("m1", "body", modes[1]["body_channels"][0]["id"])]) is snap
+
+
+def test_touched_channel_shares_everything_else():
+    modes = _modes()
+    snap = freeze_modes(modes)
+    ch = modes[1]["body_channels"][0]
+    ch["name"] = "Pan"
+    new = freeze_modes(modes, snap, [("m1", "body", ch["id"])])
+    assert thaw_modes(new) == modes
+    assert new[0] is snap[0] and new[2] is snap[2]
+    old_m1, new_m1 = dict(snap[1]), dict(new[1])
+    assert new_m1["cell_channels"] is old_m1["cell_channels"]
+    assert new_m1["body_channels"][1] is old_m1["body_channels"][1]
+
+
+def test_untouched_changes_are_not_seen():
+    # touched is a promise: paths it leaves out are taken from prev
+    modes = _modes()
+    snap = freeze_modes(modes)
+    modes[2]["name"] = "Sneaky"
+    assert freeze_modes(modes, snap, [("m0",)]) is snap
+    assert thaw_modes(freeze_modes(modes, snap))[2]["name"] == "Sneaky"
+
+
+def test_mode_list_changes():
+    modes = _modes()
+    snap = freeze_modes(modes)
+    modes.append({"id": "m9", "name": "New", "body_channels": [], "cell_channels": []})
+    modes.reverse()
+    del modes[1]
+    new = freeze_modes(modes, snap, [()])
+    assert thaw_modes(new) == modes
+    assert new[-1] is snap[0]
+
+
+def test_undo_redo():
+    modes = _modes()
+    history = History(depth=10, modes=modes)
+    states = [copy.deepcopy(modes)]
+    for name in ("A", "B", "C"):
+        modes[0]["name"] = name
+        history.record(modes, [("m0",)])
+        states.append(copy.deepcopy(modes))
+    history.record(modes, [("m0",)])                  # no change: not recorded
+    assert len(history) == 3 and not history.can_redo
+    assert history.undo() == states[2]
+    assert history.undo() == states[1]
+    assert history.redo() == states[2]
+    modes = history.undo()
+    modes[0]["body_channels"].pop()
+    history.record(modes, [("m0", "body")])           # a new edit drops redo
+    assert not history.can_redo
+    assert history.undo() == states[1]
+    assert history.undo() == states[0]
+    assert history.undo() is None and history.can_redo
+
+
+def test_depth_bounds_undo():
+    modes = _modes()
+    history = History(depth=2, modes=modes)
+    for name in "ABCD":
+        modes[0]["name"] = name
+        history.record(modes, [("m0",)])
+    assert [history.undo()[0]["name"] for _ in range(2)] == ["C", "B"]
+    assert history.undo() is None
+    history.resize(1)
+    assert len(history) == 1
@@ -0,0 +1,67 @@
+from gdtf_core import (build_gdtf, channel_defs_from_mode, lint_description,
+                       make_channel_entry)
+
+
+def _description(channels, relations=""):
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<GDTF DataVersion="1.1"><FixtureType Name="T">
+  <Wheels/>
+  <DMXModes><DMXMode Name="Std" Geometry="Body">
+    <DMXChannels>{channels}</DMXChannels>
+    <Relations>{relations}</Relations>
+  </DMXMode></DMXModes>
+</FixtureType></GDTF>"""
+
+
+def _channel(attr, offset, sets=""):
+    return f"""<DMXChannel DMXBreak="1" Offset="{offset}" Geometry="Body">
+  <LogicalChannel Attribute="{attr}">
+    <ChannelFunction Name="{attr}" Attribute="{attr}" OriginalAttribute="{attr}">{sets}</ChannelFunction>
+  </LogicalChannel></DMXChannel>"""
+
+
+def _checks(xml, **kw):
+    return [(i.check, i.severity) for i in lint_description(xml, **kw)]
+
+
+def test_built_fixture_is_clean():
+    mode = {"body_channels": [make_channel_entry(n, False, "body")
+                              for n in ("Dimmer", "Red", "Pan", "Tilt")]}
+    xml = build_gdtf("Par", "Acme", {"Std": channel_defs_from_mode(mode)})
+    assert lint_description(xml) == []
+
+
+def test_virtual_channel_offset_none_is_not_a_footprint_error():
+    xml = _description(_channel("Dimmer", "None") + _channel("Pan", "1,2"))
+    assert _checks(xml) == []
+
+
+def test_empty_offset_is_skipped():
+    assert _checks(_description(_channel("Dimmer", ""))) == []
+
+
+def test_unreadable_offset():
+    issues = lint_description(_description(_channel("Dimmer", "x")))
+    assert [(i.check, i.channel) for i in issues] == [("footprint", "Body_Dimmer")]
+
+
+def test_footprint_over_limit():
+    xml = _description(_channel("Dimmer", "1") + _channel("Pan", "20"))
+    assert _checks(xml, max_footprint=16) == [("footprint", "error")]
+
+
+def test_overlapping_channel_sets():
+    sets = ('<ChannelSet Name="Open" DMXFrom="0/1"/>'
+            '<ChannelSet Name="Closed" DMXFrom="0/1"/>')
+    assert _checks(_description(_channel("Shutter1", "1", sets))) == [
+        ("channel_sets", "error")]
+
+
+def test_relation_to_missing_channel():
+    rel = '<Relation Name="R" Master="Std.Nope" Follower="Std.Body_Dimmer" Type="Multiply"/>'
+    assert _checks(_description(_channel("Dimmer", "1"), rel)) == [
+        ("relations", "error")]
+
+
+def test_unparseable_xml():
+    assert _checks("<GDTF") == [("parse", "error")]
@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from gdtf_core import (UNIVERSE_SIZE, PatchRules, _patch_starts, build_family,
+                       channel_defs_from_mode, make_channel_entry, patch_summary,
+                       plan_patch)
+
+
+def _reference(count, footprint, rules):
+    """One instance at a time, as a person patching by hand would."""
+    align = max(1, rules.align)
+    stride = -(-(footprint + max(0, rules.gap)) // align) * align
+    universe = rules.start_universe - 1
+    address = -(-(rules.start_address - 1) // align) * align
+    starts = []
+    for _ in range(count):
+        if not rules.straddle and address + footprint > UNIVERSE_SIZE:
+            universe, address = universe + 1, 0
+        starts.append(universe * UNIVERSE_SIZE + address)
+        address += stride
+        if rules.straddle:
+            universe, address = divmod(universe * UNIVERSE_SIZE + address, UNIVERSE_SIZE)
+    return starts, stride
+
+
+@pytest.mark.parametrize("footprint,align,gap,start,straddle", list(itertools.product(
+    (1, 7, 40, 170, 512), (1, 4, 10), (0, 3), ((1, 1), (2, 500), (1, 137)),
+    (False, True))))
+def test_starts_match_one_at_a_time_packing(footprint, align, gap, start, straddle):
+    rules = PatchRules(start[0], start[1], align, gap, straddle)
+    starts, stride = _patch_starts(50, footprint, rules)
+    ref, ref_stride = _reference(50, footprint, rules)
+    assert stride == ref_stride and starts.tolist() == ref
+    if not straddle:
+        offsets = starts % UNIVERSE_SIZE
+        assert (offsets + footprint <= UNIVERSE_SIZE).all()
+        assert (offsets % align == 0).all()
+
+
+def test_rejects_unpatchable_footprints():
+    with pytest.raises(ValueError):
+        _patch_starts(1, 0, PatchRules())
+    with pytest.raises(ValueError):
+        _patch_starts(1, UNIVERSE_SIZE + 1, PatchRules())
+    starts, _ = _patch_starts(2, UNIVERSE_SIZE + 1, PatchRules(straddle=True))
+    assert starts.tolist() == [0, UNIVERSE_SIZE + 1]
+
+
+def test_plan_addresses_every_cell():
+    mode = {"body_channels": [make_channel_entry("Dimmer")],
+            "cell_channels": [make_channel_entry(n) for n in ("Red", "Green", "Blue")]}
+    ir = build_family("Bar", "Acme", {"Std": channel_defs_from_mode(mode)}, [8]).variants[0].ir
+    plan = plan_patch(ir, "Std", 20, PatchRules(gap=2))
+    assert plan.footprint == 1 + 3 * 8 and plan.stride == 27
+    assert len(plan.cell) == 20 * 8
+    # Cell n of instance k sits after the body channel, three per cell
+    absolute = (plan.cell_universe - 1) * UNIVERSE_SIZE + plan.cell_address
+    starts = (plan.universe - 1) * UNIVERSE_SIZE + plan.address
+    expected = np.repeat(starts, 8) + 1 + np.tile(np.arange(8) * 3, 20)
+    assert absolute.tolist() == expected.tolist()
+    assert patch_summary(plan)["universes"] == 2
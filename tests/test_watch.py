@@ -0,0 +1,95 @@
+import json, os, struct, zipfile, zlib
+
+import pytest
+
+from gdtf_core import MediaStore
+from gdtf_watch import SpecWatcher, build_spec, load_spec
+
+
+def _write(path, text, mtime):
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+def _png():
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data)))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\0\0")) + chunk(b"IEND", b""))
+
+
+def test_poll_waits_for_debounce(tmp_path):
+    spec = tmp_path / "par.csv"
+    _write(spec, "Channel,Attribute\n1,Dimmer\n", 1000.0)
+    watcher = SpecWatcher(str(tmp_path), debounce=0.5)
+    assert watcher.poll(now=1000.2) == []                 # still settling
+    assert watcher.poll(now=1000.6) == [(str(spec), 1000.0)]
+    assert watcher.poll(now=1001.0) == []                 # nothing new
+
+
+def test_poll_skips_touched_but_unchanged(tmp_path):
+    spec = tmp_path / "par.csv"
+    _write(spec, "Channel,Attribute\n1,Dimmer\n", 1000.0)
+    watcher = SpecWatcher(str(tmp_path), debounce=0.0)
+    assert len(watcher.poll(now=1001.0)) == 1
+    os.utime(spec, (1002.0, 1002.0))
+    assert watcher.poll(now=1003.0) == []
+    _write(spec, "Channel,Attribute\n1,Dimmer\n2,Strobe\n", 1004.0)
+    assert watcher.poll(now=1005.0) == [(str(spec), 1004.0)]
+
+
+def test_poll_ignores_other_files_and_forgets_deleted(tmp_path):
+    spec = tmp_path / "par.csv"
+    _write(spec, "Channel,Attribute\n1,Dimmer\n", 1000.0)
+    _write(tmp_path / "notes.md", "x", 1000.0)
+    _write(tmp_path / ".par.csv", "x", 1000.0)
+    watcher = SpecWatcher(str(tmp_path), debounce=0.0)
+    assert [p for p, _ in watcher.poll(now=1001.0)] == [str(spec)]
+    spec.unlink()
+    assert watcher.poll(now=1002.0) == [] and str(spec) not in watcher.built
+    _write(spec, "Channel,Attribute\n1,Dimmer\n", 1003.0)
+    assert len(watcher.poll(now=1004.0)) == 1             # recreated → rebuilt
+
+
+@pytest.mark.parametrize("spec", [
+    [1],
+    {"fixture": "X", "modes": ["a"]},
+    {"fixture": "X", "modes": [{"body_channels": [{"is_fine": True}]}]},
+    {"fixture": "X", "modes": [{"body_channels": [{"name": "Gobo1",
+                                                   "slots": [{"name": "Open"}]}]}]},
+    {"fixture": "X", "layout": "line", "modes": []},
+])
+def test_bad_spec_shape_is_a_value_error(tmp_path, spec):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps(spec))
+    with pytest.raises(ValueError):
+        load_spec(str(path))
+
+
+def test_json_spec_with_heads_and_media(tmp_path):
+    (tmp_path / "star.png").write_bytes(_png())
+    path = tmp_path / "spot.json"
+    path.write_text(json.dumps({
+        "fixture": "Spot", "heads": 2, "cells": 2,
+        "head_layout": {"kind": "line", "pitch_x": 0.5},
+        "modes": [{"name": "Std",
+                   "body_channels": [{"name": "Gobo1", "slots": [
+                       {"dmx_from": 0, "dmx_to": 9, "name": "Open"},
+                       {"dmx_from": 10, "dmx_to": 19, "name": "Star",
+                        "media": "star.png"}]}],
+                   "head_channels": [{"name": "Pan"}],
+                   "cell_channels": [{"name": "Dimmer"}]}]}))
+    out = tmp_path / "out"
+    out.mkdir()
+    store = MediaStore(str(tmp_path / "media"))
+    dest = build_spec(str(path), str(out), media_store=store)
+    with zipfile.ZipFile(dest) as z:
+        names = z.namelist()
+        xml = z.read("description.xml").decode()
+    media = [n for n in names if n.startswith("wheels/")]
+    assert len(media) == 1
+    assert f'MediaFileName="{media[0][7:-4]}"' in xml
+    assert 'Name="Head_2" Position="1,0,0,0 0,1,0,0 0,0,1,0 0.500,0,0,1"' in xml
@@ -0,0 +1,35 @@
+from gdtf_core import Workspace, make_channel_entry, pack_fixture, unpack_modes
+
+
+def _doc(fixture_id, name):
+    modes = [{"id": "m1", "name": "Std",
+              "body_channels": [make_channel_entry("Dimmer")], "cell_channels": []}]
+    return pack_fixture(fixture_id, name, "Acme", modes)
+
+
+def test_pack_round_trip():
+    doc = _doc("a", "Par")
+    assert (doc.n_modes, doc.n_channels) == (1, 1)
+    assert unpack_modes(doc)[0]["body_channels"][0]["name"] == "Dimmer"
+
+
+def test_rename_keeps_the_index_current():
+    ws = Workspace()
+    ws.store(_doc("a", "Par"))
+    ws.store(_doc("b", "Wash"))
+    ws.open("a")
+    ws.rename("a", "Zebra Spot")
+    assert ws.names() == (("Zebra Spot", "a"), ("Wash", "b"))
+    assert unpack_modes(ws.docs["a"])[0]["name"] == "Std"
+    ws.rename("gone", "x")                       # unknown id: no-op
+    assert len(ws) == 2
+
+
+def test_recent_and_remove():
+    ws = Workspace(recent=2)
+    for i in "abc":
+        ws.store(_doc(i, i.upper()))
+        ws.open(i)
+    assert [d.id for d in ws.recent()] == ["c", "b"]
+    ws.remove("c")
+    assert [d.id for d in ws.recent()] == ["b"] and "c" not in ws.docs
@@ -0,0 +1,43 @@
+from gdtf_core import XmlIndex
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<GDTF DataVersion="1.1">
+  <FixtureType Name="A &amp; B" Manufacturer="Acme">
+    <DMXModes>
+      <DMXMode Name="Std &lt;8ch&gt;" Geometry="Body">
+        <DMXChannels>
+          <DMXChannel DMXBreak="1" Offset="1" Geometry="Body">
+            <LogicalChannel Attribute="Dimmer"/>
+          </DMXChannel>
+        </DMXChannels>
+      </DMXMode>
+      <DMXMode Name="Plain"/>
+    </DMXModes>
+  </FixtureType>
+</GDTF>
+"""
+
+
+def _index(tmp_path):
+    path = tmp_path / "description.xml"
+    path.write_text(XML, encoding="utf-8")
+    return XmlIndex(str(path))
+
+
+def test_names_are_unescaped(tmp_path):
+    idx = _index(tmp_path)
+    ft = idx.find("FixtureType", idx.find("GDTF"))
+    assert idx.label(ft) == "A & B"
+    assert idx.search("A & B") == [ft]
+    assert [idx.nodes[i].name for i in idx.search("<8ch")] == ["Std <8ch>"]
+
+
+def test_outline_and_lines(tmp_path):
+    idx = _index(tmp_path)
+    modes = idx.find("DMXModes", idx.find("FixtureType", idx.find("GDTF")))
+    assert [idx.label(i) for i in idx.children(modes)] == ["Std <8ch>", "Plain"]
+    [dimmer] = idx.search("dimmer")
+    assert idx.nodes[dimmer].tag == "LogicalChannel"
+    assert idx.lines(idx.nodes[dimmer].line, 1) == [
+        '            <LogicalChannel Attribute="Dimmer"/>']
+    assert idx.line_count == XML.count("\n") and idx.lines(idx.line_count, 5) == []
@@ -0,0 +1,283 @@
+"""
+GDTF Builder — headless UI harness
+Drive the Streamlit app through its app-testing API on synthetic fixtures of
+growing size, scripting the edits people actually make (rename a mode, add a
+channel set, move a channel, generate), then run N sessions at once against
+one server process. Reports are JSON, so two versions can be compared.
+
+    python ui_harness.py                                   # report on stdout
+    python ui_harness.py --modes 1 5 10 --sessions 1 4 8 -o after.json
+    python ui_harness.py --compare before.json after.json  # old / new / ratio
+
+Each action is one full-page rerun, as AppTest runs them (the browser reruns
+only the edited card's fragment — `bench_gdtf.py modes` measures that).
+Every mode card but the first is collapsed, as in a long editing session.
+"""
+
+import argparse, contextlib, gc, json, os, platform, statistics, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_gdtf import synthetic_modes, tree_stats, _app_test, _walk
+
+ACTIONS = ("rename", "add_set", "move", "generate")
+
+
+class Unavailable(Exception):
+    """The fixture has nothing to run this action on (e.g. no slot-capable channel)."""
+
+
+def _rss_mb():
+    """Resident set size of this process, in MB (peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def widget_count(at):
+    """Interactive elements in the last rerun's tree."""
+    from streamlit.testing.v1.element_tree import Widget
+    return sum(isinstance(node, Widget) for node in _walk(at._tree))
+
+
+@contextlib.contextmanager
+def server_script_cache():
+    """
+    Share one compiled script across every AppTest run, as the server does.
+    AppTest compiles the script afresh per run, which both skews latency and
+    breaks under concurrent sessions (ast.parse isn't thread-safe on 3.11).
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+    shared = ScriptCache()
+    original = local_script_runner.ScriptCache
+    local_script_runner.ScriptCache = lambda: shared
+    try:
+        yield
+    finally:
+        local_script_runner.ScriptCache = original
+
+
+class Session:
+    """
+    One simulated editor: an AppTest on its own synthetic fixture. lock, if
+    given, is held for each rerun — AppTest installs a process-wide runtime
+    per run, so concurrent sessions are admitted one rerun at a time.
+    """
+
+    def __init__(self, n_modes, n_channels, lock=None):
+        self.at = _app_test()
+        self.modes = synthetic_modes(n_modes, n_channels)
+        self.at.session_state["modes"] = self.modes
+        self.at.session_state["collapsed_modes"] = {m["id"] for m in self.modes[1:]}
+        self.lock = lock or contextlib.nullcontext()
+        self.edits = 0
+
+    def _rerun(self, run):
+        """ms from request to finished rerun, waiting for the lock included."""
+        t0 = time.perf_counter()
+        with self.lock:
+            run()
+        return (time.perf_counter() - t0) * 1000
+
+    def load(self):
+        return self._rerun(self.at.run)
+
+    def _list_key(self, prefix):
+        """Key of the first channel in mode 1's body list showing this widget."""
+        mode = self.modes[0]
+        keys = {b.key for b in self.at.button}
+        for ch in mode["body_channels"]:
+            key = f"{prefix}_m{mode['id']}_body_{ch['id']}"
+            if key in keys:
+                return key
+        raise Unavailable(f"no {prefix!r} button in mode 1")
+
+    def rename(self):
+        self.edits += 1
+        key = f"mname_{self.modes[0]['id']}"
+        return self._rerun(self.at.text_input(key=key).set_value(f"Edit {self.edits}").run)
+
+    def add_set(self):
+        return self._rerun(self.at.button(key=self._list_key("sadd")).click().run)
+
+    def move(self):
+        return self._rerun(self.at.button(key=self._list_key("dn")).click().run)
+
+    def generate(self):
+        """Submit rerun, plus the rerun that shows the result once it's built."""
+        submit = self._rerun(self.at.button(key="gen_manual").click().run)
+        self.at.session_state["gen_job"].wait()
+        return submit + self._rerun(self.at.run)
+
+    def check(self):
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def step(self, action):
+        """Rerun ms for one action, or None if this fixture can't do it."""
+        # Re-read the fixture the app is editing: undo / redo swap the list
+        self.modes = self.at.session_state["modes"]
+        try:
+            ms = getattr(self, action)()
+        except Unavailable:
+            return None
+        self.check()
+        return ms
+
+
+def measure_sizes(sizes, n_channels, runs):
+    """
+    Load cost, tree size and per-action rerun latency per fixture size. An
+    action the fixture can't do is reported as null rather than aborting.
+    """
+    rows = []
+    for n_modes in sizes:
+        s = Session(n_modes, n_channels)
+        load = s.load()
+        s.check()
+        count, size, _ = tree_stats(s.at)
+        row = {"modes": n_modes, "channels": n_channels, "load_ms": round(load, 1),
+               "elements": count, "widgets": widget_count(s.at),
+               "payload_bytes": size, "actions": {}}
+        for action in ACTIONS:
+            times = [t for t in (s.step(action) for _ in range(runs)) if t is not None]
+            row["actions"][action] = times and {
+                "ms": round(statistics.median(times), 1), "widgets": widget_count(s.at)
+            } or None
+        rows.append(row)
+        print(f"  {n_modes:>3} modes · load {load:>6.0f} ms · {row['widgets']} widgets · "
+              + " · ".join(f"{a} {v['ms']:.0f} ms" if v else f"{a} n/a"
+                           for a, v in row["actions"].items()),
+              file=sys.stderr)
+    return rows
+
+
+def measure_sessions(counts, n_modes, n_channels, rounds):
+    """
+    N sessions editing at once in one process: rerun latency under contention
+    and the memory each live session holds. Sessions run on threads, like the
+    server's script runners, and share its cache_resource stores; reruns take
+    turns (as the GIL has them do on the server), background builds don't.
+    """
+    rows = []
+    lock = threading.Lock()
+    for n in counts:
+        gc.collect()
+        before = _rss_mb()
+        sessions = [Session(n_modes, n_channels, lock) for _ in range(n)]
+        for s in sessions:
+            s.load()
+            s.check()
+        held = _rss_mb() - before
+        barrier = threading.Barrier(n)
+
+        def edit(s):
+            barrier.wait()
+            return [s.step(a) for _ in range(rounds) for a in ACTIONS]
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            steps = [t for ts in pool.map(edit, sessions) for t in ts]
+        wall = time.perf_counter() - t0
+        times = sorted(t for t in steps if t is not None)
+        row = {"sessions": n, "modes": n_modes, "channels": n_channels,
+               "reruns": len(times), "skipped": len(steps) - len(times),
+               "rerun_ms_median": round(statistics.median(times), 1),
+               "rerun_ms_p95": round(times[int(0.95 * (len(times) - 1))], 1),
+               "reruns_per_s": round(len(times) / wall, 2),
+               "rss_mb": round(_rss_mb() - before, 1),
+               "rss_mb_per_session": round(held / n, 2)}
+        rows.append(row)
+        print(f"  {n:>3} sessions · median {row['rerun_ms_median']:.0f} ms · "
+              f"p95 {row['rerun_ms_p95']:.0f} ms · {row['rss_mb_per_session']:.1f} MB each",
+              file=sys.stderr)
+        del sessions
+    return rows
+
+
+def run(args):
+    import streamlit
+    report = {"label": args.label, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "streamlit": streamlit.__version__,
+              "cpus": os.cpu_count(), "runs": args.runs}
+    with server_script_cache():
+        print("fixture sizes", file=sys.stderr)
+        report["sizes"] = measure_sizes(args.modes, args.channels, args.runs)
+        print("concurrent sessions", file=sys.stderr)
+        report["sessions"] = measure_sessions(args.sessions, args.session_modes,
+                                              args.channels, args.rounds)
+    return report
+
+
+def _metrics(report):
+    """Flatten a report to {metric name: value}, for comparison."""
+    flat = {}
+    for row in report.get("sizes", []):
+        tag = f"{row['modes']}x{row['channels']}"
+        for k in ("load_ms", "widgets", "payload_bytes"):
+            flat[f"{tag} {k}"] = row[k]
+        for action, v in row["actions"].items():
+            if v is not None:
+                flat[f"{tag} {action} ms"] = v["ms"]
+    for row in report.get("sessions", []):
+        tag = f"{row['sessions']} sessions"
+        for k in ("rerun_ms_median", "rerun_ms_p95", "rss_mb_per_session"):
+            flat[f"{tag} {k}"] = row[k]
+    return flat
+
+
+def compare(old, new):
+    """Lines of old / new / new÷old for every metric both reports have."""
+    a, b = _metrics(old), _metrics(new)
+    width = max(map(len, a), default=10)
+    lines = [f"{'':<{width}} {old.get('label') or 'old':>12} "
+             f"{new.get('label') or 'new':>12} {'ratio':>7}"]
+    for key in a:
+        if key in b:
+            ratio = f"{b[key] / a[key]:.2f}x" if a[key] else "—"
+            lines.append(f"{key:<{width}} {a[key]:>12,} {b[key]:>12,} {ratio:>7}")
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("--modes", type=int, nargs="+", default=[1, 5, 10],
+                    help="fixture sizes to script, in modes")
+    ap.add_argument("--channels", type=int, default=50,
+                    help="body channels per mode")
+    ap.add_argument("--runs", type=int, default=3,
+                    help="repeats of each action per size (median reported)")
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8],
+                    help="concurrent session counts")
+    ap.add_argument("--session-modes", type=int, default=5,
+                    help="modes in each concurrent session's fixture")
+    ap.add_argument("--rounds", type=int, default=2,
+                    help="passes over the actions per concurrent session")
+    ap.add_argument("--label", default="", help="name for this run in comparisons")
+    ap.add_argument("-o", "--output", help="write the JSON report here")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                    help="compare two saved reports instead of running")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print("\n".join(compare(*reports)))
+        return 0
+    text = json.dumps(run(args), indent=1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())